@@ -0,0 +1,84 @@
+# active_sweep.py
+"""
+Сколько объектов активно в каждый день диапазона — для графиков «активно
+во времени» (филиалы и компании в companiesConnectionTab и т.п.).
+
+Объект с интервалом [start, end] активен в день d (полночь), если
+start <= d и (end пуст или end >= d). Счёт — развёртка событий (sweep): +1 в
+первый активный день, -1 после последнего, кумулятивная сумма по дням. Уникальные ключи (компании) считаются так же по
+объединённым интервалам ключа: перекрывающиеся интервалы филиалов одной
+компании сливаются в один.
+"""
+import numpy as np
+import pandas as pd
+
+DAY_NS = 24 * 3600 * 10**9
+_NAT = np.iinfo(np.int64).min
+_OPEN = np.iinfo(np.int64).max
+
+
+def _ns(values) -> np.ndarray:
+    values = pd.Series(values)
+    if not pd.api.types.is_datetime64_any_dtype(values):
+        values = pd.to_datetime(values, errors="coerce")
+    if isinstance(values.dtype, pd.DatetimeTZDtype):
+        values = values.dt.tz_localize(None)
+    return values.to_numpy(dtype="datetime64[ns]").view(np.int64)
+
+def active_days(starts, ends, origin: pd.Timestamp) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Номера первого и последнего активного дня (от полуночи origin) для
+    каждого интервала. Пустой start — интервал не активен никогда (first >
+    last); пустой end — активен бессрочно (last = int64 max).
+    """
+    base = pd.Timestamp(origin).normalize().value
+    start, end = _ns(starts), _ns(ends)
+    no_start, open_end = start == _NAT, end == _NAT
+    # первый день d со старта: d >= start (ceil), последний: d <= end (floor)
+    first = -((base - start) // DAY_NS)
+    last = (end - base) // DAY_NS
+    first[no_start] = _OPEN
+    last[no_start] = _NAT
+    last[open_end & ~no_start] = _OPEN
+    return first, last
+
+def _sweep(first: np.ndarray, last: np.ndarray, days: int) -> np.ndarray:
+    """Число интервалов [first, last], покрывающих каждый день 0..days-1."""
+    lo = np.maximum(first, 0)
+    hi = np.minimum(last, days - 1)
+    keep = lo <= hi
+    events = np.zeros(days + 1, dtype=np.int64)
+    np.add.at(events, lo[keep], 1)
+    np.add.at(events, hi[keep] + 1, -1)
+    return np.cumsum(events[:-1])
+
+def _merge_by_key(codes: np.ndarray, first: np.ndarray, last: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Объединение интервалов каждого ключа: перекрывающиеся и смежные сливаются."""
+    if not len(codes):
+        return first, last
+    order = np.lexsort((first, codes))
+    codes, first, last = codes[order], first[order], last[order]
+    # докуда дотянулись интервалы ключа до текущего (включительно)
+    reach = pd.Series(last).groupby(codes).cummax().to_numpy()
+    new_key = np.r_[True, codes[1:] != codes[:-1]]
+    # новый отрезок: первый интервал ключа или старт после всего, что было до него
+    after_gap = np.r_[False, first[1:] - 1 > reach[:-1]]
+    heads = np.flatnonzero(new_key | after_gap)
+    return first[heads], np.maximum.reduceat(last, heads)
+
+def active_over_time(starts, ends, date_from, date_to, keys=None) -> pd.DataFrame:
+    """
+    По дням от date_from до date_to включительно: Date, Active — число
+    активных интервалов и (если заданы keys) Distinct — число разных
+    непустых keys среди активных.
+    """
+    dates = pd.date_range(start=pd.to_datetime(date_from), end=pd.to_datetime(date_to))
+    out = pd.DataFrame({"Date": dates})
+    first, last = active_days(starts, ends, dates[0] if len(dates) else pd.Timestamp(0))
+    out["Active"] = _sweep(first, last, len(dates))
+    if keys is not None:
+        codes, _ = pd.factorize(pd.Series(keys))
+        valid = (codes >= 0) & (first <= last)
+        seg_first, seg_last = _merge_by_key(codes[valid], first[valid], last[valid])
+        out["Distinct"] = _sweep(seg_first, seg_last, len(dates))
+    return out
@@ -0,0 +1,369 @@
+# append_store.py
+"""
+Инкрементальный импорт растущих выгрузок заказов и отмен
+(Corporate / corporate_canceled_orders).
+
+Каждая новая выгрузка — надмножество предыдущей, и полный разбор каждый день
+заново приводит типы у месяцев истории. AppendStore хранит уже импортированные
+строки в append-only хранилище рядом с загрузками:
+
+    uploaded_files/.append_store/manifest.json
+    uploaded_files/.append_store/serveOrders/month=2025-07/part-00003.parquet ...
+
+Лист сверяется с хранилищем по ключу (orderid) до приведения типов: строки с
+известным ключом отбрасываются, типы приводятся только у новых, и новые строки
+дописываются отдельной частью, разложенной по месяцам водяной колонки
+(orderdate1 / canceldate). Строки без ключа дедуплицировать нельзя — их берём,
+только если их дата позже водяного знака хранилища.
+
+Для каждого файла-источника (source_name) хранится набор ключей его листа —
+включая уже известные строки, ведь следующая выгрузка повторяет предыдущую:
+
+    uploaded_files/.append_store/serveOrders/sources/src-00004.parquet ...
+
+Логический датасет — объединение всех частей, frame(kind); frame(kind,
+sources) — только строки, которые есть в файлах sources (по ключу; строки без
+ключа — по файлу, из которого они импортированы). forget(path) при удалении
+файла убирает его набор ключей и строки, которых нет ни в одном другом файле.
+reset() удаляет всё.
+"""
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from categories import concat_frames
+from data_cache import read_frame, write_frame
+from data_loader import _to_int, add_serve_intervals, prepare_growing
+
+logger = logging.getLogger(__name__)
+
+STORE_VERSION = 2
+MANIFEST = "manifest.json"
+
+# вид данных -> (ключ строки, водяная колонка)
+STORE_KINDS: dict[str, tuple[str, str]] = {
+    "serveOrders": ("orderid", "orderdate1"),
+    "cancellations": ("orderid", "canceldate"),
+}
+
+
+def source_name(path: str) -> str:
+    """Имя источника строк — имя загруженного файла."""
+    return os.path.basename(path)
+
+def _new_manifest() -> dict:
+    return {"version": STORE_VERSION, "id": uuid.uuid4().hex, "seq": 0, "kinds": {}}
+
+
+class AppendStore:
+    """
+    Append-only хранилище строк STORE_KINDS. Потокобезопасно; id меняется
+    при reset(), чтобы Parquet-кэш файлов, разобранных против старого
+    хранилища, перестал считаться валидным.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.RLock()
+        self._frames: dict[str, pd.DataFrame] = {}
+        self._keys: dict[str, np.ndarray] = {}
+        # источник каждой строки frame(kind) и наборы ключей источников
+        self._row_sources: dict[str, np.ndarray] = {}
+        self._source_keys: dict[str, dict[str, np.ndarray]] = {}
+        self._views: dict[tuple, pd.DataFrame] = {}
+        self._manifest = self._read_manifest()
+
+    # ── манифест ───────────────────────────────────────────────────────────
+    def _read_manifest(self) -> dict:
+        try:
+            with open(os.path.join(self.root, MANIFEST), encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return _new_manifest()
+        if manifest.get("version") != STORE_VERSION:
+            logger.warning("Append store %s has version %s; starting a new one", self.root, manifest.get("version"))
+            return _new_manifest()
+        return manifest
+
+    def _write_manifest(self) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        tmp = os.path.join(self.root, MANIFEST + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._manifest, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, os.path.join(self.root, MANIFEST))
+
+    def _info(self, kind: str) -> dict:
+        return self._manifest["kinds"].setdefault(kind, {"rows": 0, "watermark": None, "parts": [], "sources": {}})
+
+    @property
+    def id(self) -> str:
+        return self._manifest["id"]
+
+    # ── чтение ─────────────────────────────────────────────────────────────
+    def rows(self, kind: str) -> int:
+        return self._manifest["kinds"].get(kind, {}).get("rows", 0)
+
+    def watermark(self, kind: str) -> pd.Timestamp | None:
+        value = self._manifest["kinds"].get(kind, {}).get("watermark")
+        return pd.Timestamp(value) if value else None
+
+    def sources(self, kind: str) -> list[str]:
+        return list(self._manifest["kinds"].get(kind, {}).get("sources", {}))
+
+    def frame(self, kind: str, sources=None) -> pd.DataFrame:
+        """
+        Строки kind — объединение частей; sources (пути или имена файлов) —
+        только строки, которые есть в этих файлах. Только для чтения.
+        """
+        with self._lock:
+            df = self._frames.get(kind)
+            if df is None:
+                entries = self._info(kind)["parts"]
+                parts = [read_frame(os.path.join(self.root, p["file"]), p) for p in entries]
+                if kind == "serveOrders":
+                    # части, записанные до появления производных колонок
+                    parts = [add_serve_intervals(part) for part in parts]
+                df = concat_frames(parts, ignore_index=True) if parts else pd.DataFrame()
+                self._frames[kind] = df
+                self._row_sources[kind] = np.repeat(
+                    np.array([p.get("source") for p in entries], dtype=object),
+                    [len(part) for part in parts],
+                )
+            if sources is None:
+                return df
+            names = frozenset(source_name(s) for s in sources)
+            view = self._views.get((kind, names))
+            if view is None:
+                view = df.loc[self._covered(kind, df, self._row_sources[kind], names)].reset_index(drop=True)
+                self._views[(kind, names)] = view
+            return view
+
+    def _covered(self, kind: str, df: pd.DataFrame, row_sources: np.ndarray, names) -> np.ndarray:
+        """Строки df, которые есть в файлах names: по ключу, а без ключа — по файлу импорта."""
+        key = STORE_KINDS[kind][0]
+        if key not in df.columns:
+            return np.isin(row_sources, list(names))
+        source_keys = self._keys_of_sources(kind)
+        keys = [source_keys[name] for name in names if name in source_keys]
+        known = np.unique(np.concatenate(keys)) if keys else np.empty(0, "int64")
+        values = df[key]
+        return np.where(
+            values.notna().to_numpy(bool),
+            values.isin(known).to_numpy(bool),
+            np.isin(row_sources, list(names)),
+        )
+
+    def _keys_of_sources(self, kind: str) -> dict[str, np.ndarray]:
+        loaded = self._source_keys.get(kind)
+        if loaded is None:
+            key = STORE_KINDS[kind][0]
+            loaded = {
+                name: read_frame(os.path.join(self.root, entry["file"]), entry)[key].to_numpy("int64")
+                for name, entry in self._info(kind).setdefault("sources", {}).items()
+            }
+            self._source_keys[kind] = loaded
+        return loaded
+
+    def _known_keys(self, kind: str) -> np.ndarray:
+        keys = self._keys.get(kind)
+        if keys is None:
+            df = self.frame(kind)
+            key = STORE_KINDS[kind][0]
+            keys = df[key].dropna().to_numpy("int64") if key in df.columns else np.empty(0, "int64")
+            self._keys[kind] = keys = np.unique(keys)
+        return keys
+
+    # ── импорт ─────────────────────────────────────────────────────────────
+    def ingest(self, kind: str, df: pd.DataFrame, sheet: str, report: dict | None = None,
+               source: str | None = None) -> pd.DataFrame:
+        """
+        df — лист после standardize_columns, source — путь файла (по умолчанию
+        sheet). Дописывает в хранилище строки, которых в нём ещё нет, и
+        возвращает их с приведёнными типами; ключи листа запоминаются за source.
+        В report["append"][sheet] пишет: строк в листе, известных, новых,
+        новых с датой не позже водяного знака (late) и является ли лист
+        надмножеством хранилища (extension).
+        """
+        key, ts_col = STORE_KINDS.get(kind, (None, None))
+        if key is None or key not in df.columns:
+            return prepare_growing(df, kind, sheet, report)
+        keys = _to_int(df[key])
+        if not isinstance(keys.dtype, pd.Int64Dtype):
+            logger.warning("Key %r in %r is not integer; importing without the append store", key, sheet)
+            return prepare_growing(df, kind, sheet, report)
+
+        with self._lock:
+            stored = self._known_keys(kind)
+            known = keys.isin(stored).to_numpy(bool)
+            extension = pd.unique(keys[known]).size == stored.size
+
+            new = df.loc[~known].copy()
+            new[key] = keys[~known]
+            new = prepare_growing(new, kind, sheet, report)
+
+            watermark = self.watermark(kind)
+            late = 0
+            if watermark is not None and ts_col in new.columns:
+                after = (new[ts_col] > watermark).to_numpy(bool)
+                new = new.loc[new[key].notna().to_numpy(bool) | after]
+                late = int((new[ts_col] <= watermark).sum())
+            new = new.reset_index(drop=True)
+
+            if stored.size and not extension:
+                logger.warning("%r is not a superset of the stored %s; appending its new rows only", sheet, kind)
+            logger.info("Append store %s: %d rows in %r, %d known, %d new", kind, len(df), sheet, int(known.sum()), len(new))
+            if report is not None:
+                report.setdefault("append", {})[sheet] = {
+                    "kind": kind,
+                    "rows": len(df),
+                    "known": int(known.sum()),
+                    "new": len(new),
+                    "late": late,
+                    "extension": bool(extension),
+                }
+            self._add_source(kind, source_name(source or sheet), keys.dropna().to_numpy("int64"))
+            if not new.empty:
+                self._append(kind, new, source_name(source or sheet))
+            else:
+                self._write_manifest()
+        return new
+
+    def _add_source(self, kind: str, name: str, keys: np.ndarray) -> None:
+        """Добавляет keys к набору ключей файла name (несколько листов одного файла)."""
+        key = STORE_KINDS[kind][0]
+        info = self._info(kind)
+        source_keys = self._keys_of_sources(kind)
+        previous = source_keys.get(name)
+        keys = np.unique(keys) if previous is None else np.union1d(previous, keys)
+        if previous is not None and keys.size == previous.size:
+            return
+        self._manifest["seq"] += 1
+        rel = os.path.join(kind, "sources", f"src-{self._manifest['seq']:05d}")
+        os.makedirs(os.path.dirname(os.path.join(self.root, rel)), exist_ok=True)
+        entry = write_frame(pd.DataFrame({key: keys}), os.path.join(self.root, rel))
+        entry["file"] = rel
+        old = info["sources"].get(name)
+        info["sources"][name] = entry
+        source_keys[name] = keys
+        if old is not None:
+            _remove_frame(self.root, old)
+        self._drop_views(kind)
+
+    def _append(self, kind: str, new: pd.DataFrame, source: str) -> None:
+        key, ts_col = STORE_KINDS[kind]
+        info = self._info(kind)
+        self._manifest["seq"] += 1
+        seq = self._manifest["seq"]
+        imported_at = datetime.now().isoformat(timespec="seconds")
+
+        ts = new[ts_col] if ts_col in new.columns else pd.Series(pd.NaT, index=new.index)
+        months = ts.dt.strftime("%Y-%m").fillna("unknown")
+        for month, part in new.groupby(months, sort=True):
+            rel = os.path.join(kind, f"month={month}", f"part-{seq:05d}")
+            os.makedirs(os.path.dirname(os.path.join(self.root, rel)), exist_ok=True)
+            entry = write_frame(part.reset_index(drop=True), os.path.join(self.root, rel))
+            entry.update({"file": rel, "rows": len(part), "source": source, "imported_at": imported_at})
+            info["parts"].append(entry)
+
+        info["rows"] += len(new)
+        top = ts.max()
+        if pd.notna(top) and (info["watermark"] is None or top > pd.Timestamp(info["watermark"])):
+            info["watermark"] = top.isoformat()
+        self._write_manifest()
+
+        if kind in self._frames:
+            self._frames[kind] = concat_frames([self._frames[kind], new], ignore_index=True)
+            self._row_sources[kind] = np.concatenate([self._row_sources[kind], np.full(len(new), source, dtype=object)])
+        self._drop_views(kind)
+        if kind in self._keys:
+            self._keys[kind] = np.union1d(self._keys[kind], new[key].dropna().to_numpy("int64"))
+
+    def _drop_views(self, kind: str) -> None:
+        for view in [v for v in self._views if v[0] == kind]:
+            del self._views[view]
+
+    def forget(self, path: str) -> None:
+        """
+        Файл path удалён: убирает его набор ключей и строки, которых нет ни в
+        одном из оставшихся файлов. Части переписываются только если что-то
+        из них удалено.
+        """
+        name = source_name(path)
+        with self._lock:
+            changed = False
+            for kind, (key, ts_col) in STORE_KINDS.items():
+                info = self._manifest["kinds"].get(kind)
+                if info is None or name not in info.get("sources", {}):
+                    continue
+                self._keys_of_sources(kind)
+                _remove_frame(self.root, info["sources"].pop(name))
+                self._source_keys[kind].pop(name)
+                remaining = frozenset(info["sources"])
+
+                parts, rows, watermark = [], 0, None
+                for entry in info["parts"]:
+                    base = os.path.join(self.root, entry["file"])
+                    part = read_frame(base, entry)
+                    keep = self._covered(kind, part, np.full(len(part), entry.get("source"), dtype=object), remaining)
+                    if not keep.all():
+                        _remove_frame(self.root, entry)
+                        part = part.loc[keep].reset_index(drop=True)
+                        if part.empty:
+                            continue
+                        entry.update(write_frame(part, base), rows=len(part))
+                    parts.append(entry)
+                    rows += len(part)
+                    top = part[ts_col].max() if ts_col in part.columns else pd.NaT
+                    if pd.notna(top) and (watermark is None or top > watermark):
+                        watermark = top
+                logger.info("Append store %s: forgot %r, %d -> %d rows", kind, name, info["rows"], rows)
+                info.update(parts=parts, rows=rows, watermark=None if watermark is None else watermark.isoformat())
+                for cache in (self._frames, self._keys, self._row_sources):
+                    cache.pop(kind, None)
+                self._drop_views(kind)
+                changed = True
+            if changed:
+                self._write_manifest()
+
+    def reset(self) -> None:
+        """Удаляет все строки; новый id инвалидирует кэш файлов, разобранных против старого."""
+        with self._lock:
+            for kind in STORE_KINDS:
+                shutil.rmtree(os.path.join(self.root, kind), ignore_errors=True)
+            self._manifest = _new_manifest()
+            self._frames.clear()
+            self._keys.clear()
+            self._row_sources.clear()
+            self._source_keys.clear()
+            self._views.clear()
+            self._write_manifest()
+
+    def summary(self) -> pd.DataFrame:
+        rows = [{
+            "kind": kind,
+            "rows": self.rows(kind),
+            "parts": len(self._manifest["kinds"].get(kind, {}).get("parts", [])),
+            "files": len(self.sources(kind)),
+            "watermark": self.watermark(kind),
+        } for kind in STORE_KINDS]
+        return pd.DataFrame(rows, columns=["kind", "rows", "parts", "files", "watermark"])
+
+
+def _remove_frame(root: str, entry: dict) -> None:
+    """Удаляет файл части, записанной write_frame, и опустевшую папку месяца."""
+    for ext in (".parquet", ".pkl"):
+        try:
+            os.remove(os.path.join(root, entry["file"]) + ext)
+        except FileNotFoundError:
+            pass
+    try:
+        os.rmdir(os.path.dirname(os.path.join(root, entry["file"])))
+    except OSError:  # в папке месяца остались другие части
+        pass
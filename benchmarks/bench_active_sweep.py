@@ -0,0 +1,88 @@
+# benchmarks/bench_active_sweep.py
+"""
+Активные филиалы и компании по дням (companiesConnectionTab) на
+синтетическом справочнике: прежний цикл по дням с булевой фильтрацией
+всего фрейма и nunique против active_sweep.active_over_time.
+
+    python benchmarks/bench_active_sweep.py [--branches 20000] [--years 5]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from active_sweep import active_over_time  # noqa: E402
+
+
+def synthetic_companies(branches: int, companies: int, days: int, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp("2020-01-01") + pd.to_timedelta(rng.integers(0, days * 24, branches), unit="h")
+    end = start + pd.to_timedelta(rng.integers(0, days * 24, branches), unit="h")
+    frame = pd.DataFrame({
+        "start": start,
+        "end": end,
+        "helpercompanyname": pd.Series(rng.integers(0, companies, branches)).map("Company {}".format),
+    })
+    frame.loc[rng.random(branches) < 0.4, "end"] = pd.NaT
+    return frame
+
+def legacy_active(companies: pd.DataFrame, start_date, end_date) -> pd.DataFrame:
+    """Прежний код companiesConnectionTab (шаг 4)."""
+    stats = []
+    for day in pd.date_range(start=pd.to_datetime(start_date), end=pd.to_datetime(end_date)):
+        active = companies[
+            (companies['start'].notna()) &
+            ((companies['end'].isna()) | (companies['end'] >= day)) &
+            (companies['start'] <= day)
+        ]
+        stats.append({
+            'Date': day,
+            'Active Branches': active.shape[0],
+            'Active Companies': active['helpercompanyname'].nunique()
+        })
+    return pd.DataFrame(stats)
+
+def sweep_active(companies: pd.DataFrame, start_date, end_date) -> pd.DataFrame:
+    return active_over_time(
+        companies['start'], companies['end'], start_date, end_date,
+        keys=companies['helpercompanyname'],
+    ).rename(columns={'Active': 'Active Branches', 'Distinct': 'Active Companies'})
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--branches", type=int, default=20_000)
+    parser.add_argument("--companies", type=int, default=3_000)
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--skip-legacy", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    days = args.years * 365
+    companies = synthetic_companies(args.branches, args.companies, days, args.seed)
+    start_date = companies["start"].min().date()
+    end_date = (pd.Timestamp(start_date) + pd.Timedelta(days=days)).date()
+    print(f"{len(companies):,} branches, {args.companies:,} companies, {days:,} days")
+
+    new, new_s = timed(sweep_active, companies, start_date, end_date)
+    print(f"active_over_time:  {new_s:8.3f} s")
+    if not args.skip_legacy:
+        old, old_s = timed(legacy_active, companies, start_date, end_date)
+        pd.testing.assert_frame_equal(old, new)
+        print(f"legacy day loop:   {old_s:8.2f} s  ({old_s / new_s:.0f}x), results match")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+# benchmarks/bench_cancel_sessions.py
+"""
+Сессии отмен (userid, день) на синтетическом листе отмен: прежняя
+группировка вкладок на каждом перезапуске (ordersTab: groupby + sort_values
++ drop_duplicates + merge; serveAnalyzeTab: sort_values + groupby.agg)
+против CancelSessions — построение один раз и subset по отфильтрованным
+строкам на перезапуске.
+
+    python benchmarks/bench_cancel_sessions.py [--cancels 2000000] [--users 200000]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from modules.BusinessModule.ggBusinessCancels import CancelSessions  # noqa: E402
+from modules.BusinessModule.ggBusinessUsers import UserCompanyIndex  # noqa: E402
+
+
+def synthetic_cancels(n: int, users: int, days: int, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    created = pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, days * 86400, n), unit="s")
+    return pd.DataFrame({
+        "orderid": pd.array(np.arange(n), dtype="Int64"),
+        "userid": pd.array(rng.integers(0, users, n), dtype="Int64"),
+        "tariff": pd.Categorical.from_codes(rng.integers(0, 4, n), ["Comfort", "Economy", "Business", "Van"]),
+        "date": created,
+        "canceldate": created + pd.to_timedelta(rng.exponential(300, n).astype(int), unit="s"),
+    })
+
+def legacy_orders_sessions(cancels: pd.DataFrame) -> pd.DataFrame:
+    """Прежний ordersTab: сессии за период (здесь — весь лист)."""
+    cancels = cancels.assign(wait_min=(cancels["canceldate"] - cancels["date"]).dt.total_seconds() / 60.0)
+    cancels_period = cancels.assign(cancel_date=cancels["date"].dt.date)
+    waits = cancels_period.groupby(["company", "userid", "cancel_date"], as_index=False, observed=True)["wait_min"].sum()
+    first_rows = cancels_period.sort_values("date").drop_duplicates(subset=["company", "userid", "cancel_date"], keep="first")
+    return first_rows.drop(columns=["wait_min"]).merge(waits, on=["company", "userid", "cancel_date"], how="left")
+
+def legacy_serve_sessions(cancels: pd.DataFrame) -> pd.DataFrame:
+    """Прежний serveAnalyzeTab._group_cancellations."""
+    cancels = cancels.assign(wait_sec=(cancels["canceldate"] - cancels["date"]).dt.total_seconds())
+    cancels_df_sorted = cancels.sort_values(by=['userid', 'canceldate'])
+    return cancels_df_sorted.groupby([
+        cancels_df_sorted['userid'],
+        cancels_df_sorted['canceldate'].dt.date
+    ]).agg(
+        session_start_time=('canceldate', 'first'),
+        total_wait_sec=('wait_sec', 'sum'),
+        cancellations_in_session=('userid', 'size'),
+        company=('company', 'first')
+    ).reset_index()
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cancels", type=int, default=2_000_000)
+    parser.add_argument("--users", type=int, default=200_000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    cancels = synthetic_cancels(args.cancels, args.users, args.days, args.seed)
+    cancels["company"] = "Company " + (cancels["userid"] % 500).astype(str)
+    print(f"{len(cancels):,} cancels, {args.users:,} users")
+
+    _, orders_s = timed(legacy_orders_sessions, cancels)
+    _, serve_s = timed(legacy_serve_sessions, cancels)
+    companies = UserCompanyIndex.from_pairs(cancels["userid"], cancels["company"])
+    sessions, build_s = timed(CancelSessions, cancels, companies)
+    half = cancels.index[cancels["canceldate"] >= cancels["canceldate"].median()]
+    subset, subset_s = timed(sessions.subset, half)
+    print(f"legacy per rerun: ordersTab {orders_s:.2f} s, serveAnalyzeTab {serve_s:.2f} s")
+    print(f"CancelSessions: build once {build_s:.2f} s ({len(sessions):,} sessions), "
+          f"subset of {len(half):,} rows {subset_s:.2f} s ({len(subset):,} sessions)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,46 @@
+# benchmarks/bench_categories.py
+"""
+Память повторяющихся строковых колонок до и после перевода в category
+(общий словарь categories.encode) по всем файлам из uploaded_files/.
+
+    python benchmarks/bench_categories.py [files...]
+"""
+import argparse
+import glob
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import data_loader  # noqa: E402
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*")
+    args = parser.parse_args()
+
+    files = args.files or sorted(
+        glob.glob(os.path.join(ROOT, "uploaded_files", "*.xlsx"))
+        + glob.glob(os.path.join(ROOT, "uploaded_files", "*.csv"))
+    )
+    total_before = total_after = 0
+    print(f"{'file':32} {'sheet/column':40} {'before MB':>10} {'after MB':>10} {'ratio':>7}")
+    for path in files:
+        report = {}
+        data_loader.load_data_from_file(path, report=report)
+        for label, mem in sorted(report.get("categories", {}).items()):
+            total_before += mem["before"]
+            total_after += mem["after"]
+            ratio = mem["before"] / mem["after"] if mem["after"] else float("inf")
+            print(f"{os.path.basename(path)[:32]:32} {label[:40]:40} "
+                  f"{mem['before'] / 2**20:10.2f} {mem['after'] / 2**20:10.2f} {ratio:6.1f}x")
+    if total_after:
+        print(f"\ntotal: {total_before / 2**20:.2f} MB -> {total_after / 2**20:.2f} MB "
+              f"({total_before / total_after:.1f}x smaller)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
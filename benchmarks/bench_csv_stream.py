@@ -0,0 +1,135 @@
+# benchmarks/bench_csv_stream.py
+"""
+Пиковая память (RSS) разбора большого ggtips CSV: целиком (pd.read_csv,
+как раньше) против потокового чтения кусками (iter_csv_chunks), одной
+потоковой записи в Parquet-кэш (import: stream_csv_cache) и записи с
+последующим чтением результата из кэша (cache: load_data_cached).
+
+Без аргументов генерирует синтетический CSV на --rows строк во временной
+папке. Каждый режим меряется в отдельном подпроцессе.
+
+    python benchmarks/bench_csv_stream.py [--rows 2000000] [--chunk-rows 200000] [file.csv]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+MODES = ("whole", "chunks", "import", "cache")
+
+
+def _peak_rss_mb() -> float | None:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux отдаёт КБ, macOS — байты
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def make_csv(path: str, rows: int) -> None:
+    rng = np.random.default_rng(0)
+    dates = pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 500 * 86400, rows), unit="s")
+    ids = np.arange(rows)
+    repeat = rng.random(rows) < 0.05  # ~5% повторных uuid
+    ids[repeat] = rng.integers(0, rows, repeat.sum())
+    pd.DataFrame({
+        "uuid": [f"u{i:08d}" for i in ids],
+        "createdAt": dates.strftime("%d.%m.%Y %H:%M:%S"),
+        "amount": rng.choice([100, 200, 500, 1000], rows).astype(float),
+        "status": rng.choice(["finished", "pending", "failed"], rows),
+        "payment processor": rng.choice(["idram", "card"], rows),
+        "company": rng.choice([f"Company {i}" for i in range(60)], rows),
+        "name": rng.choice([f"Partner {i}" for i in range(300)], rows),
+        "payer": rng.choice([f"payer{i}" for i in range(3000)], rows),
+    }).to_csv(path, index=False)
+
+
+def run_child(mode: str, path: str, chunk_rows: int) -> None:
+    import logging
+    logging.disable(logging.INFO)
+    import data_loader
+    data_loader.CSV_CHUNK_ROWS = chunk_rows
+
+    t0 = time.perf_counter()
+    if mode == "whole":
+        df = data_loader.standardize_columns(pd.read_csv(path))
+        df = data_loader.apply_schema(df, "ggtips", "csv")
+    elif mode == "chunks":
+        df = data_loader.load_data_from_file(path)["ggtips"]["csv"]
+    elif mode == "import":
+        import data_cache
+        data_cache.drop_cache(path)
+        data_cache.stream_csv_cache(path)
+        manifest = data_cache._read_manifest(data_cache.cache_dir_for(path))
+        rows = sum(part["rows"] for part in manifest["frames"][0]["parts"])
+        data_cache.drop_cache(path)
+        print(json.dumps({"rows": rows, "seconds": time.perf_counter() - t0, "frame_mb": 0.0, "peak_mb": _peak_rss_mb()}))
+        return
+    else:
+        import data_cache
+        data_cache.drop_cache(path)
+        df = data_cache.load_data_cached(path)["ggtips"]["csv"]
+        data_cache.drop_cache(path)
+    print(json.dumps({
+        "rows": len(df),
+        "seconds": time.perf_counter() - t0,
+        "frame_mb": df.memory_usage(deep=True).sum() / 2**20,
+        "peak_mb": _peak_rss_mb(),
+    }))
+
+
+def _spawn(*args: str) -> str:
+    # Linux сохраняет пик RSS через fork+exec, поэтому родитель держим маленьким:
+    # даже генерация CSV идёт в подпроцессе
+    return subprocess.run([sys.executable, os.path.abspath(__file__), *args],
+                          capture_output=True, text=True, check=True).stdout
+
+
+def measure(mode: str, path: str, chunk_rows: int) -> dict:
+    out = _spawn("--child", mode, path, "--chunk-rows", str(chunk_rows))
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("file", nargs="?")
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--chunk-rows", type=int, default=200_000)
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--make", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.file, args.chunk_rows)
+        return 0
+    if args.make:
+        make_csv(args.file, args.rows)
+        return 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.file
+        if path is None:
+            path = os.path.join(tmp, "tips.csv")
+            _spawn("--make", path, "--rows", str(args.rows))
+        print(f"{os.path.basename(path)}: {os.path.getsize(path) / 2**20:.0f} MB, chunk {args.chunk_rows} rows")
+        print(f"\n{'mode':8} {'rows':>9} {'seconds':>9} {'frame MB':>9} {'peak MB':>9}")
+        for mode in MODES:
+            m = measure(mode, path, args.chunk_rows)
+            peak = f"{m['peak_mb']:.0f}" if m["peak_mb"] is not None else "n/a"
+            print(f"{mode:8} {m['rows']:9d} {m['seconds']:9.1f} {m['frame_mb']:9.0f} {peak:>9}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+# benchmarks/bench_excel_engines.py
+"""
+Сравнение движков чтения xlsx (calamine / openpyxl) на книгах из
+uploaded_files/: строк в секунду и пиковая память (RSS) процесса.
+
+Каждая пара (движок, файл) меряется в отдельном подпроцессе, чтобы пик
+памяти одного прогона не смешивался с другим.
+
+    python benchmarks/bench_excel_engines.py [--engines calamine openpyxl] [--repeat 3] [files...]
+"""
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import data_loader  # noqa: E402
+
+
+def _peak_rss_mb() -> float | None:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux отдаёт КБ, macOS — байты
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def run_child(engine: str, path: str, repeat: int) -> None:
+    """Читает все листы книги выбранным движком и печатает JSON с замерами."""
+    best, rows = None, 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        xls = data_loader.open_workbook(path, engine)
+        rows = sum(len(data_loader.read_sheet(xls, sheet)[0]) for sheet in xls.sheet_names)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    print(json.dumps({"engine": xls.engine, "rows": rows, "seconds": best, "peak_mb": _peak_rss_mb()}))
+
+
+def measure(engine: str, path: str, repeat: int) -> dict:
+    out = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", engine, path, "--repeat", str(repeat)],
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*")
+    parser.add_argument("--engines", nargs="+", default=list(data_loader.EXCEL_ENGINES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--child", metavar="ENGINE", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.files[0], args.repeat)
+        return 0
+
+    available = data_loader.available_excel_engines()
+    engines = [e for e in args.engines if e in available]
+    for e in set(args.engines) - set(engines):
+        print(f"skip {e}: not installed")
+
+    files = args.files or sorted(glob.glob(os.path.join(ROOT, "uploaded_files", "*.xlsx")))
+    print(f"\n{'file':40} {'engine':10} {'rows':>9} {'seconds':>9} {'rows/s':>11} {'peak MB':>9}")
+    for path in files:
+        for engine in engines:
+            m = measure(engine, path, args.repeat)
+            rate = m["rows"] / m["seconds"] if m["seconds"] else float("inf")
+            peak = f"{m['peak_mb']:.1f}" if m["peak_mb"] is not None else "n/a"
+            print(f"{os.path.basename(path)[:40]:40} {m['engine']:10} {m['rows']:9d} "
+                  f"{m['seconds']:9.3f} {rate:11.0f} {peak:>9}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+# benchmarks/bench_loader.py
+"""
+Регрессионный бенчмарк загрузки: прогоняет load_data_from_file по всем
+книгам из uploaded_files/ и печатает время чтения каждого листа.
+
+Проверяет, что каждый лист декодируется ровно один раз
+(pd.read_excel вызывается не больше, чем листов в книге).
+
+    python benchmarks/bench_loader.py [--repeat 3] [files...]
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import pandas as pd  # noqa: E402
+import data_loader  # noqa: E402
+
+
+def _count_read_excel():
+    """Оборачивает pd.read_excel счётчиком вызовов."""
+    calls = {"n": 0}
+    original = pd.read_excel
+
+    def counting(*args, **kwargs):
+        calls["n"] += 1
+        return original(*args, **kwargs)
+
+    pd.read_excel = counting
+    return calls, original
+
+
+def bench_file(path: str, repeat: int) -> bool:
+    n_sheets = len(pd.ExcelFile(path).sheet_names) if path.lower().endswith(".xlsx") else 0
+    best_total, best_report = None, None
+    calls, original = _count_read_excel()
+    try:
+        for _ in range(repeat):
+            calls["n"] = 0
+            report = {}
+            t0 = time.perf_counter()
+            data_loader.load_data_from_file(path, report=report)
+            total = time.perf_counter() - t0
+            if best_total is None or total < best_total:
+                best_total, best_report = total, report
+    finally:
+        pd.read_excel = original
+
+    print(f"\n{os.path.basename(path)}: {best_total:.3f}s total (best of {repeat})")
+    for sheet, seconds in sorted(best_report.get("timings", {}).items(), key=lambda kv: -kv[1]):
+        print(f"  {seconds:8.3f}s  {sheet}")
+
+    ok = calls["n"] <= n_sheets
+    if not ok:
+        print(f"  FAIL: read_excel called {calls['n']} times for {n_sheets} sheets")
+    return ok
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    files = args.files or sorted(
+        glob.glob(os.path.join(ROOT, "uploaded_files", "*.xlsx"))
+        + glob.glob(os.path.join(ROOT, "uploaded_files", "*.csv"))
+    )
+    ok = all([bench_file(f, args.repeat) for f in files])
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
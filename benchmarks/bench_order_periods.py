@@ -0,0 +1,66 @@
+# benchmarks/bench_order_periods.py
+"""
+Начала недель и месяцев для листа заказов: прежний ordersTab на каждом
+перезапуске (.dt.to_period('W' / 'M').apply(lambda r: r.start_time.date())
+для заказов и отмен, pd.to_datetime(...).dt.weekday для фильтра выходных)
+против period_keys — векторно, один раз на версию листа.
+
+    python benchmarks/bench_order_periods.py [--rows 500000] [--days 730]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from modules.BusinessModule.ggBusinessPeriods import period_keys  # noqa: E402
+
+
+def synthetic_dates(n: int, days: int, seed: int) -> pd.Series:
+    rng = np.random.default_rng(seed)
+    return pd.Series(pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, days, n), unit="D"))
+
+def legacy_periods(dates: pd.Series) -> pd.DataFrame:
+    """Прежний ordersTab: date-объекты, to_period().apply и weekday."""
+    date = dates.dt.date
+    return pd.DataFrame({
+        "week_start": pd.to_datetime(date).dt.to_period('W').apply(lambda r: r.start_time.date()),
+        "month_start": pd.to_datetime(date).dt.to_period('M').apply(lambda r: r.start_time.date()),
+        "weekday": pd.to_datetime(date).dt.weekday,
+    })
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--days", type=int, default=730)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    dates = synthetic_dates(args.rows, args.days, args.seed)
+    print(f"{len(dates):,} rows over {args.days} days")
+
+    legacy, legacy_s = timed(legacy_periods, dates)
+    keys, keys_s = timed(period_keys, dates)
+    same = (
+        (pd.to_datetime(legacy["week_start"]) == keys["week_start"]).all()
+        and (pd.to_datetime(legacy["month_start"]) == keys["month_start"]).all()
+        and (legacy["weekday"] == keys["weekday"]).all()
+    )
+    print(f"legacy to_period().apply: {legacy_s:.2f} s")
+    print(f"period_keys: {keys_s:.2f} s (same keys: {same})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+# benchmarks/bench_payer_rfm.py
+"""
+RFM плательщиков usersTab на синтетической истории транзакций: прежний
+groupby с lambda s: s.dt.date.nunique(), payer_rfm за один проход и
+PayerStateStore — история уже учтена, новая выгрузка добавляет один день.
+
+    python benchmarks/bench_payer_rfm.py [--tips 2000000] [--payers 200000]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from modules.ggTipsModule.ggTips_rfm import PayerStateStore, payer_rfm  # noqa: E402
+
+
+def synthetic_tips(n: int, payers: int, days: int, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    minutes = np.sort(rng.integers(0, days * 24 * 60, n))
+    return pd.DataFrame({
+        "uuid": pd.Series(np.arange(n)).map("u{:08d}".format),
+        "payer": pd.Series(rng.integers(0, payers, n)).map("p{:07d}".format),
+        "date": pd.Timestamp("2024-01-01") + pd.to_timedelta(minutes, unit="min"),
+        "amount": rng.integers(1, 50, n) * 100.0,
+        "company": pd.Categorical.from_codes(rng.integers(0, 500, n), [f"Company {i}" for i in range(500)]),
+    })
+
+def legacy_rfm(tips: pd.DataFrame) -> pd.DataFrame:
+    """Прежний код usersTab (раздел 5)."""
+    return (
+        tips.groupby("payer")
+            .agg(
+                FirstTip   = ("date","min"),
+                LastTip    = ("date","max"),
+                Count      = ("uuid","count"),
+                Amount     = ("amount","sum"),
+                Companies  = ("company",pd.Series.nunique),
+                ActiveDays = ("date", lambda s: s.dt.date.nunique()),
+            )
+            .reset_index()
+    )
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tips", type=int, default=2_000_000)
+    parser.add_argument("--payers", type=int, default=200_000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--skip-legacy", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    tips = synthetic_tips(args.tips, args.payers, args.days, args.seed)
+    history = tips[tips["date"] < tips["date"].max().normalize()]
+    print(f"{len(tips):,} tips, {tips['payer'].nunique():,} payers; last day adds {len(tips) - len(history):,}")
+
+    if not args.skip_legacy:
+        legacy, legacy_s = timed(legacy_rfm, tips)
+        print(f"legacy groupby + lambda:  {legacy_s:8.2f} s")
+    fresh, fresh_s = timed(payer_rfm, tips)
+    print(f"payer_rfm:                {fresh_s:8.2f} s")
+    if not args.skip_legacy:
+        pd.testing.assert_frame_equal(legacy, fresh, check_dtype=False)
+
+    root = tempfile.mkdtemp(prefix="payer_state_")
+    try:
+        store = PayerStateStore(root)
+        _, build_s = timed(store.rfm, "bench", history)
+        # новый процесс: состояние читается с диска, дописывается последний день
+        store = PayerStateStore(root)
+        table, update_s = timed(store.rfm, "bench", tips)
+        pd.testing.assert_frame_equal(table, fresh)
+        _, reopen_s = timed(PayerStateStore(root).rfm, "bench", tips)
+        print(f"store: history {build_s:.2f} s, +1 day {update_s:.2f} s, reopen unchanged {reopen_s:.2f} s")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
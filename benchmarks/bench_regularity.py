@@ -0,0 +1,112 @@
+# benchmarks/bench_regularity.py
+"""
+RegularSince / Periodicity / Ongoing для usersTab на синтетических данных:
+ggTips_users.regularity (один проход NumPy) против прежнего пути через
+groupby(...).apply(list) и find_regular_start. Старый путь на миллионе
+плательщиков идёт минутами, поэтому он меряется на подвыборке --old-payers
+и сверяется с новым результатом на ней же.
+
+    python benchmarks/bench_regularity.py [--payers 1000000] [--tips-per-payer 6]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from modules.ggTipsModule.ggTips_users import regularity  # noqa: E402
+
+
+def synthetic_tips(payers: int, tips_per_payer: float, days: int, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    n = int(payers * tips_per_payer)
+    minutes = rng.integers(0, days * 24 * 60, n)
+    return pd.DataFrame({
+        "payer": pd.Series(rng.integers(0, payers, n)).map("p{:07d}".format),
+        "date": pd.Timestamp("2024-01-01") + pd.to_timedelta(minutes, unit="min"),
+    })
+
+def legacy_regularity(tips: pd.DataFrame, gap: int, min_days: int, today: pd.Timestamp) -> pd.DataFrame:
+    """Прежний код usersTab (разделы 6, 7 и 9)."""
+    uniq = (
+        tips.assign(day=tips["date"].dt.normalize())
+            .drop_duplicates(subset=["payer", "day"])
+            .sort_values(["payer", "day"])
+            .groupby("payer")["day"]
+            .apply(list)
+            .reset_index(name="days_list")
+    )
+
+    def find_regular_start(days):
+        if len(days) < min_days:
+            return pd.NaT
+        for i in range(min_days, len(days) + 1):
+            seq = days[:i]
+            diffs = [(seq[j] - seq[j - 1]).days for j in range(1, len(seq))]
+            if max(diffs) <= gap:
+                return seq[-1]
+        return pd.NaT
+
+    def avg_gap(days):
+        if len(days) < 2:
+            return None
+        diffs = [(days[i] - days[i - 1]).days for i in range(1, len(days))]
+        return sum(diffs) / len(diffs)
+
+    uniq["RegularSince"] = uniq["days_list"].apply(find_regular_start)
+    uniq["Periodicity"] = uniq["days_list"].apply(avg_gap)
+    last = tips.groupby("payer")["date"].max().rename("LastTip").reset_index()
+    uniq = uniq.merge(last, on="payer", how="left")
+    uniq["Ongoing"] = (today - uniq["LastTip"]).dt.days <= gap
+    return uniq.drop(columns="days_list")
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--payers", type=int, default=1_000_000)
+    parser.add_argument("--tips-per-payer", type=float, default=6.0)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--gap", type=int, default=30)
+    parser.add_argument("--min-days", type=int, default=3)
+    parser.add_argument("--old-payers", type=int, default=20_000,
+                        help="плательщиков в подвыборке для старого пути (0 — не мерить)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    today = pd.Timestamp("2024-01-01") + pd.Timedelta(days=args.days)
+    tips = synthetic_tips(args.payers, args.tips_per_payer, args.days, args.seed)
+    print(f"{len(tips):,} tips, {tips['payer'].nunique():,} payers")
+
+    new, new_s = timed(regularity, tips, args.gap, args.min_days, today)
+    print(f"regularity:        {new_s:8.2f} s  ({int(new['RegularSince'].notna().sum()):,} regular, "
+          f"{int((new['RegularSince'].notna() & new['Ongoing']).sum()):,} ongoing)")
+
+    if args.old_payers:
+        sample_ids = new["payer"].iloc[:args.old_payers]
+        sample = tips[tips["payer"].isin(sample_ids)]
+        old, old_s = timed(legacy_regularity, sample, args.gap, args.min_days, today)
+        fresh, fresh_s = timed(regularity, sample, args.gap, args.min_days, today)
+        same = (
+            old["payer"].equals(fresh["payer"])
+            and old["RegularSince"].equals(fresh["RegularSince"])
+            and np.allclose(old["Periodicity"].astype(float), fresh["Periodicity"], equal_nan=True)
+            and old["Ongoing"].equals(fresh["Ongoing"])
+        )
+        print(f"{len(sample_ids):,}-payer sample: legacy {old_s:.2f} s, regularity {fresh_s:.3f} s "
+              f"({old_s / fresh_s:.0f}x), results {'match' if same else 'DIFFER'}")
+        print(f"legacy extrapolated to {args.payers:,} payers: ~{old_s * args.payers / len(sample_ids):.0f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
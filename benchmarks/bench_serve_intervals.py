@@ -0,0 +1,77 @@
+# benchmarks/bench_serve_intervals.py
+"""
+Разбор acceptedinterval / arrivedinterval serve orders на синтетических
+строках Postgres-интервалов: прежний serveAnalyzeTab._parse_interval_seconds
+(.apply: re.findall + timedelta на строку) против
+data_loader.parse_interval_seconds.
+
+    python benchmarks/bench_serve_intervals.py [--rows 1000000]
+"""
+import argparse
+import os
+import re
+import sys
+import time
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from data_loader import parse_interval_seconds  # noqa: E402
+
+
+def synthetic_intervals(rows: int, seed: int) -> pd.Series:
+    rng = np.random.default_rng(seed)
+    seconds = rng.exponential(240, rows)
+    text = pd.Series([
+        f"0 years 0 mons 0 days {int(s // 3600)} hours {int(s % 3600 // 60)} mins {s % 60:.6f} secs"
+        for s in seconds
+    ], dtype=object)
+    text[rng.random(rows) < 0.02] = np.nan
+    return text
+
+def legacy_parse(val) -> float:
+    """Прежний serveAnalyzeTab._parse_interval_seconds."""
+    if pd.isna(val):
+        return 0.0
+    values = {"years": 0, "mons": 0, "days": 0, "hours": 0, "mins": 0, "secs": 0.0}
+    for num, unit in re.findall(
+        r"(\d+(?:\.\d+)?)\s*(years?|mons?|days?|hours?|mins?|secs?)", str(val).lower()
+    ):
+        num = float(num)
+        if unit.startswith("year"): values["days"] += num * 365
+        elif unit.startswith("mon"): values["days"] += num * 30
+        elif unit.startswith("day"): values["days"] += num
+        elif unit.startswith("hour"): values["hours"] += num
+        elif unit.startswith("min"): values["mins"] += num
+        elif unit.startswith("sec"): values["secs"] += num
+    td = timedelta(days=values["days"], hours=values["hours"], minutes=values["mins"], seconds=values["secs"])
+    return td.total_seconds()
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    text = synthetic_intervals(args.rows, args.seed)
+    print(f"{len(text):,} intervals")
+    old, old_s = timed(text.apply, legacy_parse)
+    new, new_s = timed(parse_interval_seconds, text)
+    same = np.allclose(old.to_numpy(), new.to_numpy(), rtol=0, atol=1e-6)
+    print(f"legacy .apply:           {old_s:8.2f} s")
+    print(f"parse_interval_seconds:  {new_s:8.2f} s  ({old_s / new_s:.1f}x), results {'match' if same else 'DIFFER'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+# benchmarks/bench_user_company_index.py
+"""
+userid -> company для вкладок ggBusiness на синтетическом листе users:
+прежний разбор ast.literal_eval по строке + dict через iterrows
+(serveAnalyzeTab) против UserCompanyIndex и поиск компаний для отмен.
+
+    python benchmarks/bench_user_company_index.py [--rows 100000] [--cancels 1000000]
+"""
+import argparse
+import ast
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from modules.BusinessModule.ggBusinessUsers import UserCompanyIndex  # noqa: E402
+
+
+def synthetic_users(rows: int, companies: int, per_row: int, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    ids = rng.integers(1, rows * per_row, (rows, per_row))
+    return pd.DataFrame({
+        "company": pd.Categorical.from_codes(rng.integers(0, companies, rows), [f"Company {i}" for i in range(companies)]),
+        "users": ["[" + ", ".join(map(str, row[: rng.integers(1, per_row + 1)])) + "]" for row in ids],
+    })
+
+def legacy_mapping(users_df: pd.DataFrame) -> dict:
+    """Прежний serveAnalyzeTab._create_company_mapping."""
+    def parse_list_safely(x):
+        try:
+            return ast.literal_eval(x)
+        except (ValueError, SyntaxError):
+            return []
+
+    users_df = users_df.copy()
+    users_df["parsed_users"] = users_df["users"].apply(parse_list_safely)
+    mapping = {}
+    for _, row in users_df.iterrows():
+        for user_id in row["parsed_users"]:
+            mapping[user_id] = row["company"]
+    return mapping
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--companies", type=int, default=2_000)
+    parser.add_argument("--per-row", type=int, default=10)
+    parser.add_argument("--cancels", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    users = synthetic_users(args.rows, args.companies, args.per_row, args.seed)
+    userid = pd.Series(np.random.default_rng(args.seed + 1).integers(1, args.rows * args.per_row, args.cancels))
+    print(f"{len(users):,} users rows, {args.cancels:,} cancels")
+
+    mapping, old_build = timed(legacy_mapping, users)
+    old, old_map = timed(userid.map, mapping)
+    index, new_build = timed(UserCompanyIndex.from_users, users)
+    new, new_map = timed(index.company_of, userid)
+    print(f"legacy:           build {old_build:6.2f} s, map {old_map:6.3f} s")
+    print(f"UserCompanyIndex: build {new_build:6.2f} s, map {new_map:6.3f} s")
+    same = old.astype(object).fillna("").equals(new.fillna(""))
+    print(f"results {'match' if same else 'DIFFER'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+# categories.py
+"""
+Общий словарь категорий для повторяющихся строковых колонок
+(company, partner, region, status, payment processor, companymanager, ...).
+
+Лоадер кодирует такие колонки в pandas category через encode(): категории
+берутся из одного словаря на процесс, который только дополняется. Поэтому
+листы и файлы, загруженные в одном процессе, получают совместимые категории,
+а concat_frames() приводит к общему набору категорий и те фреймы, что пришли
+из Parquet-кэша или из более ранней версии словаря, — результат concat
+остаётся category, а не откатывается в object.
+
+Категории общие для всех файлов, так что в каждом фрейме есть и
+ненаблюдаемые значения: группируйте по таким колонкам с observed=True.
+"""
+import threading
+
+import pandas as pd
+
+_VOCAB: dict[str, dict] = {}
+_LOCK = threading.Lock()
+
+
+def _ordered(values) -> list:
+    # сортированные категории: groupby / pivot выдают тот же порядок, что и на object
+    try:
+        return sorted(values)
+    except TypeError:  # смесь чисел и строк
+        return list(values)
+
+
+def encode(ser: pd.Series, column: str) -> pd.Series:
+    """Переводит ser в category с категориями из общего словаря column."""
+    if isinstance(ser.dtype, pd.CategoricalDtype):
+        values = ser.cat.categories
+    else:
+        values = pd.unique(ser.dropna())
+    with _LOCK:
+        vocab = _VOCAB.setdefault(column, {})
+        for value in values:
+            vocab.setdefault(value, len(vocab))
+        categories = _ordered(vocab)
+    return ser.astype(pd.CategoricalDtype(categories))
+
+
+def _union_categories(series: list[pd.Series]) -> list:
+    seen: dict = {}
+    for ser in series:
+        values = ser.cat.categories if isinstance(ser.dtype, pd.CategoricalDtype) else pd.unique(ser.dropna())
+        for value in values:
+            seen.setdefault(value, None)
+    return _ordered(seen)
+
+
+def align_categories(frames: list[pd.DataFrame]) -> list[pd.DataFrame]:
+    """
+    Приводит категориальные колонки всех frames к одному набору категорий.
+    Колонка, категориальная хотя бы в одном фрейме, становится category во всех.
+    """
+    columns = {
+        col
+        for df in frames
+        for col, dtype in df.dtypes.items()
+        if isinstance(dtype, pd.CategoricalDtype)
+    }
+    if not columns or len(frames) < 2:
+        return frames
+    aligned = [df.copy(deep=False) for df in frames]
+    for col in columns:
+        present = [df[col] for df in aligned if col in df.columns]
+        dtype = pd.CategoricalDtype(_union_categories(present))
+        for df in aligned:
+            if col not in df.columns:
+                continue
+            ser = df[col]
+            if isinstance(ser.dtype, pd.CategoricalDtype) and ser.cat.categories.equals(dtype.categories):
+                continue
+            df[col] = ser.astype(dtype)
+    return aligned
+
+
+def concat_frames(frames: list[pd.DataFrame], **kwargs) -> pd.DataFrame:
+    """pd.concat, сохраняющий category у колонок с разными наборами категорий."""
+    return pd.concat(align_categories(frames), **kwargs)
+
+
+def category_savings(before: pd.Series, after: pd.Series) -> dict:
+    """Память колонки до/после кодирования, в байтах."""
+    return {
+        "before": int(before.memory_usage(index=False, deep=True)),
+        "after": int(after.memory_usage(index=False, deep=True)),
+    }
@@ -0,0 +1,289 @@
+# data_cache.py
+"""
+Постоянный колоночный кэш разобранных загрузок.
+
+Результат load_data_from_file (словарь ggtips / serveOrders / cancellations /
+carseat / users / ...) сохраняется в Parquet рядом с загруженным файлом:
+
+    uploaded_files/.parquet_cache/<имя файла>/manifest.json
+    uploaded_files/.parquet_cache/<имя файла>/f000.parquet ...
+
+Ключ кэша — путь, размер, mtime и sha256 содержимого файла. Новая сессия или
+перезапуск читают Parquet вместо повторного разбора xlsx через openpyxl.
+Файлы, разобранные с append-only хранилищем (append_store), содержат только
+новые для него строки, поэтому в ключ входит ещё и id хранилища.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from categories import concat_frames
+from data_loader import empty_result, iter_csv_chunks, load_data_from_file, load_files
+
+logger = logging.getLogger(__name__)
+
+# Увеличивать при любом изменении формата результата load_data_from_file,
+# чтобы старые sidecar-файлы перестали считаться валидными.
+CACHE_VERSION = 8
+CACHE_DIRNAME = ".parquet_cache"
+MANIFEST = "manifest.json"
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Отпечаток файла
+# ──────────────────────────────────────────────────────────────────────────────
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def file_fingerprint(path: str, with_hash: bool = True) -> dict:
+    """{path, size, mtime_ns, sha256} — ключ кэша для файла."""
+    st = os.stat(path)
+    fp = {
+        "path": os.path.abspath(path),
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+    }
+    if with_hash:
+        fp["sha256"] = file_sha256(path)
+    return fp
+
+def cache_dir_for(path: str) -> str:
+    return os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIRNAME, os.path.basename(path))
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Сериализация отдельных DataFrame
+# ──────────────────────────────────────────────────────────────────────────────
+def write_frame(df: pd.DataFrame, dest_base: str) -> dict:
+    """
+    Пишет df в dest_base.parquet (или .pkl, если pyarrow не смог —
+    например, колонка со смесью чисел и строк). Возвращает описание для манифеста.
+    """
+    entry = {"index": None, "format": "parquet"}
+    out = df
+    # индекс, совпадающий по имени с колонкой (ggtips: set_index("uuid", drop=False)),
+    # pyarrow записать не может — восстанавливаем его при чтении
+    if df.index.name is not None and df.index.name in df.columns:
+        entry["index"] = df.index.name
+        out = df.reset_index(drop=True)
+    try:
+        out.to_parquet(dest_base + ".parquet", index=None)
+    except Exception as exc:  # ArrowInvalid / ArrowTypeError / ValueError
+        logger.info("Parquet failed for %s (%s); falling back to pickle", os.path.basename(dest_base), exc)
+        if os.path.exists(dest_base + ".parquet"):
+            os.remove(dest_base + ".parquet")
+        out.to_pickle(dest_base + ".pkl")
+        entry["format"] = "pickle"
+    return entry
+
+def read_frame(src_base: str, entry: dict) -> pd.DataFrame:
+    if entry["format"] == "parts":
+        # фрейм, записанный кусками (stream_csv_cache)
+        folder = os.path.dirname(src_base)
+        parts = [read_frame(os.path.join(folder, p["file"]), p) for p in entry["parts"]]
+        df = concat_frames(parts, ignore_index=True)
+    elif entry["format"] == "pickle":
+        df = pd.read_pickle(src_base + ".pkl")
+    else:
+        df = pd.read_parquet(src_base + ".parquet")
+        # Parquet возвращает None вместо NaN в строковых колонках
+        for col in df.columns[df.dtypes == object]:
+            df[col] = df[col].fillna(np.nan)
+    if entry.get("index"):
+        df = df.set_index(entry["index"], drop=False)
+    return df
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Чтение / запись результата load_data_from_file
+# ──────────────────────────────────────────────────────────────────────────────
+def write_cache(path: str, result: dict, fingerprint: dict | None = None, store_id: str | None = None) -> None:
+    """Сохраняет result рядом с исходным файлом. Ошибки только логируются."""
+    fingerprint = fingerprint or file_fingerprint(path)
+    target = cache_dir_for(path)
+    parent = os.path.dirname(target)
+    os.makedirs(parent, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=parent, prefix=".tmp-")
+    try:
+        frames, layout = [], {}
+        for key, value in result.items():
+            if isinstance(value, dict):
+                layout[key] = list(value.keys())
+                items = [(sheet, df) for sheet, df in value.items()]
+            else:
+                layout[key] = None
+                items = [(None, value)]
+            for sheet, df in items:
+                if df is None or len(df.columns) == 0:
+                    continue
+                name = f"f{len(frames):03d}"
+                entry = write_frame(df, os.path.join(tmp, name))
+                entry.update({"key": key, "sheet": sheet, "file": name})
+                frames.append(entry)
+
+        _commit_cache(tmp, target, fingerprint, store_id, layout, frames)
+    except Exception:
+        logger.exception("Could not write parquet cache for %s", path)
+        shutil.rmtree(tmp, ignore_errors=True)
+
+def _commit_cache(tmp: str, target: str, fingerprint: dict, store_id: str | None,
+                  layout: dict, frames: list) -> None:
+    manifest = {
+        "version": CACHE_VERSION,
+        "fingerprint": fingerprint,
+        "append_store": store_id,
+        "layout": layout,
+        "frames": frames,
+    }
+    with open(os.path.join(tmp, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+
+    if os.path.exists(target):
+        shutil.rmtree(target)
+    os.replace(tmp, target)
+
+def stream_csv_cache(path: str, fingerprint: dict | None = None, store_id: str | None = None,
+                     report: dict | None = None) -> bool:
+    """
+    Разбирает CSV кусками (data_loader.iter_csv_chunks) и пишет каждый кусок
+    сразу в кэш отдельной частью f000.p00000.parquet, ... — пик памяти
+    импорта ограничен одним куском, ни сырой, ни типизированный файл целиком
+    в памяти не бывает. Результат сам не читает: True, если кэш записан,
+    дальше его читает read_cache (это уже весь типизированный файл).
+    """
+    fingerprint = fingerprint or file_fingerprint(path)
+    target = cache_dir_for(path)
+    parent = os.path.dirname(target)
+    os.makedirs(parent, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=parent, prefix=".tmp-")
+    try:
+        layout, frames = {}, []
+        for key, chunk in iter_csv_chunks(path, report):
+            if not frames:
+                sheet = "csv" if key == "ggtips" else None
+                layout[key] = [sheet] if sheet else None
+                frames.append({"key": key, "sheet": sheet, "file": "f000",
+                               "format": "parts", "index": None, "parts": []})
+            name = f"f000.p{len(frames[0]['parts']):05d}"
+            part = write_frame(chunk, os.path.join(tmp, name))
+            part.update(file=name, rows=len(chunk))
+            frames[0]["parts"].append(part)
+            del chunk  # не держать записанный кусок, пока разбирается следующий
+        _commit_cache(tmp, target, fingerprint, store_id, layout, frames)
+    except Exception:
+        logger.exception("Could not stream %s into parquet cache", path)
+        shutil.rmtree(tmp, ignore_errors=True)
+        return False
+    return True
+
+def _read_manifest(target: str) -> dict | None:
+    try:
+        with open(os.path.join(target, MANIFEST), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+def read_cache(path: str, store_id: str | None = None) -> dict | None:
+    """
+    Возвращает закэшированный result или None, если кэша нет, он устарел
+    или разобран против другого append-only хранилища, чем store_id.
+    Совпадение size+mtime считается попаданием без пересчёта хэша; если они
+    разошлись (файл перезаписан / скопирован), сверяется sha256 содержимого.
+    """
+    target = cache_dir_for(path)
+    manifest = _read_manifest(target)
+    if not manifest or manifest.get("version") != CACHE_VERSION or not os.path.exists(path):
+        return None
+    if manifest.get("append_store") != store_id:
+        return None
+
+    cached = manifest["fingerprint"]
+    current = file_fingerprint(path, with_hash=False)
+    if (current["path"], current["size"], current["mtime_ns"]) != (cached["path"], cached["size"], cached["mtime_ns"]):
+        current["sha256"] = file_sha256(path)
+        if current["sha256"] != cached.get("sha256"):
+            return None
+        # содержимое то же — обновляем stat в манифесте
+        manifest["fingerprint"] = current
+        with open(os.path.join(target, MANIFEST), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=1)
+
+    try:
+        result = empty_result()
+        for key, sheets in manifest["layout"].items():
+            if sheets is None:
+                result[key] = pd.DataFrame()
+            else:
+                result[key] = {sheet: pd.DataFrame() for sheet in sheets}
+        for entry in manifest["frames"]:
+            df = read_frame(os.path.join(target, entry["file"]), entry)
+            if entry["sheet"] is None:
+                result[entry["key"]] = df
+            else:
+                result[entry["key"]][entry["sheet"]] = df
+    except Exception:
+        logger.exception("Broken parquet cache for %s; reloading", path)
+        return None
+    return result
+
+def _store_id(store) -> str | None:
+    return store.id if store is not None else None
+
+def load_data_cached(path: str, report: dict | None = None, store=None) -> dict:
+    """load_data_from_file с Parquet-кэшем рядом с файлом."""
+    result = read_cache(path, _store_id(store))
+    if result is not None:
+        logger.info(f"Loaded from parquet cache: {path}")
+        return result
+    fingerprint = file_fingerprint(path) if os.path.exists(path) else None
+    if fingerprint is not None and path.lower().endswith(".csv"):
+        if stream_csv_cache(path, fingerprint, _store_id(store), report):
+            result = read_cache(path, _store_id(store))
+            if result is not None:
+                return result
+    result = load_data_from_file(path, report=report, store=store)
+    if fingerprint is not None:
+        write_cache(path, result, fingerprint, _store_id(store))
+    return result
+
+def load_many_cached(paths: list[str], max_workers: int | None = None,
+                     on_progress=None, reports: dict | None = None, store=None) -> dict:
+    """
+    Пакетный load_data_cached: файлы с валидным кэшем читаются из Parquet,
+    CSV потоково пишутся в кэш, остальные разбираются параллельно через
+    load_files и сохраняются в кэш.
+    """
+    results, missing, fingerprints = {}, [], {}
+    for path in paths:
+        cached = read_cache(path, _store_id(store))
+        if cached is None and path.lower().endswith(".csv") and os.path.exists(path):
+            report = reports.setdefault(path, {}) if reports is not None else None
+            if stream_csv_cache(path, store_id=_store_id(store), report=report):
+                cached = read_cache(path, _store_id(store))
+        if cached is not None:
+            logger.info(f"Loaded from parquet cache: {path}")
+            results[path] = cached
+        else:
+            missing.append(path)
+            if os.path.exists(path):
+                fingerprints[path] = file_fingerprint(path)
+    if missing:
+        loaded = load_files(missing, max_workers=max_workers, on_progress=on_progress, reports=reports, store=store)
+        for path, result in loaded.items():
+            if path in fingerprints:
+                write_cache(path, result, fingerprints[path], _store_id(store))
+            results[path] = result
+    return {path: results[path] for path in paths}
+
+def drop_cache(path: str) -> None:
+    shutil.rmtree(cache_dir_for(path), ignore_errors=True)
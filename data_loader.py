@@ -1,8 +1,21 @@
 # C:\Users\user\OneDrive\Desktop\Workspace\ggAnalyze\data_loader.py
+import gc
 import os
+import re
+import time
 import logging
+import importlib.util
+import multiprocessing
+import zipfile
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+
+from categories import align_categories, category_savings, concat_frames, encode
+from data_schema import SCHEMAS, DATETIME, INT, FLOAT, CATEGORY, STRING, PHONE
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Листы, которые мы ожидаем
@@ -61,51 +74,333 @@ def standardize_columns(df: pd.DataFrame) -> pd.DataFrame:
         df = df.loc[:, ~df.columns.duplicated()]
     return df
 
-def custom_parse_date(s: str) -> pd.Timestamp:
-    try:
-        s = s.strip()
-        if not s:
-            return pd.NaT
-        date_part, time_part = [p for p in s.split(" ") if p][:2]
-        day, month, year = date_part.split(".")
-        hour, minute, second = time_part.split(":")
-        return pd.Timestamp(
-            int(year), int(month), int(day),
-            int(hour), int(minute), int(second)
-        )
-    except:
-        return pd.NaT
-
-def robust_parse_dates(ser: pd.Series, sheet: str) -> pd.Series:
-    ser = ser.replace({"nan": None, "NaN": None, "": None})
+# Известные форматы дат в порядке частоты в выгрузках. Каждый формат
+# применяется ко всей колонке сразу; строки, не подошедшие ни под один,
+# разбираются format="mixed" (dayfirst).
+DATE_FORMATS = [
+    "%d.%m.%Y %H:%M:%S",
+    "%d.%m.%Y %H:%M",
+    "%d.%m.%Y",
+    "ISO8601",
+    "%d/%m/%Y %H:%M:%S",
+    "%d/%m/%Y/%H:%M",
+    "%d/%m/%Y",
+]
+_EMPTY_DATES = ["", "nan", "NaN", "None", "NaT"]
+
+# лист -> формат, разобравший больше всего строк в прошлый раз; пробуется первым
+_SHEET_DATE_FORMATS: dict[str, str] = {}
+
+def _to_naive(parsed: pd.Series) -> pd.Series:
+    # ISO/mixed со смещением дают tz-aware (или object при разных смещениях);
+    # остальные даты в выгрузках локальные — оставляем местное время
+    if isinstance(parsed.dtype, pd.DatetimeTZDtype):
+        return parsed.dt.tz_localize(None)
+    if parsed.dtype == object:
+        return pd.to_datetime(
+            [t.tz_localize(None) if getattr(t, "tzinfo", None) else t for t in parsed],
+            errors="coerce",
+        ).to_series(index=parsed.index)
+    return parsed
+
+def robust_parse_dates(ser: pd.Series, sheet: str, stats: dict | None = None) -> pd.Series:
+    """
+    Векторный разбор колонки дат по списку DATE_FORMATS.
+    В stats (dict) прибавляется, сколько строк разобрал каждый формат
+    (плюс "mixed", "excel_serial", "datetime" и "unparsed"), так что при
+    разборе по чанкам счётчики копятся по всей колонке.
+    """
+    stats = stats if stats is not None else {}
     if pd.api.types.is_datetime64_any_dtype(ser):
+        stats["datetime"] = stats.get("datetime", 0) + int(ser.notna().sum())
         return ser
     if pd.api.types.is_numeric_dtype(ser):
-        return pd.to_datetime(ser, unit="d", origin="1899-12-30", errors="coerce")
+        parsed = pd.to_datetime(ser, unit="d", origin="1899-12-30", errors="coerce")
+        stats["excel_serial"] = stats.get("excel_serial", 0) + int(parsed.notna().sum())
+        return parsed
+
     clean = ser.astype(str).str.replace(r"\s+", " ", regex=True).str.strip()
-    parsed = pd.to_datetime(clean, format="%d.%m.%Y %H:%M:%S",
-                            errors="coerce", dayfirst=True)
-    mask = parsed.isna()
-    if mask.any():
-        fb = clean[mask].apply(custom_parse_date)
-        still = fb.isna()
-        if still.any():
-            fb.loc[still] = pd.to_datetime(
-                clean[mask][still],
-                errors="coerce",
-                infer_datetime_format=True,
-                dayfirst=True
-            )
-        parsed.loc[mask] = fb
-    return parsed
+    values = np.full(len(clean), np.datetime64("NaT"), dtype="datetime64[ns]")
+    todo = ~clean.isin(_EMPTY_DATES).to_numpy()
+
+    key = str(sheet).lower()
+    remembered = _SHEET_DATE_FORMATS.get(key)
+    formats = [remembered] + [f for f in DATE_FORMATS if f != remembered] if remembered else DATE_FORMATS
+    for fmt in formats + ["mixed"]:
+        if not todo.any():
+            break
+        idx = np.flatnonzero(todo)
+        kwargs = {"dayfirst": True} if fmt == "mixed" else {}
+        parsed = _to_naive(pd.to_datetime(clean.iloc[idx], format=fmt, errors="coerce", **kwargs))
+        ok = parsed.notna().to_numpy()
+        if ok.any():
+            values[idx[ok]] = parsed.to_numpy(dtype="datetime64[ns]")[ok]
+            todo[idx[ok]] = False
+            stats[fmt] = stats.get(fmt, 0) + int(ok.sum())
+    if todo.any():
+        stats["unparsed"] = stats.get("unparsed", 0) + int(todo.sum())
+
+    winner = max((f for f in stats if f in DATE_FORMATS), key=stats.get, default=None)
+    if winner:
+        _SHEET_DATE_FORMATS[key] = winner
+    if len(stats) > 1 or "unparsed" in stats:
+        logger.info("Dates in %r: %s", sheet, stats)
+    return pd.Series(values, index=ser.index, name=ser.name)
+
+def _to_int(ser: pd.Series) -> pd.Series:
+    num = pd.to_numeric(ser, errors="coerce")
+    if pd.api.types.is_float_dtype(num) and ((num.dropna() % 1) != 0).any():
+        # дробные значения в колонке id — оставляем float, чтобы ничего не потерять
+        return num
+    return num.astype("Int64")
+
+def _to_phone(ser: pd.Series) -> pd.Series:
+    if pd.api.types.is_numeric_dtype(ser):
+        return _to_int(ser).astype("string")
+    digits = (ser.astype("string")
+                 .str.replace(r"\.0$", "", regex=True)
+                 .str.replace(r"\D", "", regex=True))
+    return digits.mask(digits == "")
+
+def apply_schema(df: pd.DataFrame, kind: str, sheet: str, report: dict | None = None) -> pd.DataFrame:
+    """
+    Приводит колонки df к типам из data_schema.SCHEMAS[kind].
+    Колонки, которых нет в схеме, не трогаются; колонку, которую не удалось
+    привести, оставляем как есть и пишем в лог.
+    """
+    for col, kind_type in SCHEMAS.get(kind, {}).items():
+        if col not in df.columns:
+            continue
+        ser = df[col]
+        try:
+            if kind_type == DATETIME:
+                label = f"{sheet}/{col}"
+                df[col] = robust_parse_dates(ser, label, _date_stats(report, label))
+            elif kind_type == INT:
+                df[col] = _to_int(ser)
+            elif kind_type == FLOAT:
+                df[col] = pd.to_numeric(ser, errors="coerce").astype("float64")
+            elif kind_type == CATEGORY:
+                df[col] = encode(ser, col)
+                if report is not None:
+                    report.setdefault("categories", {})[f"{sheet}/{col}"] = category_savings(ser, df[col])
+            elif kind_type == STRING:
+                df[col] = ser.astype("string")
+            elif kind_type == PHONE:
+                df[col] = _to_phone(ser)
+        except (TypeError, ValueError) as exc:
+            logger.warning("Column %r in %r: cannot convert to %s (%s)", col, sheet, kind_type, exc)
+    return df
 
 # ──────────────────────────────────────────────────────────────────────────────
-# 1) load_data_from_file
+# 1) Чтение листов
 # ──────────────────────────────────────────────────────────────────────────────
-def load_data_from_file(path: str) -> dict:
+def drop_unnamed(df: pd.DataFrame) -> pd.DataFrame:
+    """Убирает автоматически созданные колонки "Unnamed: N" (по позиции, без выравнивания по ярлыкам)."""
+    col_strs = [str(col) for col in df.columns]
+    keep_idxs = [i for i, name in enumerate(col_strs) if not name.lower().startswith("unnamed")]
+    df.columns = col_strs
+    return df.iloc[:, keep_idxs]
+
+# Движки чтения xlsx в порядке предпочтения: calamine (Rust, потоковый) заметно
+# быстрее openpyxl и не держит в памяти объектную модель книги.
+# GGANALYZE_EXCEL_ENGINE=openpyxl|calamine принудительно выбирает движок.
+EXCEL_ENGINES = {"calamine": "python_calamine", "openpyxl": "openpyxl"}
+EXCEL_ENGINE = os.environ.get("GGANALYZE_EXCEL_ENGINE", "auto")
+
+def available_excel_engines() -> list[str]:
+    return [name for name, module in EXCEL_ENGINES.items() if importlib.util.find_spec(module)]
+
+def pick_excel_engine(engine: str | None = None) -> str:
+    """Движок для pd.ExcelFile: запрошенный, если установлен, иначе лучший доступный."""
+    engine = engine or EXCEL_ENGINE
+    available = available_excel_engines()
+    if engine != "auto":
+        if engine in available:
+            return engine
+        logger.warning("Excel engine %r is not installed; falling back", engine)
+    return available[0] if available else "openpyxl"
+
+def open_workbook(path: str, engine: str | None = None) -> pd.ExcelFile:
+    engine = pick_excel_engine(engine)
+    try:
+        return pd.ExcelFile(path, engine=engine)
+    except (ImportError, ValueError):
+        # старый pandas без поддержки calamine
+        if engine == "openpyxl":
+            raise
+        logger.warning("pandas cannot use engine %r; using openpyxl", engine)
+        return pd.ExcelFile(path, engine="openpyxl")
+
+def read_sheet(xls: pd.ExcelFile, sheet: str) -> tuple[pd.DataFrame, float]:
+    """Декодирует лист ровно один раз. Возвращает (df, секунды на чтение)."""
+    t0 = time.perf_counter()
+    df = drop_unnamed(pd.read_excel(xls, sheet_name=sheet))
+    return df, time.perf_counter() - t0
+
+def _date_stats(report: dict | None, label: str) -> dict | None:
+    """report["date_formats"][label] — счётчики форматов для robust_parse_dates."""
+    if report is None:
+        return None
+    return report.setdefault("date_formats", {}).setdefault(label, {})
+
+def route_sheet(result: dict, sheet: str, df: pd.DataFrame, report: dict | None = None, store=None,
+                source: str | None = None) -> None:
+    """
+    Нормализует лист, приводит типы по data_schema и кладёт его в нужный ключ result.
+    store (append_store.AppendStore) включает инкрементальный импорт заказов и
+    отмен: в result попадают только строки, которых в хранилище ещё не было;
+    source — путь файла, за которым хранилище запоминает ключи листа.
+    """
+    sl = sheet.lower()
+    df = standardize_columns(df)
+
+    # check for serve orders and cancellation sheets by column names
+    cols = set(df.columns.str.lower())
+    if ORDERS_HISTORY_COLUMN in cols:
+        result["serveOrders"] = _apply_growing(df, "serveOrders", sheet, report, store, source)
+        return
+    if CANCELLATIONS_COLUMN in cols:
+        result["cancellations"] = _apply_growing(df, "cancellations", sheet, report, store, source)
+        return
+
+    # — ggtips sheets —
+    if sl in GG_TIPS_SHEETS:
+        df = apply_schema(df, "ggtips", sheet, report)
+        if "uuid" in df.columns:
+            df = df.set_index("uuid", drop=False)
+        result["ggtips"][sl] = df
+        return
+
+    # — companies —
+    if sl in GG_COMPANIES_SHEETS:
+        result["ggtipsCompanies"][sl] = apply_schema(df, "ggtipsCompanies", sheet, report)
+        return
+
+    # — partners details —
+    if sl in GG_PARTNERS_SHEETS:
+        result["ggtipsPartners"][sl] = prepare_partners(df, sheet, report)
+        return
+
+    # — carseat orders —
+    if sl in CARSEAT_SHEETS:
+        result["carseat"] = prepare_carseat(df, sheet, report)
+        return
+
+    # — gg teammates —
+    if sl in GG_TEAMMATES_SHEETS:
+        result["ggTeammates"] = apply_schema(df, "ggTeammates", sheet, report)
+        return
+
+    # — orders count —
+    if sl in ORDERS_COUNT_SHEETS:
+        result["ordersCount"] = apply_schema(df, "ordersCount", sheet, report)
+        return
+
+    # — clients —
+    if sl in clients_SHEETS:
+        result["clients"] = apply_schema(df, "clients", sheet, report)
+        return
+
+    # — users mapping —
+    if sl in USERS_SHEETS:
+        result["users"] = apply_schema(df, "users", sheet, report)
+        return
+
+def _apply_growing(df: pd.DataFrame, kind: str, sheet: str, report: dict | None, store,
+                   source: str | None = None) -> pd.DataFrame:
+    # растущие выгрузки: с хранилищем типы приводятся только у новых строк
+    if store is not None:
+        return store.ingest(kind, df, sheet, report, source)
+    return prepare_growing(df, kind, sheet, report)
+
+# интервалы serve orders в формате Postgres: '0 years 0 mons 0 days 0 hours 3 mins 10.5 secs'
+INTERVAL_UNIT_SECONDS = {"year": 365 * 86400, "mon": 30 * 86400, "day": 86400, "hour": 3600, "min": 60, "sec": 1}
+INTERVAL_PATTERN = re.compile(
+    r"^\s*" + r"\s*".join(rf"(?:(?P<{unit}>\d+(?:\.\d+)?)\s*{unit}s?)?" for unit in INTERVAL_UNIT_SECONDS) + r"\s*$"
+)
+# любые пары «число единица» — для строк не в формате Postgres (порядок, повторы)
+INTERVAL_TOKEN = re.compile(r"(\d+(?:\.\d+)?)\s*(year|mon|day|hour|min|sec)s?")
+
+def parse_interval_seconds(ser: pd.Series) -> pd.Series:
+    """
+    Текстовые интервалы -> секунды (float64). Формат Postgres разбирается
+    одним str.extract по колонкам единиц (Arrow-строки: regex в C++), прочие
+    строки — поиском всех пар «число единица», повторы складываются.
+    Год — 365 дней, месяц — 30. Пустые и нераспознанные значения -> 0.
+    """
+    text = ser.astype("string").astype(pd.ArrowDtype(pa.string())).str.lower().reset_index(drop=True)
+    units = (text.str.extract(INTERVAL_PATTERN.pattern)
+                 .astype(pd.ArrowDtype(pa.float64()))
+                 .to_numpy(dtype="float64", na_value=np.nan))
+    seconds = np.nan_to_num(units) @ np.array(list(INTERVAL_UNIT_SECONDS.values()), dtype="float64")
+
+    other = text.notna().to_numpy(bool) & np.isnan(units).all(axis=1)
+    if other.any():
+        parts = text[other].astype(object).str.extractall(INTERVAL_TOKEN)
+        found = (pd.to_numeric(parts[0]) * parts[1].map(INTERVAL_UNIT_SECONDS)).groupby(level=0).sum()
+        seconds[found.index.to_numpy()] = found.to_numpy(dtype="float64")
+    return pd.Series(seconds, index=ser.index, name=ser.name)
+
+def add_serve_intervals(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    accepted_seconds / arrived_minutes (float) из acceptedinterval /
+    arrivedinterval. Уже посчитанные колонки не пересчитываются.
+    """
+    if "acceptedinterval" in df.columns and "accepted_seconds" not in df.columns:
+        df["accepted_seconds"] = parse_interval_seconds(df["acceptedinterval"])
+    if "arrivedinterval" in df.columns and "arrived_minutes" not in df.columns:
+        df["arrived_minutes"] = parse_interval_seconds(df["arrivedinterval"]) / 60.0
+    return df
 
-    logger.info(f"Loading file: {path}")
-    result = {
+def prepare_serve_orders(df: pd.DataFrame, sheet: str, report: dict | None = None) -> pd.DataFrame:
+    return add_serve_intervals(apply_schema(df, "serveOrders", sheet, report))
+
+def prepare_growing(df: pd.DataFrame, kind: str, sheet: str, report: dict | None = None) -> pd.DataFrame:
+    """apply_schema растущей выгрузки плюс её производные колонки."""
+    if kind == "serveOrders":
+        return prepare_serve_orders(df, sheet, report)
+    return apply_schema(df, kind, sheet, report)
+
+# jsonagg партнёра — [{"account": ...}, ...]: Idram есть, если хотя бы один
+# account не null, не "" и не "null"
+IDRAM_ACCOUNT_PATTERN = r'"account"\s*:\s*(?:"(?!(?:null)?")|(?!null\b)[^\s,}\]"])'
+
+# служебные колонки add_partner_flags — нужны фильтрам сайдбара, не вкладкам
+PARTNER_FLAGS = ["has_idram", "has_message"]
+
+def add_partner_flags(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Булевы колонки партнёров для фильтров сайдбара:
+      has_idram   — в jsonagg есть непустой account
+      has_message — partnermessage не пустое и не "nan"
+    """
+    if "jsonagg" in df.columns:
+        found = df["jsonagg"].astype("string").str.contains(IDRAM_ACCOUNT_PATTERN, regex=True)
+        df["has_idram"] = found.fillna(False).astype(bool)
+    if "partnermessage" in df.columns:
+        msg = df["partnermessage"]
+        text = msg.astype("string")
+        has = msg.notna() & text.str.strip().ne("") & text.str.lower().ne("nan")
+        if not pd.api.types.is_string_dtype(msg):
+            has &= msg.ne(0)  # 0 / False — пустое сообщение
+        df["has_message"] = has.fillna(False).astype(bool)
+    return df
+
+def prepare_partners(df: pd.DataFrame, sheet: str, report: dict | None = None) -> pd.DataFrame:
+    return add_partner_flags(apply_schema(df, "ggtipsPartners", sheet, report))
+
+def prepare_carseat(df: pd.DataFrame, sheet: str, report: dict | None = None) -> pd.DataFrame:
+    df = df.drop(columns=[c for c in ["options", "count"] if c in df.columns])
+    if "statusid" in df.columns:
+        df["statusid"] = df["statusid"].replace({4: 5})
+    return apply_schema(df, "carseat", sheet, report)
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 2) load_data_from_file
+# ──────────────────────────────────────────────────────────────────────────────
+def empty_result() -> dict:
+    return {
         "ggtips": {k: pd.DataFrame() for k in GG_TIPS_SHEETS},
         "ggtipsCompanies": {k: pd.DataFrame() for k in GG_COMPANIES_SHEETS},
         "ggtipsPartners": {k: pd.DataFrame() for k in GG_PARTNERS_SHEETS},
@@ -119,136 +414,46 @@ def load_data_from_file(path: str) -> dict:
         "users": pd.DataFrame(),
     }
 
+def load_data_from_file(path: str, report: dict | None = None, engine: str | None = None, store=None) -> dict:
+    """
+    Читает .xlsx/.csv и раскладывает листы по ключам result.
+    engine — движок xlsx (см. pick_excel_engine), по умолчанию лучший доступный.
+    store — append-only хранилище для инкрементального импорта (см. route_sheet).
+    Если передан report (dict), в report["timings"] пишутся секунды
+    на чтение каждого листа: {sheet: seconds}, в report["engine"] — движок,
+    в report["date_formats"] — {"лист/колонка": {формат: строк}} из robust_parse_dates,
+    в report["categories"] — {"лист/колонка": {"before": байт, "after": байт}}.
+    """
+    logger.info(f"Loading file: {path}")
+    result = empty_result()
+    timings = report.setdefault("timings", {}) if report is not None else {}
+
     if not os.path.exists(path):
         logger.error(f"File not found: {path}")
         return result
 
     ext = path.lower().split('.')[-1]
     if ext == "xlsx":
-        xls = pd.ExcelFile(path)
+        xls = open_workbook(path, engine)
+        if report is not None:
+            report["engine"] = xls.engine
         for sheet in xls.sheet_names:
-            sl = sheet.lower()
-            df = pd.read_excel(xls, sheet_name=sheet)
-            # Drop any automatically generated "Unnamed" columns
-
-            df.columns = df.columns.map(str)                 # все имена → строка
-            def drop_unnamed(df: pd.DataFrame) -> pd.DataFrame:
-                # 1) Приводим все имена столбцов к строкам
-                col_strs = [str(col) for col in df.columns]
-
-                # 2) Собираем булеву маску: True там, где имя начинается на "unnamed"
-                mask = [name.lower().startswith("unnamed") for name in col_strs]
-
-                # 3) Перезаписываем в DataFrame «чистые» строковые имена
-                df.columns = col_strs
-
-                # 4) Фильтруем по позиции: оставляем те, у которых mask==False
-                #    Через iloc здесь надёжнее, чем через loc, чтобы не было выравнивания по ярлыкам
-                keep_idxs = [i for i, is_unnamed in enumerate(mask) if not is_unnamed]
-                return df.iloc[:, keep_idxs]
-
-
-            df = drop_unnamed(pd.read_excel(xls, sheet_name=sheet))
-            df = standardize_columns(df)
-
-            # check for serve orders and cancellation sheets by column names
-            cols = set(df.columns.str.lower())
-            if ORDERS_HISTORY_COLUMN in cols:
-                if "orderdate1" in df.columns:
-                    df["orderdate1"] = pd.to_datetime(
-                        df["orderdate1"], format="%d/%m/%Y/%H:%M", errors="coerce"
-                    )
-                result["serveOrders"] = df
-                continue
-            if CANCELLATIONS_COLUMN in cols:
-                if "createdat" in df.columns:
-                    df["createdat"] = pd.to_datetime(
-                        df["createdat"], format="%d.%m.%Y %H:%M", errors="coerce"
-                    )
-                if "canceldate" in df.columns:
-                    df["canceldate"] = pd.to_datetime(
-                        df["canceldate"], format="%d.%m.%Y %H:%M", errors="coerce"
-                    )
-                result["cancellations"] = df
-                continue
-
-            # — ggtips sheets —
-            if sl in GG_TIPS_SHEETS:
-                if "date" in df.columns:
-                    df["date"] = robust_parse_dates(df["date"], sheet)
-                if "uuid" in df.columns:
-                    df = df.set_index("uuid", drop=False)
-                result["ggtips"][sl] = df
-                continue
-
-            # — companies —
-            if sl in GG_COMPANIES_SHEETS:
-                if "date" in df.columns:
-                    df["date"] = robust_parse_dates(df["date"], sheet)
-                result["ggtipsCompanies"][sl] = df
-                continue
-
-            # — partners details —
-            if sl in GG_PARTNERS_SHEETS:
-                if "date" in df.columns:
-                    df["date"] = robust_parse_dates(df["date"], sheet)
-                result["ggtipsPartners"][sl] = df
-                continue
-
-            # — carseat orders —
-            if sl in CARSEAT_SHEETS:
-                df = df.drop(columns=[c for c in ["options", "count"] if c in df.columns])
-                if "statusid" in df.columns:
-                    df["statusid"] = df["statusid"].replace({4: 5})
-                if "createdat" in df.columns:
-                    df["createdat"] = pd.to_datetime(df["createdat"], errors="coerce", dayfirst=True)
-                result["carseat"] = df
-                continue
-
-            # — gg teammates —
-            if sl in GG_TEAMMATES_SHEETS:
-                result["ggTeammates"] = df
-                continue
-
-            # — orders count —
-            if sl in ORDERS_COUNT_SHEETS:
-                if "date" in df.columns:
-                    df["date"] = robust_parse_dates(df["date"], sheet)
-                result["ordersCount"] = df
-                continue
-
-            # — clients —
-            if sl in clients_SHEETS:
-                if "date" in df.columns:
-                    df["date"] = robust_parse_dates(df["date"], sheet)
-                result["clients"] = df
-                continue
-
-            # — users mapping —
-            if sl in USERS_SHEETS:
-                result["users"] = df
-                continue
+            df, seconds = read_sheet(xls, sheet)
+            timings[sheet] = seconds
+            logger.info("Sheet %r: %d rows in %.3fs", sheet, len(df), seconds)
+            route_sheet(result, sheet, df, report, store, path)
 
     elif ext == "csv":
-        # если нужен CSV
-        df = pd.read_csv(path)
-        df = df.loc[:, ~df.columns.str.lower().str.startswith("unnamed")]
-        df = standardize_columns(df)
-       
-        cols = set(df.columns.str.lower())
-        if os.path.basename(path).lower().startswith('carseat') or CARSEAT_SHEETS.issubset(cols):
-            df = df.drop(columns=[c for c in ["options", "count"] if c in df.columns])
-            if "statusid" in df.columns:
-                df["statusid"] = df["statusid"].replace({4: 5})
-            if "createdat" in df.columns:
-                df["createdat"] = pd.to_datetime(df["createdat"], errors="coerce", dayfirst=True)
-            result["carseat"] = df
-        elif USERS_SHEETS.intersection(cols):
-            result["users"] = df
-        else:
-            if "date" in df.columns:
-                df["date"] = robust_parse_dates(df["date"], path)
-            result["ggtips"] = {"csv": df}
+        # CSV читается кусками: сырой текст — по одному куску, но результат —
+        # весь типизированный файл (потоковая запись без него — data_cache.stream_csv_cache)
+        chunks = list(iter_csv_chunks(path, report))
+        if chunks:
+            key = chunks[0][0]
+            df = concat_frames([chunk for _, chunk in chunks], ignore_index=True)
+            if key == "ggtips":
+                result["ggtips"] = {"csv": df}
+            else:
+                result[key] = df
 
     else:
         logger.error("Unsupported extension: must be .xlsx or .csv")
@@ -256,14 +461,200 @@ def load_data_from_file(path: str) -> dict:
     return result
 
 # ──────────────────────────────────────────────────────────────────────────────
-# 2) Вспомогательные функции для слияния
+# 2a) Потоковое чтение CSV
+# ──────────────────────────────────────────────────────────────────────────────
+CSV_CHUNK_ROWS = int(os.environ.get("GGANALYZE_CSV_CHUNK_ROWS", 200_000))
+
+def csv_kind(name: str, cols: set[str]) -> str:
+    """Ключ result для CSV по имени файла и колонкам первого куска."""
+    if name.lower().startswith('carseat') or CARSEAT_SHEETS.issubset(cols):
+        return "carseat"
+    if USERS_SHEETS.intersection(cols):
+        return "users"
+    return "ggtips"
+
+def _first_seen(hashes: np.ndarray, present: np.ndarray, seen: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Какие строки куска — первое вхождение своего хэша: его нет в seen
+    (отсортированные хэши прошлых кусков) и выше в куске. Возвращает маску и
+    seen, дополненный новыми хэшами строк с present.
+    """
+    order = np.argsort(hashes, kind="stable")  # повторы идут в порядке строк
+    ordered = hashes[order]
+    first = np.r_[True, ordered[1:] != ordered[:-1]] if len(ordered) else np.zeros(0, bool)
+    if len(seen):
+        pos = np.searchsorted(seen, ordered).clip(max=len(seen) - 1)
+        first &= seen[pos] != ordered
+    # оба массива отсортированы — stable sort (timsort) сливает их за линию
+    seen = np.concatenate([seen, ordered[first & present[order]]])
+    seen.sort(kind="stable")
+    mask = np.empty(len(hashes), bool)
+    mask[order] = first
+    return mask, seen
+
+def iter_csv_chunks(path: str, report: dict | None = None, chunk_rows: int | None = None):
+    """
+    Читает CSV кусками по chunk_rows строк и отдаёт (ключ result, кусок):
+    каждый кусок уже нормализован (standardize_columns) и приведён к схеме.
+    Вид данных определяется по первому куску. Для ggtips повторные uuid
+    (в т.ч. из прошлых кусков) отбрасываются — остаётся первое вхождение;
+    прошлые uuid сверяются по 64-битным хэшам. Память — один кусок плюс
+    8 байт на уникальный uuid, а не весь файл.
+    """
+    name = os.path.basename(path)
+    timings = report.setdefault("timings", {}) if report is not None else {}
+    timings[name] = 0.0
+    # отсортированные 64-битные хэши uuid прошлых кусков (8 байт на строку)
+    key, seen, dropped = None, np.empty(0, np.uint64), 0
+
+    reader = pd.read_csv(path, chunksize=chunk_rows or CSV_CHUNK_ROWS)
+    while True:
+        # промежуточные Series прошлого куска держит цикл ссылок через кэш
+        # аксессора .str — без сборки каждый кусок остаётся в памяти до gc
+        gc.collect()
+        t0 = time.perf_counter()
+        df = next(reader, None)
+        timings[name] += time.perf_counter() - t0
+        if df is None:
+            break
+        df = df.loc[:, ~df.columns.str.lower().str.startswith("unnamed")]
+        df = standardize_columns(df)
+        if key is None:
+            key = csv_kind(name, set(df.columns.str.lower()))
+
+        if key == "carseat":
+            df = prepare_carseat(df, name, report)
+        else:
+            df = apply_schema(df, key, name, report)
+            if key == "ggtips" and "uuid" in df.columns:
+                present = df["uuid"].notna().to_numpy()
+                hashes = pd.util.hash_pandas_object(df["uuid"], index=False, categorize=False).to_numpy()
+                first, seen = _first_seen(hashes, present, seen)
+                repeat = present & ~first
+                if repeat.any():
+                    dropped += int(repeat.sum())
+                    df = df.loc[~repeat]
+        yield key, df
+
+    if dropped:
+        logger.info("CSV %r: dropped %d rows with repeated uuid", name, dropped)
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 3) Параллельная загрузка: файлы и листы внутри книги — в пуле процессов
+# ──────────────────────────────────────────────────────────────────────────────
+DEFAULT_IMPORT_WORKERS = int(os.environ.get("GGANALYZE_IMPORT_WORKERS", min(4, os.cpu_count() or 1)))
+
+def xlsx_sheet_names(path: str) -> list[str]:
+    """Имена листов из xl/workbook.xml — без разбора самих листов."""
+    try:
+        with zipfile.ZipFile(path) as z:
+            root = ET.fromstring(z.read("xl/workbook.xml"))
+        ns = root.tag[:root.tag.index("}") + 1] if root.tag.startswith("{") else ""
+        return [el.get("name") for el in root.iter(f"{ns}sheet")]
+    except (KeyError, ValueError, zipfile.BadZipFile, ET.ParseError):
+        return open_workbook(path).sheet_names
+
+# ExcelFile, открытые воркером: соседние листы той же книги не открывают её заново
+_WORKER_BOOKS: dict[tuple[str, str], pd.ExcelFile] = {}
+
+def _read_sheet_job(path: str, sheet: str, engine: str) -> tuple[pd.DataFrame, float]:
+    xls = _WORKER_BOOKS.get((path, engine))
+    if xls is None:
+        xls = _WORKER_BOOKS[(path, engine)] = open_workbook(path, engine)
+    return read_sheet(xls, sheet)
+
+def _load_file_job(path: str, engine: str) -> tuple[dict, dict]:
+    report = {}
+    return load_data_from_file(path, report=report, engine=engine), report
+
+def _run_pool(units, workers, ctx, engine, sheets_read, whole_files, on_progress) -> None:
+    total = len(units)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        futures = {}
+        for path, sheet in units:
+            if sheet is None:
+                futures[pool.submit(_load_file_job, path, engine)] = (path, None)
+            else:
+                futures[pool.submit(_read_sheet_job, path, sheet, engine)] = (path, sheet)
+        for done, fut in enumerate(as_completed(futures), start=1):
+            path, sheet = futures[fut]
+            if sheet is None:
+                whole_files[path] = fut.result()
+            else:
+                sheets_read[path][sheet] = fut.result()
+            if on_progress:
+                on_progress(done, total, f"{os.path.basename(path)}" + (f" / {sheet}" if sheet else ""))
+
+def load_files(paths: list[str], max_workers: int | None = None, on_progress=None,
+               reports: dict | None = None, engine: str | None = None, store=None) -> dict:
+    """
+    Загружает несколько файлов. Листы xlsx читаются параллельно в пуле
+    процессов, затем раскладываются route_sheet в исходном порядке листов,
+    поэтому результат совпадает с последовательным load_data_from_file.
+
+    on_progress(done, total, label) вызывается после каждого листа/файла.
+    reports (dict) получает {path: report} с таймингами листов.
+    store передаётся в route_sheet; разбор с ним идёт в этом процессе,
+    в воркерах только чтение листов.
+    Возвращает {path: result}.
+    """
+    max_workers = DEFAULT_IMPORT_WORKERS if max_workers is None else max_workers
+    reports = reports if reports is not None else {}
+    engine = pick_excel_engine(engine)  # выбираем один раз, а не в каждом воркере
+
+    # единицы работы: (path, sheet) для xlsx, (path, None) для csv и прочего
+    units = []
+    for path in paths:
+        if path.lower().endswith(".xlsx") and os.path.exists(path):
+            units.extend((path, sheet) for sheet in xlsx_sheet_names(path))
+        else:
+            units.append((path, None))
+    total = len(units)
+
+    if max_workers <= 1 or total <= 1:
+        results = {}
+        for i, path in enumerate(paths):
+            reports[path] = {}
+            results[path] = load_data_from_file(path, report=reports[path], engine=engine, store=store)
+            if on_progress:
+                on_progress(i + 1, len(paths), os.path.basename(path))
+        return results
+
+    sheets_read: dict[str, dict] = {p: {} for p in paths}
+    whole_files: dict[str, tuple[dict, dict]] = {}
+    ctx = multiprocessing.get_context("spawn")  # fork небезопасен внутри сервера Streamlit
+    try:
+        _run_pool(units, min(max_workers, total), ctx, engine, sheets_read, whole_files, on_progress)
+    except BrokenProcessPool:
+        logger.exception("Import process pool failed; loading files serially")
+        return load_files(paths, max_workers=1, on_progress=on_progress, reports=reports, engine=engine, store=store)
+
+    results = {}
+    for path in paths:
+        if path in whole_files:
+            results[path], reports[path] = whole_files[path]
+            continue
+        logger.info(f"Loading file: {path}")
+        result = empty_result()
+        reports.setdefault(path, {})["engine"] = engine
+        timings = reports[path].setdefault("timings", {})
+        for sheet in xlsx_sheet_names(path):
+            df, seconds = sheets_read[path][sheet]
+            timings[sheet] = seconds
+            route_sheet(result, sheet, df, reports[path], store, path)
+        results[path] = result
+    return results
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 4) Вспомогательные функции для слияния
 # ──────────────────────────────────────────────────────────────────────────────
 def merge_ggtips(sheets: dict[str, pd.DataFrame]) -> pd.DataFrame:
     order = ["alltips", "ggpayers", "superadmin"]
     dfs = [sheets[k] for k in order if k in sheets and not sheets[k].empty]
     if not dfs:
         return pd.DataFrame()
-    # комбинируем с приоритетом
+    # комбинируем с приоритетом; общие категории, чтобы combine_first не уронил их в object
+    dfs = align_categories(dfs)
     base = dfs[0].copy()
     for df in dfs[1:]:
         base = base.combine_first(df)
@@ -284,7 +675,7 @@ def merge_partners(sheets: dict[str, pd.DataFrame]) -> pd.DataFrame:
     return dfs[0].reset_index(drop=True)
 
 # ──────────────────────────────────────────────────────────────────────────────
-# 3) Собираем всё вместе
+# 5) Собираем всё вместе
 # ──────────────────────────────────────────────────────────────────────────────
 def get_combined_data(session_data) -> dict:
     """
@@ -314,7 +705,7 @@ def get_combined_data(session_data) -> dict:
         df = merge_ggtips(d.get("ggtips", {}))
         if not df.empty:
             all_tips.append(df)
-    combined_tips = pd.concat(all_tips, ignore_index=True) if all_tips else pd.DataFrame()
+    combined_tips = concat_frames(all_tips, ignore_index=True) if all_tips else pd.DataFrame()
 
     # 2) companies
     companies = pd.DataFrame()
@@ -346,7 +737,7 @@ def get_combined_data(session_data) -> dict:
         oc = d.get("ordersCount", pd.DataFrame())
         if not oc.empty:
             orders.append(oc)
-    combined_orders = pd.concat(orders, ignore_index=True) if orders else pd.DataFrame()
+    combined_orders = concat_frames(orders, ignore_index=True) if orders else pd.DataFrame()
 
     # 6) clients
     clients = pd.DataFrame()
@@ -388,8 +779,8 @@ def get_combined_data(session_data) -> dict:
         if not df.empty:
             users_frames.append(df)
 
-    combined_carseat = pd.concat(carseat_frames, ignore_index=True) if carseat_frames else pd.DataFrame()
-    combined_users = pd.concat(users_frames, ignore_index=True) if users_frames else pd.DataFrame()
+    combined_carseat = concat_frames(carseat_frames, ignore_index=True) if carseat_frames else pd.DataFrame()
+    combined_users = concat_frames(users_frames, ignore_index=True) if users_frames else pd.DataFrame()
     
     return {
         "ggtips": combined_tips,
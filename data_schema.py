@@ -0,0 +1,107 @@
+# data_schema.py
+"""
+Схемы колонок для каждого вида данных, которые раскладывает load_data_from_file.
+
+Ключ верхнего уровня — ключ result ("ggtips", "serveOrders", ...), значение —
+{колонка: тип}. Имена колонок уже после standardize_columns. Лоадер приводит
+типы один раз (data_loader.apply_schema), поэтому вкладки не должны заново
+вызывать pd.to_datetime / pd.to_numeric / astype(str) на этих колонках.
+
+Типы:
+  DATETIME — datetime64[ns] через robust_parse_dates (строки, Excel-числа, даты)
+  INT      — nullable Int64 (id, счётчики)
+  FLOAT    — float64 (суммы, дистанции)
+  CATEGORY — category с общим на процесс словарём (categories.encode):
+             повторяющиеся значения — компания, партнёр, регион, статус, тариф
+  STRING   — string (свободный текст, который сравнивают как строку)
+  PHONE    — string из одних цифр: 37491123456 / "+374 91 123456" -> "37491123456"
+"""
+
+DATETIME = "datetime"
+INT      = "int"
+FLOAT    = "float"
+CATEGORY = "category"
+STRING   = "string"
+PHONE    = "phone"
+
+SCHEMAS: dict[str, dict[str, str]] = {
+    "ggtips": {
+        "date": DATETIME,
+        "amount": FLOAT,
+        "status": CATEGORY,
+        "payment processor": CATEGORY,
+        "company": CATEGORY,
+        "partner": CATEGORY,
+        "region": CATEGORY,
+    },
+    "ggtipsCompanies": {
+        "date": DATETIME,
+        "start": DATETIME,
+        "end": DATETIME,
+        "working status": CATEGORY,
+        "company": CATEGORY,
+        "region": CATEGORY,
+    },
+    "ggtipsPartners": {
+        "date": DATETIME,
+        "phonenumber": PHONE,
+        "company": CATEGORY,
+    },
+    "ggTeammates": {
+        "number": PHONE,
+    },
+    "ordersCount": {
+        "date": DATETIME,
+        "userid": INT,
+        "orders": INT,
+    },
+    "clients": {
+        "date": DATETIME,
+        "userid": INT,
+        "mobile": PHONE,
+        "company": CATEGORY,
+        "companymanager": CATEGORY,
+    },
+    "serveOrders": {
+        "orderid": INT,
+        "corporateclientid": INT,
+        "userid": INT,
+        "profileid": INT,
+        "userpaymentid": INT,
+        "usermobile": PHONE,
+        "orderdate1": DATETIME,
+        "distance": FLOAT,
+        "fare": FLOAT,
+        "surgeprice": FLOAT,
+        "tip": FLOAT,
+        "promoamount": FLOAT,
+        "rating": FLOAT,
+        "tariff": CATEGORY,
+        "profilename": CATEGORY,
+    },
+    "cancellations": {
+        "orderid": INT,
+        "userid": INT,
+        "corporateclientid": INT,
+        "mobile": PHONE,
+        "date": DATETIME,
+        "canceldate": DATETIME,
+        "tariff": CATEGORY,
+    },
+    "carseat": {
+        "orderid": INT,
+        "userid": INT,
+        "statusid": INT,
+        "date": DATETIME,
+        "fare": FLOAT,
+    },
+    "users": {
+        "userid": INT,
+        "profileid": INT,
+        "userpaymentid": INT,
+        "tin": INT,
+        "mobile": PHONE,
+        "company": CATEGORY,
+        "companymanager": CATEGORY,
+    },
+}
@@ -0,0 +1,222 @@
+# dataset_store.py
+"""
+Общий на процесс реестр загруженных датасетов (DatasetRegistry, ключ —
+отпечаток содержимого файла): сессии хранят только ссылки на Dataset.
+Плюс кэш производных структур по версии фрейма (cached / cached_by_version).
+"""
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from data_cache import file_fingerprint
+
+logger = logging.getLogger(__name__)
+
+# сколько последних ключей держать на имя в cached()
+CACHE_SIZE = 4
+
+_CACHED: dict[str, OrderedDict] = {}
+_CACHED_LOCK = threading.Lock()
+
+
+def _iter_frames(data: dict):
+    for key, value in data.items():
+        if isinstance(value, dict):
+            for sheet, df in value.items():
+                if isinstance(df, pd.DataFrame):
+                    yield f"{key}/{sheet}", df
+        elif isinstance(value, pd.DataFrame):
+            yield key, value
+
+def frame_nbytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+def frame_version(df: pd.DataFrame) -> str | None:
+    """Хэш содержимого и типов df (без индекса); None, если его не посчитать."""
+    try:
+        hashed = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    except TypeError:  # нехэшируемые значения в ячейках
+        return None
+    h = hashlib.sha256(hashed.tobytes())
+    h.update(repr([(c, str(t)) for c, t in df.dtypes.items()]).encode())
+    return h.hexdigest()
+
+def cached(name: str, key, build, *args, size: int = CACHE_SIZE):
+    """
+    build(*args), общий на процесс: последние size ключей на name, самый
+    давний вытесняется. key=None — без кэша. Результат только для чтения.
+    """
+    if key is None:
+        return build(*args)
+    with _CACHED_LOCK:
+        entries = _CACHED.setdefault(name, OrderedDict())
+        if key in entries:
+            entries.move_to_end(key)
+            return entries[key]
+    value = build(*args)
+    with _CACHED_LOCK:
+        entries[key] = value
+        entries.move_to_end(key)
+        while len(entries) > size:
+            entries.popitem(last=False)
+    return value
+
+def cached_by_version(name: str, frame: pd.DataFrame, build, size: int = CACHE_SIZE):
+    """build(frame), один на версию frame (frame_version); без версии — без кэша."""
+    return cached(name, frame_version(frame), build, frame, size=size)
+
+def clear_cached(prefix: str = "") -> None:
+    """Сбрасывает кэши cached() с именами, начинающимися на prefix."""
+    with _CACHED_LOCK:
+        for name in [n for n in _CACHED if n.startswith(prefix)]:
+            del _CACHED[name]
+
+
+class Dataset(dict):
+    """
+    Результат load_data_from_file, общий для всех сессий.
+    Только для чтения: перед изменением DataFrame делайте .copy().
+    """
+
+    def __init__(self, data: dict, fingerprint: str, path: str):
+        super().__init__(data)
+        self.fingerprint = fingerprint
+        self.paths = {path}
+        self.frame_bytes = {name: frame_nbytes(df) for name, df in _iter_frames(data)}
+        self.nbytes = sum(self.frame_bytes.values())
+        self.rows = sum(len(df) for _, df in _iter_frames(data))
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("Dataset is shared between sessions and read-only")
+
+    __setitem__ = __delitem__ = _readonly
+    pop = popitem = clear = update = setdefault = _readonly
+
+
+class DatasetRegistry:
+    """
+    Потокобезопасный реестр Dataset-ов, ключ — sha256 содержимого файла.
+    loader(path) -> dict вызывается только при промахе.
+    """
+
+    def __init__(self, loader):
+        self._loader = loader
+        self._lock = threading.RLock()
+        self._load_locks: dict[str, threading.Lock] = {}
+        self._datasets: dict[str, Dataset] = {}
+        # path -> (size, mtime_ns, fingerprint): не пересчитываем хэш, пока файл не менялся
+        self._paths: dict[str, tuple[int, int, str]] = {}
+
+    # ── отпечатки ──────────────────────────────────────────────────────────
+    def fingerprint(self, path: str) -> str:
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        known = self._paths.get(path)
+        if known and known[:2] == (st.st_size, st.st_mtime_ns):
+            return known[2]
+        fp = file_fingerprint(path)["sha256"]
+        with self._lock:
+            self._detach(path)
+            self._paths[path] = (st.st_size, st.st_mtime_ns, fp)
+        return fp
+
+    def _detach(self, path: str) -> None:
+        """Отвязывает path от старого датасета (файл перезаписан или удалён)."""
+        known = self._paths.pop(path, None)
+        if not known:
+            return
+        ds = self._datasets.get(known[2])
+        if ds is None:
+            return
+        ds.paths.discard(path)
+        if not ds.paths:
+            del self._datasets[known[2]]
+            logger.info("Released dataset %s (%.1f MB)", known[2][:12], ds.nbytes / 2**20)
+
+    # ── доступ ─────────────────────────────────────────────────────────────
+    def get(self, path: str) -> Dataset:
+        """Возвращает общий Dataset для файла, загружая его при первом обращении."""
+        path = os.path.abspath(path)
+        fp = self.fingerprint(path)
+        with self._lock:
+            ds = self._datasets.get(fp)
+            if ds is not None:
+                ds.paths.add(path)
+                return ds
+            load_lock = self._load_locks.setdefault(fp, threading.Lock())
+
+        # грузим вне общего лока, чтобы другие файлы не ждали;
+        # параллельные сессии с тем же файлом ждут первую загрузку
+        with load_lock:
+            with self._lock:
+                ds = self._datasets.get(fp)
+            if ds is None:
+                ds = Dataset(self._loader(path), fp, path)
+                with self._lock:
+                    ds = self._datasets.setdefault(fp, ds)
+                    self._load_locks.pop(fp, None)
+        with self._lock:
+            ds.paths.add(path)
+        return ds
+
+    def get_many(self, paths: list[str], batch_loader=None) -> dict[str, Dataset]:
+        """
+        Как get() для нескольких файлов. Промахи загружаются одним вызовом
+        batch_loader([path, ...]) -> {path: dict}, чтобы их можно было разобрать
+        параллельно; без batch_loader — по одному через loader.
+        """
+        abspaths = [os.path.abspath(p) for p in paths]
+        missing = [p for p in abspaths if p not in self]
+        if missing and batch_loader is not None:
+            fps = {p: self.fingerprint(p) for p in missing}
+            with self._lock:
+                todo = [p for p in missing if fps[p] not in self._datasets]
+            # один файл на отпечаток: копии того же содержимого не разбираем дважды
+            unique = {}
+            for p in todo:
+                unique.setdefault(fps[p], p)
+            unique = list(unique.values())
+            loaded = batch_loader(unique) if unique else {}
+            with self._lock:
+                for path, data in loaded.items():
+                    self._datasets.setdefault(fps[path], Dataset(data, fps[path], path))
+        return {path: self.get(abs_) for path, abs_ in zip(paths, abspaths)}
+
+    def release(self, path: str) -> None:
+        """Файл удалён: освобождаем датасет, если на него больше нет путей."""
+        with self._lock:
+            self._detach(os.path.abspath(path))
+
+    def clear(self) -> None:
+        """Освобождает все датасеты: следующий get() загрузит файлы заново."""
+        with self._lock:
+            self._datasets.clear()
+            self._paths.clear()
+
+    def prune(self) -> None:
+        """Освобождает датасеты файлов, удалённых с диска (в т.ч. из другой сессии)."""
+        with self._lock:
+            for path in [p for p in self._paths if not os.path.exists(p)]:
+                self._detach(path)
+
+    def __contains__(self, path: str) -> bool:
+        path = os.path.abspath(path)
+        known = self._paths.get(path)
+        return known is not None and known[2] in self._datasets
+
+    # ── отчёт по памяти ───────────────────────────────────────────────────
+    def memory_report(self) -> pd.DataFrame:
+        with self._lock:
+            datasets = list(self._datasets.values())
+        rows = [{
+            "files": ", ".join(sorted(os.path.basename(p) for p in ds.paths)),
+            "fingerprint": ds.fingerprint[:12],
+            "frames": len(ds.frame_bytes),
+            "rows": ds.rows,
+            "memory_mb": round(ds.nbytes / 2**20, 2),
+        } for ds in datasets]
+        return pd.DataFrame(rows, columns=["files", "fingerprint", "frames", "rows", "memory_mb"])
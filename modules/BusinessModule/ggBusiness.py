@@ -1,7 +1,7 @@
 # modules/BusinessModule/ggBusiness.py
 
 import streamlit as st
-from modules.data_import import upload_file
+from modules.data_import import upload_file, get_append_store
 from modules.BusinessModule.ggBusinessTabs import ordersTab, activationsTab, serveAnalyzeTab
 from modules.BusinessModule.ggBusinessData import get_combined_business_data
 # from modules.BusinessModule.businessFilters import get_common_filters
@@ -15,7 +15,7 @@ def show(clever_data):
         upload_file()
         st.stop()
 
-    data = get_combined_business_data(clever_data)
+    data = get_combined_business_data(clever_data, store=get_append_store())
 
     tab1, tab2, tab3 = st.tabs(["Orders", "Statistics", "Serve Analyze"])
 
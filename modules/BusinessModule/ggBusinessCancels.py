@@ -0,0 +1,120 @@
+# modules/BusinessModule/ggBusinessCancels.py
+"""
+Сессии отмен для вкладок ggBusiness — отмены одного userid за один день
+создания заказа, одна CancelSessions на версию листа отмен.
+"""
+import numpy as np
+import pandas as pd
+
+from dataset_store import cached, frame_version
+
+_NAT = np.iinfo(np.int64).min
+
+
+def created_column(cancels: pd.DataFrame) -> str:
+    return "date" if "date" in cancels.columns else "createdat"
+
+def wait_seconds(cancels: pd.DataFrame) -> pd.Series:
+    """Ожидание до отмены по строкам, сек: canceldate - время создания."""
+    return (cancels["canceldate"] - cancels[created_column(cancels)]).dt.total_seconds()
+
+def _ns(ser: pd.Series) -> np.ndarray:
+    return ser.to_numpy(dtype="datetime64[ns]").view(np.int64)
+
+
+class CancelSessions:
+    """
+    Сессии отмен листа cancels; companies — UserCompanyIndex или None.
+    Строки сортируются по (userid, день создания, время создания) один раз.
+
+    table — по строке на сессию:
+      company        — компания userid (ggBusinessUsers), NaN если не найдена
+      userid, day    — ключ сессии; day — день создания заказа (datetime64)
+      first_created  — время создания первого заказа сессии
+      first_cancel   — время первой отмены
+      total_wait_sec — суммарное ожидание до отмены, сек (пустые не считаются)
+      cancels        — число отмен в сессии
+      tariff         — тариф первого заказа сессии (если колонка есть)
+
+    subset(rows) — те же сессии только по части строк, без новой сортировки.
+    """
+
+    def __init__(self, cancels: pd.DataFrame, companies=None):
+        self._index = cancels.index
+        if cancels.empty or "canceldate" not in cancels.columns or created_column(cancels) not in cancels.columns:
+            self._rows = np.empty(0, np.int64)
+            self._frame = pd.DataFrame(columns=["userid"])
+            self.table = self._empty()
+            return
+
+        created = _ns(cancels[created_column(cancels)])
+        userid = cancels["userid"]
+        valid = userid.notna().to_numpy(bool) & (created != _NAT)
+        rows = np.flatnonzero(valid)
+        day = created[rows] // 86_400_000_000_000
+        uid_codes, _ = pd.factorize(userid.iloc[rows], sort=True)
+        order = np.lexsort((created[rows], day, uid_codes))
+        # позиции строк cancels в порядке (userid, день, время создания)
+        self._rows = rows[order]
+        uid_codes, day = uid_codes[order], day[order]
+        new = np.r_[True, (uid_codes[1:] != uid_codes[:-1]) | (day[1:] != day[:-1])] if len(rows) else np.zeros(0, bool)
+        self._session = np.cumsum(new) - 1
+
+        self._created = created[self._rows]
+        self._cancel = _ns(cancels["canceldate"])[self._rows]
+        self._wait = wait_seconds(cancels).to_numpy(dtype="float64", na_value=np.nan)[self._rows]
+        keep = ["userid"] + (["tariff"] if "tariff" in cancels.columns else [])
+        self._frame = cancels[keep].iloc[self._rows].reset_index(drop=True)
+        self._company = (
+            companies.company_of(self._frame["userid"]).to_numpy(dtype=object)
+            if companies is not None else np.full(len(self._rows), np.nan, dtype=object)
+        )
+        self.table = self._aggregate(np.arange(len(self._rows)))
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    def _empty(self) -> pd.DataFrame:
+        columns = ["company", "userid", "day", "first_created", "first_cancel", "total_wait_sec", "cancels"]
+        return pd.DataFrame(columns=columns + (["tariff"] if "tariff" in self._frame.columns else []))
+
+    def _aggregate(self, picked: np.ndarray) -> pd.DataFrame:
+        """Сессии по выбранным строкам (позиции в отсортированном порядке, по возрастанию)."""
+        if not len(picked):
+            return self._empty()
+        session = self._session[picked]
+        heads = np.flatnonzero(np.r_[True, session[1:] != session[:-1]])
+        first = picked[heads]
+        cancel = self._cancel[picked]
+        # NaT (int64 min) не должен стать минимумом
+        first_cancel = np.minimum.reduceat(np.where(cancel == _NAT, np.iinfo(np.int64).max, cancel), heads)
+        first_cancel[first_cancel == np.iinfo(np.int64).max] = _NAT
+        wait = np.add.reduceat(np.nan_to_num(self._wait[picked]), heads)
+        table = pd.DataFrame({
+            "company": self._company[first],
+            "userid": self._frame["userid"].iloc[first].to_numpy(),
+            "day": (self._created[first] // 86_400_000_000_000 * 86_400_000_000_000).view("datetime64[ns]"),
+            "first_created": self._created[first].view("datetime64[ns]"),
+            "first_cancel": first_cancel.view("datetime64[ns]"),
+            "total_wait_sec": wait,
+            "cancels": np.diff(np.r_[heads, len(picked)]),
+        })
+        table["userid"] = table["userid"].astype(self._frame["userid"].dtype)
+        if "tariff" in self._frame.columns:
+            table["tariff"] = self._frame["tariff"].iloc[first].reset_index(drop=True)
+        return table
+
+    def subset(self, rows) -> pd.DataFrame:
+        """Сессии только по строкам cancels с метками индекса rows."""
+        wanted = np.zeros(len(self._index), dtype=bool)
+        positions = self._index.get_indexer(pd.Index(rows))
+        wanted[positions[positions >= 0]] = True
+        return self._aggregate(np.flatnonzero(wanted[self._rows]))
+
+
+def cancel_sessions(cancels: pd.DataFrame, companies=None) -> CancelSessions:
+    """CancelSessions листа отмен, одна на версию листа и индекса компаний."""
+    version = frame_version(cancels)
+    companies_version = None if companies is None else companies.version
+    key = None if version is None or (companies is not None and companies_version is None) else (version, companies_version)
+    return cached("ggBusinessCancels.sessions", key, CancelSessions, cancels, companies)
@@ -2,6 +2,11 @@
 
 import pandas as pd
 
+from categories import concat_frames
+from modules.BusinessModule.ggBusinessCancels import cancel_sessions
+from modules.BusinessModule.ggBusinessPeriods import order_periods
+from modules.BusinessModule.ggBusinessUsers import client_company_index, user_company_index
+
 # def clean_clients(df: pd.DataFrame) -> pd.DataFrame:
 #     """
 #     Ищет в DataFrame строку-заголовок, где встречаются ключевые поля:
@@ -61,11 +66,19 @@ import pandas as pd
 
 
 
-def get_combined_business_data(session_clever_data: dict) -> dict:
+def get_combined_business_data(session_clever_data: dict, store=None) -> dict:
     """
     Собирает из session_clever_data:
       - orders: все листы 'orders count'
       - clients: все листы 'clients' (ключ в load_data_from_file – 'clients')
+    Если передан store (append_store.AppendStore), заказы и отмены берутся
+    из него — строки, которые есть в файлах сессии: в самих файлах при
+    инкрементальном импорте только новые строки.
+    userCompanies / clientCompanies — индексы userid -> company по листам
+    users и clients (ggBusinessUsers), по одному на версию листа;
+    cancelSessions — сессии отмен (ggBusinessCancels);
+    orderPeriods — date / week_start / month_start / weekday по строкам
+    orders (ggBusinessPeriods).
     """
     orders_list = []
     clients_list  = []
@@ -100,16 +113,25 @@ def get_combined_business_data(session_clever_data: dict) -> dict:
         if not u_df.empty:
             users_list.append(u_df.copy())
 
-    orders = pd.concat(orders_list, ignore_index=True) if orders_list else pd.DataFrame(columns=["date","userid","orders"])
-    clients = pd.concat(clients_list, ignore_index=True) if orders_list else pd.DataFrame()
-    serve_orders = pd.concat(serve_orders_list, ignore_index=True) if serve_orders_list else pd.DataFrame()
-    cancellations = pd.concat(cancellations_list, ignore_index=True) if cancellations_list else pd.DataFrame()
-    users = pd.concat(users_list, ignore_index=True) if users_list else pd.DataFrame()
-
+    orders = concat_frames(orders_list, ignore_index=True) if orders_list else pd.DataFrame(columns=["date","userid","orders"])
+    clients = concat_frames(clients_list, ignore_index=True) if orders_list else pd.DataFrame()
+    serve_orders = concat_frames(serve_orders_list, ignore_index=True) if serve_orders_list else pd.DataFrame()
+    cancellations = concat_frames(cancellations_list, ignore_index=True) if cancellations_list else pd.DataFrame()
+    if store is not None and store.rows("serveOrders"):
+        serve_orders = store.frame("serveOrders", sources=session_clever_data).copy()
+    if store is not None and store.rows("cancellations"):
+        cancellations = store.frame("cancellations", sources=session_clever_data).copy()
+    users = concat_frames(users_list, ignore_index=True) if users_list else pd.DataFrame()
+
+    user_companies = user_company_index(users)
     return {
         "orders": orders,
         "clients": clients,
         "serveOrders": serve_orders,
         "cancellations": cancellations,
         "users": users,
+        "userCompanies": user_companies,
+        "clientCompanies": client_company_index(clients),
+        "cancelSessions": cancel_sessions(cancellations, user_companies),
+        "orderPeriods": order_periods(orders),
     }
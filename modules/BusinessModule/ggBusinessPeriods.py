@@ -0,0 +1,44 @@
+# modules/BusinessModule/ggBusinessPeriods.py
+"""
+Периоды дат для вкладок ggBusiness: начало недели и месяца (datetime64) и
+день недели; для листа заказов — один раз на версию листа (order_periods).
+"""
+import numpy as np
+import pandas as pd
+
+from dataset_store import cached_by_version
+from time_buckets import bucket_codes
+
+
+def period_start(dates, interval: str) -> np.ndarray:
+    """Начало интервала time_buckets ('Day', 'Week', 'Month', ...) для каждой даты; NaT для пустых."""
+    codes, labels = bucket_codes(pd.to_datetime(pd.Series(dates), errors="coerce"), interval)
+    # код -1 (NaT) указывает на добавленный в конец NaT
+    starts = np.append(labels.to_numpy(dtype="datetime64[ns]"), np.datetime64("NaT", "ns"))
+    return starts[codes]
+
+def period_keys(dates) -> pd.DataFrame:
+    """
+    week_start | month_start (datetime64: понедельник недели, 1-е число
+    месяца) | weekday (0 = понедельник, -1 для пустых дат); индекс как у dates.
+    """
+    dates = pd.Series(dates)
+    day = pd.Series(period_start(dates, "Day"), index=dates.index)
+    return pd.DataFrame({
+        "week_start": period_start(dates, "Week"),
+        "month_start": period_start(dates, "Month"),
+        "weekday": day.dt.weekday.fillna(-1).astype(np.int64).to_numpy(),
+    }, index=dates.index)
+
+def order_periods(orders: pd.DataFrame) -> pd.DataFrame:
+    """
+    date (datetime.date, как ожидают фильтры вкладки) и period_keys по
+    колонке date листа заказов, один раз на версию листа.
+    """
+    return cached_by_version("ggBusinessPeriods.orders", orders, _order_periods)
+
+def _order_periods(orders: pd.DataFrame) -> pd.DataFrame:
+    dates = orders["date"] if "date" in orders.columns else pd.Series(pd.NaT, index=orders.index)
+    periods = period_keys(dates)
+    periods.insert(0, "date", pd.to_datetime(dates, errors="coerce").dt.date)
+    return periods
@@ -5,6 +5,8 @@ import numpy as np
 from datetime import datetime, timedelta
 import json
 
+from modules.BusinessModule.ggBusinessUsers import client_company_index
+
 # --- КОНФИГУРАЦИЯ ---
 CONFIG_FILE = "alert_config.json"
 
@@ -100,9 +102,13 @@ def show(data: dict | None = None, filters: dict | None = None) -> None:
     if orders_df.empty or clients_df.empty:
         st.info("No data available for analysis.")
         return
-    orders_df["date"] = pd.to_datetime(orders_df["date"], errors="coerce")
-    clients_df = clients_df[["userid", "company"]].dropna()
-    merged = orders_df.merge(clients_df, on="userid", how="left").dropna(subset=["company", "date", "orders"])
+    companies = data.get("clientCompanies")
+    if companies is None:
+        companies = client_company_index(clients_df)
+    merged = (
+        orders_df.assign(company=companies.company_of(orders_df["userid"], categorical=True))
+        .dropna(subset=["company", "date", "orders"])
+    )
     merged["date"] = merged["date"].dt.normalize()
 
     # --- Блок Конфигурации и Настроек ---
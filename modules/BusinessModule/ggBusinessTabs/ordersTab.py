@@ -4,6 +4,10 @@ import altair as alt
 from datetime import datetime, timedelta
 import io
 
+from modules.BusinessModule.ggBusinessCancels import cancel_sessions
+from modules.BusinessModule.ggBusinessPeriods import order_periods, period_keys
+from modules.BusinessModule.ggBusinessUsers import user_company_index
+
 def show(data: dict,) -> None:
     """
     Tab "Orders" — daily analytics of company orders.
@@ -36,44 +40,23 @@ def show(data: dict,) -> None:
         st.info("Not enough data: please provide both 'orders' and 'clients' data.")
         return
 
-    # Prepare dates and types
-    orders["date"] = pd.to_datetime(orders["date"], errors="coerce").dt.date
-    clients["userid"] = clients["userid"].astype(str)
-    clients["mobile"] = clients["mobile"].astype(str)
-    clients["companymanager"] = clients["companymanager"].astype(str)
-    clients["join_date"] = pd.to_datetime(clients.get("date"), errors="coerce").dt.date
-
-    # Prepare cancels and map to companies
-    if not cancels.empty and not users_df.empty:
-        import ast
-        def parse_list(val):
-            try:
-                return [int(x) for x in ast.literal_eval(str(val))]
-            except Exception:
-                return []
-
-        users_df["parsed"] = users_df["users"].apply(parse_list)
-        mapping = {}
-        for comp, grp in users_df.groupby("company"):
-            ids = set()
-            for lst in grp["parsed"]:
-                ids.update(lst)
-            for uid in ids:
-                mapping[uid] = comp
-        cancels["company"] = cancels["userid"].map(mapping)
-
-    if not cancels.empty:
-        created_col = "date" if "date" in cancels.columns else "createdat"
-        cancels[created_col] = pd.to_datetime(cancels[created_col], errors="coerce")
-        cancels["canceldate"] = pd.to_datetime(cancels["canceldate"], errors="coerce")
-        cancels["wait_min"] = (cancels["canceldate"] - cancels[created_col]).dt.total_seconds() / 60.0
+    # Prepare dates and types: date / week_start / month_start / weekday — once per orders sheet
+    periods = data.get("orderPeriods")
+    if periods is None:
+        periods = order_periods(orders)
+    orders = orders.assign(**{col: periods[col].to_numpy() for col in periods.columns})
+    clients["join_date"] = clients["date"].dt.date if "date" in clients.columns else pd.NaT
+
+    # Cancel sessions (userid, day of creation) — built once per cancellations sheet
+    sessions = data.get("cancelSessions")
+    if sessions is None:
+        sessions = cancel_sessions(cancels, user_company_index(users_df))
 
     # Merge data
     df = (
         orders.merge(
             clients[["userid", "company", "companymanager", "join_date", "mobile"]],
-            left_on=orders["userid"].astype(str),
-            right_on="userid",
+            on="userid",
             how="left"
         )
         .dropna(subset=["company"])
@@ -87,26 +70,27 @@ def show(data: dict,) -> None:
 
     df_period = df[(df["date"] >= start_date) & (df["date"] <= end_date)]
     if not include_weekends:
-        df_period = df_period[pd.to_datetime(df_period["date"]).dt.weekday < 5]
+        df_period = df_period[df_period["weekday"] < 5]
 
-    # Filter cancels by date and weekends
+    # Filter cancel sessions by date and weekends
     cancels_period = pd.DataFrame()
-    created_col = "date" if "date" in cancels.columns else "createdat"
-    if not cancels.empty:
-        cancels_period = cancels[(cancels[created_col].dt.date >= start_date) & (cancels[created_col].dt.date <= end_date)]
+    created_col = "first_created"
+    if len(sessions):
+        table = sessions.table
+        cancels_period = table[(table["day"] >= pd.Timestamp(start_date)) & (table["day"] <= pd.Timestamp(end_date))]
         if not include_weekends:
-            cancels_period = cancels_period[cancels_period[created_col].dt.weekday < 5]
-        
-        cancels_period["company"] = cancels_period["company"].fillna("not find company")
-        cancels_period = cancels_period.assign(cancel_date=cancels_period[created_col].dt.date)
-        
-        waits = cancels_period.groupby(["company", "userid", "cancel_date"], as_index=False)["wait_min"].sum()
-        first_rows = cancels_period.sort_values(created_col).drop_duplicates(subset=["company", "userid", "cancel_date"], keep="first")
-        cancels_period = first_rows.drop(columns=["wait_min"]).merge(waits, on=["company", "userid", "cancel_date"], how="left")
+            cancels_period = cancels_period[cancels_period["day"].dt.weekday < 5]
+
+        cancels_period = cancels_period.assign(
+            company=cancels_period["company"].fillna("not find company"),
+            cancel_date=cancels_period["day"].dt.date,
+            wait_min=cancels_period["total_wait_sec"] / 60.0,
+        )
+        cancels_period = cancels_period.join(period_keys(cancels_period["day"])[["week_start", "month_start"]])
 
     # Main metrics calculation
     metrics = (
-        df_period.groupby("company", as_index=False)
+        df_period.groupby("company", as_index=False, observed=True)
         .agg(
             userid=("userid", "first"),
             join_date=("join_date", "min"),
@@ -126,7 +110,7 @@ def show(data: dict,) -> None:
     # Pivot table with daily order sums
     daily_sum = (
         df_period[df_period["company"].isin(selected)]
-        .groupby(["company", "date"], observed=True)["orders"]
+        .groupby(["company", "date", "week_start", "month_start"], observed=True)["orders"]
         .sum()
         .reset_index()
     )
@@ -140,7 +124,7 @@ def show(data: dict,) -> None:
     else:
         last_day = end_date
         last_orders = pd.Series(dtype=int)
-    metrics["last orders"] = metrics["company"].map(last_orders).fillna(0).astype(int)
+    metrics["last orders"] = last_orders.reindex(metrics["company"]).fillna(0).astype(int).to_numpy()
 
     # Final result table assembly
     result = (
@@ -212,7 +196,7 @@ def show(data: dict,) -> None:
         cancels_daily = (
             cancels_period
             .assign(date=cancels_period[created_col].dt.date)
-            .groupby(['company','date'], observed=True)['userid']
+            .groupby(['company', 'date', 'week_start', 'month_start'], observed=True)['userid']
             .nunique()
             .reset_index(name='cancels')
         )
@@ -223,7 +207,7 @@ def show(data: dict,) -> None:
         orders_stats = df_orders.groupby(period_col, as_index=False)["orders"].sum()
         cancels_stats = (
             df_cancels.groupby(period_col, as_index=False)["cancels"].sum()
-            if not df_cancels.empty else pd.DataFrame(columns=[period_col, "cancels"])
+            if not df_cancels.empty else pd.DataFrame({period_col: df_orders[period_col].iloc[:0], "cancels": 0})
         )
         stats = pd.merge(orders_stats, cancels_stats, on=period_col, how="outer").fillna(0)
         stats = stats.rename(columns={period_col: title_col})
@@ -246,26 +230,17 @@ def show(data: dict,) -> None:
 
     with tabs[0]:
         stats_tab(daily_sum, cancels_daily, 'date', 'date')
+    # week_start / month_start come with daily_sum and cancels_daily (ggBusinessPeriods)
     with tabs[1]:
-        week_df = daily_sum.copy()
-        week_df['week_start'] = pd.to_datetime(week_df['date']).dt.to_period('W').apply(lambda r: r.start_time.date())
-        canc_week = cancels_daily.copy()
-        if not canc_week.empty:
-            canc_week['week_start'] = pd.to_datetime(canc_week['date'], errors='coerce').dt.to_period('W').apply(lambda r: r.start_time.date())
-        stats_tab(week_df, canc_week, 'week_start', 'week start')
+        stats_tab(daily_sum, cancels_daily, 'week_start', 'week start')
     with tabs[2]:
-        month_df = daily_sum.copy()
-        month_df['month_start'] = pd.to_datetime(month_df['date']).dt.to_period('M').apply(lambda r: r.start_time.date())
-        canc_month = cancels_daily.copy()
-        if not canc_month.empty:
-            canc_month['month_start'] = pd.to_datetime(canc_month['date'], errors='coerce').dt.to_period('M').apply(lambda r: r.start_time.date())
-        stats_tab(month_df, canc_month, 'month_start', 'month start')
+        stats_tab(daily_sum, cancels_daily, 'month_start', 'month start')
 
 
     # считаем отмены именно за last_day по company
     last_cancels = (
         cancels_period[cancels_period["cancel_date"] == last_day]
-        .groupby("company")["userid"]
+        .groupby("company", observed=True)["userid"]
         .count()
     )
 
@@ -273,8 +248,7 @@ def show(data: dict,) -> None:
         metrics.set_index("company")[["userid", "last orders"]]
         .rename(columns={"last orders": "orders"})
         .assign(
-            cancels=lambda d: d.index.to_series()
-                            .map(last_cancels)
+            cancels=lambda d: last_cancels.reindex(d.index)
                             .fillna(0)
                             .astype(int)
         )
@@ -284,8 +258,8 @@ def show(data: dict,) -> None:
     # 2) Таблица суммарных заказов и отмен за период
     total_cancels = (
         cancels_period
-        .assign(date=cancels_period["canceldate"].dt.date)
-        .groupby("company")["userid"]
+        .assign(date=cancels_period["first_cancel"].dt.date)
+        .groupby("company", observed=True)["userid"]
         .count()
     )
 
@@ -335,7 +309,7 @@ def show(data: dict,) -> None:
         # Aggregate and fill missing dates
         trend = (
             df_period[df_period['company'].isin(selected_companies)]
-            .groupby(['company', 'date'], as_index=False)['orders']
+            .groupby(['company', 'date'], as_index=False, observed=True)['orders']
             .sum()
         )
 
@@ -361,7 +335,7 @@ def show(data: dict,) -> None:
             cancel_trend = (
                 cancels_period[cancels_period['company'].isin(selected_companies)]
                 .assign(date=cancels_period[created_col].dt.date)
-                .groupby(['company', 'date'], as_index=False)['userid']
+                .groupby(['company', 'date'], as_index=False, observed=True)['userid']
                 .nunique()
             )
             cancel_trend = (
@@ -411,12 +385,12 @@ def show(data: dict,) -> None:
             0: 'Monday', 1: 'Tuesday', 2: 'Wednesday', 3: 'Thursday',
             4: 'Friday', 5: 'Saturday', 6: 'Sunday'
         }
-        df_range['weekday'] = pd.to_datetime(df_range['date']).dt.weekday.map(weekday_map)
+        df_range['weekday'] = df_range['weekday'].map(weekday_map)
 
         # 3) суммируем заказы по (компания, день недели)
         weekday_stats = (
             df_range
-            .groupby(['company', 'weekday'], as_index=False)['orders']
+            .groupby(['company', 'weekday'], as_index=False, observed=True)['orders']
             .sum()
         )
 
@@ -431,7 +405,7 @@ def show(data: dict,) -> None:
 
         trend = (
             df_period[df_period['company'].isin(selected_companies)]
-            .groupby(['company', 'date'], as_index=False)['orders']
+            .groupby(['company', 'date'], as_index=False, observed=True)['orders']
             .sum()
         )
 
@@ -443,7 +417,7 @@ def show(data: dict,) -> None:
         # Aggregate and fill missing dates
         trend = (
             df_period[df_period['company'].isin(selected_companies)]
-            .groupby(['company', 'date'], as_index=False)['orders']
+            .groupby(['company', 'date'], as_index=False, observed=True)['orders']
             .sum()
         )
         # …
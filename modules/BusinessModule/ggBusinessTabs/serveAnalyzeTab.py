@@ -1,31 +1,13 @@
 import streamlit as st
 import pandas as pd
 import altair as alt
-from datetime import timedelta
 import json
-import ast
 
-# --- HELPER FUNCTIONS ---
-
-def _parse_interval_seconds(val: str) -> float:
-    """Convert textual interval like '0 years 0 mons 0 days 0 hours 3 mins 10 secs' to seconds."""
-    if pd.isna(val):
-        return 0.0
-    import re
+from data_loader import add_serve_intervals
+from modules.BusinessModule.ggBusinessCancels import cancel_sessions
+from modules.BusinessModule.ggBusinessUsers import user_company_index
 
-    values = {"years": 0, "mons": 0, "days": 0, "hours": 0, "mins": 0, "secs": 0.0}
-    for num, unit in re.findall(
-        r"(\d+(?:\.\d+)?)\s*(years?|mons?|days?|hours?|mins?|secs?)", str(val).lower()
-    ):
-        num = float(num)
-        if unit.startswith("year"): values["days"] += num * 365
-        elif unit.startswith("mon"): values["days"] += num * 30
-        elif unit.startswith("day"): values["days"] += num
-        elif unit.startswith("hour"): values["hours"] += num
-        elif unit.startswith("min"): values["mins"] += num
-        elif unit.startswith("sec"): values["secs"] += num
-    td = timedelta(days=values["days"], hours=values["hours"], minutes=values["mins"], seconds=values["secs"])
-    return td.total_seconds()
+# --- HELPER FUNCTIONS ---
 
 def _calc_stats(series: pd.Series) -> dict:
     """Calculates descriptive statistics for a series, including quartiles."""
@@ -46,42 +28,6 @@ def _calc_stats(series: pd.Series) -> dict:
         "stDeviation": series.std().__round__(4),
     }
 
-def _create_company_mapping(users_df: pd.DataFrame) -> dict:
-    """Creates a dictionary to map userid to a company."""
-    if users_df.empty or 'users' not in users_df.columns:
-        return {}
-        
-    def parse_list_safely(x):
-        try:
-            return ast.literal_eval(x)
-        except (ValueError, SyntaxError):
-            return []
-
-    users_df["parsed_users"] = users_df["users"].apply(parse_list_safely)
-    mapping = {}
-    for _, row in users_df.iterrows():
-        company = row["company"]
-        for user_id in row["parsed_users"]:
-            mapping[user_id] = company
-    return mapping
-
-def _group_cancellations(cancels_df: pd.DataFrame) -> pd.DataFrame:
-    """Groups cancellations by user and day, summing the wait time."""
-    if cancels_df.empty or "canceldate" not in cancels_df.columns:
-        return pd.DataFrame()
-
-    cancels_df_sorted = cancels_df.sort_values(by=['userid', 'canceldate'])
-    grouped = cancels_df_sorted.groupby([
-        cancels_df_sorted['userid'],
-        cancels_df_sorted['canceldate'].dt.date
-    ]).agg(
-        session_start_time=('canceldate', 'first'),
-        total_wait_sec=('wait_sec', 'sum'),
-        cancellations_in_session=('userid', 'size'),
-        company=('company', 'first')
-    ).reset_index()
-    return grouped
-
 
 # --- MAIN SHOW FUNCTION ---
 
@@ -96,13 +42,12 @@ def show(data: dict) -> None:
         st.info("No serve order history available.")
         return
 
-    company_mapping = _create_company_mapping(users_df)
-    orders['company'] = orders['userid'].map(company_mapping)
+    company_index = data.get("userCompanies")
+    if company_index is None:
+        company_index = user_company_index(users_df)
+    orders['company'] = company_index.company_of(orders['userid'])
     if not cancels.empty:
-        cancels['company'] = cancels['userid'].map(company_mapping)
-
-    if "orderdate1" in orders.columns:
-        orders["orderdate1"] = pd.to_datetime(orders["orderdate1"], errors="coerce")
+        cancels['company'] = company_index.company_of(cancels['userid'])
 
     # --- Top Level Filters ---
     st.markdown("### Filters")
@@ -129,22 +74,14 @@ def show(data: dict) -> None:
             cancels = cancels[cancels['company'].isin(selected_companies)]
 
     # --- Secondary Data Preparation ---
-    acc_col = "acceptedinterval" if "acceptedinterval" in orders.columns else "accepted_interval"
-    arr_col = "arrivedinterval" if "arrivedinterval" in orders.columns else "arrived_interval"
-    orders["accepted_seconds"] = orders.get(acc_col).apply(_parse_interval_seconds)
-    orders["arrived_minutes"] = (orders.get(arr_col).apply(_parse_interval_seconds) / 60.0)
-    orders["distance"] = pd.to_numeric(orders.get("distance"), errors="coerce")
-    orders["fare"] = pd.to_numeric(orders.get("fare"), errors="coerce")
+    # accepted_seconds / arrived_minutes считаются при загрузке (data_loader.add_serve_intervals)
+    orders = add_serve_intervals(orders)
 
     if not cancels.empty:
         date_col = "date" if "date" in cancels.columns else "createdAt"
         cancel_col = "canceldate" if "canceldate" in cancels.columns else "cancelDate"
         if date_col in cancels.columns and cancel_col in cancels.columns:
-            cancels["date"] = pd.to_datetime(cancels.get(date_col), errors="coerce")
-            cancels["canceldate"] = pd.to_datetime(cancels.get(cancel_col), errors="coerce")
-            if cancels["date"].dt.tz is not None: cancels["date"] = cancels["date"].dt.tz_localize(None)
-            if cancels["canceldate"].dt.tz is not None: cancels["canceldate"] = cancels["canceldate"].dt.tz_localize(None)
-            cancels["wait_sec"] = (cancels["canceldate"] - cancels["date"]).dt.total_seconds()
+            cancels["wait_sec"] = (cancels[cancel_col] - cancels[date_col]).dt.total_seconds()
             cancels = cancels[cancels["wait_sec"] <= 9000]
     else:
         cancels = pd.DataFrame(columns=["userid", "wait_sec", "canceldate", "company"])
@@ -175,7 +112,11 @@ def show(data: dict) -> None:
     if "fare" in orders.columns: orders = orders[(orders["fare"] >= min_fare) & (orders["fare"] <= max_fare)]
     if min_cancel_wait > 0 and "wait_sec" in cancels.columns: cancels = cancels[cancels["wait_sec"] >= min_cancel_wait]
 
-    grouped_cancels = _group_cancellations(cancels)
+    # сессии отмен (userid, день создания) строятся при загрузке; здесь — только по отфильтрованным строкам
+    sessions = data.get("cancelSessions")
+    if sessions is None:
+        sessions = cancel_sessions(data.get("cancellations", pd.DataFrame()), company_index)
+    grouped_cancels = sessions.subset(cancels.index)
 
     # --- Service Quality Alert Panel ---
     st.markdown("---")
@@ -193,9 +134,9 @@ def show(data: dict) -> None:
     if not orders.empty:
         q3_accept_time = orders["accepted_seconds"].quantile(0.75)
         
-        total_orders_co = orders.groupby('company').size().reset_index(name='total_orders')
-        slow_accept_co = orders[orders["accepted_seconds"] > q3_accept_time].groupby('company').size().reset_index(name='slow_accept_count')
-        cancel_sessions_co = grouped_cancels.groupby('company').size().reset_index(name='cancel_session_count')
+        total_orders_co = orders.groupby('company', observed=True).size().reset_index(name='total_orders')
+        slow_accept_co = orders[orders["accepted_seconds"] > q3_accept_time].groupby('company', observed=True).size().reset_index(name='slow_accept_count')
+        cancel_sessions_co = grouped_cancels.groupby('company', observed=True).size().reset_index(name='cancel_session_count')
 
         alert_df = pd.merge(total_orders_co, slow_accept_co, on='company', how='left')
         alert_df = pd.merge(alert_df, cancel_sessions_co, on='company', how='left').fillna(0)
@@ -251,8 +192,8 @@ def show(data: dict) -> None:
     if q3_arrival_time is not None and not orders.empty:
         slow_orders_df = orders[orders["arrived_minutes"] > q3_arrival_time].copy()
         
-        total_orders_by_company = orders.groupby('company').size().reset_index(name='total_orders')
-        slow_by_company = slow_orders_df.groupby('company').size().reset_index(name='slow_orders_count')
+        total_orders_by_company = orders.groupby('company', observed=True).size().reset_index(name='total_orders')
+        slow_by_company = slow_orders_df.groupby('company', observed=True).size().reset_index(name='slow_orders_count')
         
         analysis_df = pd.merge(total_orders_by_company, slow_by_company, on='company', how='left').fillna(0)
         
@@ -292,9 +233,9 @@ def show(data: dict) -> None:
         line = base.mark_line(color='red', strokeWidth=3).encode(y=alt.Y('median_arrival:Q', title='Median Arrival (min)'))
         st.altair_chart(alt.layer(bar, line).resolve_scale(y='independent'), use_container_width=True)
 
-    if not grouped_cancels.empty and "session_start_time" in grouped_cancels.columns:
+    if not grouped_cancels.empty and "first_cancel" in grouped_cancels.columns:
         st.markdown("#### Cancels, Median & Total Wait Time by Hour")
-        grouped_cancels['hour'] = pd.to_datetime(grouped_cancels['session_start_time']).dt.hour
+        grouped_cancels['hour'] = pd.to_datetime(grouped_cancels['first_cancel']).dt.hour
         cancels_by_hour = grouped_cancels.groupby('hour').agg(
             cancel_session_count=('hour', 'size'),
             median_wait_sec=('total_wait_sec', 'median'),
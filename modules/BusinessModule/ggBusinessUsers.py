@@ -0,0 +1,121 @@
+# modules/BusinessModule/ggBusinessUsers.py
+"""
+Индекс userid -> company для вкладок ggBusiness по листам users и clients,
+один на версию листа.
+"""
+import numpy as np
+import pandas as pd
+
+from dataset_store import cached, frame_version
+
+# "[1, 2, 3]", "(1,)", "[]"
+_ID_LIST = r"\s*[\[(]\s*(?:\d+\s*(?:,\s*\d+\s*)*,?\s*)?[\])]\s*"
+
+# наибольший id, помещающийся в int64, — строкой для сравнения цифр
+_INT64_MAX = str(np.iinfo(np.int64).max)
+
+
+def canonical_ids(ser: pd.Series) -> np.ndarray:
+    """userid -> int64; пустые и нечисловые -> -1."""
+    num = pd.to_numeric(pd.Series(ser, copy=False), errors='coerce')
+    return num.fillna(-1).to_numpy(dtype=np.int64)
+
+def _company_codes(companies: pd.Series) -> tuple[np.ndarray, pd.Index]:
+    if isinstance(companies.dtype, pd.CategoricalDtype):
+        return companies.cat.codes.to_numpy(dtype=np.int64), companies.cat.categories
+    codes, categories = pd.factorize(companies)
+    return codes.astype(np.int64), pd.Index(categories)
+
+
+class UserCompanyIndex:
+    """
+    Отсортированные уникальные user_ids и codes — позиции их компаний в
+    companies. Поиск — np.searchsorted.
+
+    Правила:
+      - id — целые числа; строка с некорректным списком не даёт ни одного id,
+        id вне int64 отбрасывается (остальные id строки остаются)
+      - строки без company не учитываются
+      - id в нескольких строках получает компанию последней строки листа
+    """
+
+    def __init__(self, user_ids: np.ndarray, codes: np.ndarray, companies: pd.Index):
+        keep = (user_ids >= 0) & (codes >= 0)
+        user_ids, codes = user_ids[keep], codes[keep]
+        # последнее вхождение id: уникальные по перевёрнутому массиву
+        self.user_ids, last = np.unique(user_ids[::-1], return_index=True)
+        self.codes = codes[::-1][last]
+        self.companies = companies
+        # версия листа, из которого построен индекс (см. _cached)
+        self.version = None
+
+    @classmethod
+    def from_users(cls, users: pd.DataFrame) -> "UserCompanyIndex":
+        """Из листа users: колонка users — список id, company — их компания."""
+        if users.empty or 'users' not in users.columns or 'company' not in users.columns:
+            return cls(np.empty(0, np.int64), np.empty(0, np.int64), pd.Index([]))
+        codes, companies = _company_codes(users['company'])
+        text = users['users'].astype(str).reset_index(drop=True)
+        text = text[text.str.fullmatch(_ID_LIST)]
+        # explode сохраняет порядок строк -> «последняя строка» = последнее вхождение
+        ids = text.str.strip().str[1:-1].str.split(',').explode().str.strip()
+        # длину сверяем по строке: pd.to_numeric ушёл бы во float и округлил бы большие id
+        digits = ids.str.lstrip('0')
+        fits = (digits.str.len() < len(_INT64_MAX)) | ((digits.str.len() == len(_INT64_MAX)) & (digits <= _INT64_MAX))
+        ids = ids[(ids != '') & fits]
+        return cls(ids.astype(np.int64).to_numpy(), codes[ids.index.to_numpy()], companies)
+
+    @classmethod
+    def from_pairs(cls, user_ids: pd.Series, companies: pd.Series) -> "UserCompanyIndex":
+        """Из колонок userid и company одного листа (например, clients)."""
+        codes, categories = _company_codes(companies)
+        return cls(canonical_ids(user_ids), codes, categories)
+
+    def __len__(self) -> int:
+        return len(self.user_ids)
+
+    def company_of(self, user_ids: pd.Series, categorical: bool = False) -> pd.Series:
+        """
+        Компания каждого userid (индекс как у user_ids), NaN — если id нет
+        в индексе. Значения object, как у Series.map(dict), или category
+        с категориями индекса (categorical=True).
+        """
+        ids = canonical_ids(user_ids)
+        labels = np.append(np.asarray(self.companies, dtype=object), np.nan)
+        if len(self.user_ids):
+            pos = np.searchsorted(self.user_ids, ids).clip(max=len(self.user_ids) - 1)
+            found = (ids >= 0) & (self.user_ids[pos] == ids)
+            codes = np.where(found, self.codes[pos], -1)
+        else:
+            codes = np.full(len(ids), -1)
+        values = pd.Categorical.from_codes(codes, categories=self.companies) if categorical else labels[codes]
+        return pd.Series(values, index=getattr(user_ids, 'index', None), name='company')
+
+    def frame(self) -> pd.DataFrame:
+        """userid | company — все пары индекса."""
+        return pd.DataFrame({
+            'userid': self.user_ids,
+            'company': pd.Categorical.from_codes(self.codes, categories=self.companies),
+        })
+
+
+def _cached(kind: str, frame: pd.DataFrame, build) -> UserCompanyIndex:
+    version = frame_version(frame)
+
+    def build_index(frame):
+        index = build(frame)
+        index.version = version
+        return index
+    return cached(f"ggBusinessUsers.{kind}", version, build_index, frame)
+
+def user_company_index(users: pd.DataFrame) -> UserCompanyIndex:
+    """UserCompanyIndex листа users, один на версию листа."""
+    return _cached('users', users, UserCompanyIndex.from_users)
+
+def client_company_index(clients: pd.DataFrame) -> UserCompanyIndex:
+    """userid -> company по листу clients, один на версию листа."""
+    def build(frame):
+        if frame.empty or 'userid' not in frame.columns or 'company' not in frame.columns:
+            return UserCompanyIndex(np.empty(0, np.int64), np.empty(0, np.int64), pd.Index([]))
+        return UserCompanyIndex.from_pairs(frame['userid'], frame['company'])
+    return _cached('clients', clients, build)
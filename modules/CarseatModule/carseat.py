@@ -2,6 +2,8 @@ import streamlit as st
 import pandas as pd
 import altair as alt
 
+from categories import concat_frames
+
 
 def get_carseat_data(session_clever_data: dict) -> pd.DataFrame:
     """Combine carseat order tables from all uploaded files."""
@@ -11,7 +13,7 @@ def get_carseat_data(session_clever_data: dict) -> pd.DataFrame:
         if not df.empty:
             frames.append(df.copy())
     if frames:
-        return pd.concat(frames, ignore_index=True)
+        return concat_frames(frames, ignore_index=True)
     return pd.DataFrame()
 
 
@@ -28,7 +30,7 @@ def _aggregate(df: pd.DataFrame, period: str) -> pd.DataFrame:
         name = "day"
     agg = (
         df.assign(period=grp)
-        .groupby(["period", "status"], as_index=False)["orderid"]
+        .groupby(["period", "status"], as_index=False, observed=True)["orderid"]
         .count()
         .pivot(index="period", columns="status", values="orderid")
         .fillna(0)
@@ -68,9 +70,8 @@ def show(session_clever_data: dict):
         return
 
     df = df.copy()
-    df["date"] = pd.to_datetime(df.get("date"), errors="coerce")
     df = df.dropna(subset=["date"])
-    df["status"] = df["statusid"].map({5: "Completed", 6: "Cancelled"})
+    df["status"] = df["statusid"].map({5: "Completed", 6: "Cancelled"}).astype("category")
     df = df[df["status"].notna()]
 
     # FILTERS
@@ -130,7 +131,7 @@ def show(session_clever_data: dict):
     # Orders by user
     st.subheader("Orders by User ")
     user_stats = (
-        filteredWithoutStatus.groupby(["userid", "status"], as_index=False)["orderid"]
+        filteredWithoutStatus.groupby(["userid", "status"], as_index=False, observed=True)["orderid"]
         .count()
         .pivot(index="userid", columns="status", values="orderid")
         .fillna(0)
@@ -1,14 +1,24 @@
 # C:\Users\user\OneDrive\Desktop\Workspace\ggAnalyze\modules\data_import.py
 import streamlit as st
 
-from data_loader import load_data_from_file
+from append_store import AppendStore
+from data_cache import load_data_cached, load_many_cached, drop_cache
+from data_loader import DEFAULT_IMPORT_WORKERS
+from dataset_store import DatasetRegistry
+from modules.ggTipsModule.ggTips_rfm import PayerStateStore
 import os
-import pandas as pd
 
 # Абсолютный путь к директории для хранения файлов
 UPLOAD_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "uploaded_files")
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+# Инкрементальный импорт: заказы и отмены из ежедневных выгрузок копятся
+# в append-only хранилище, файл добавляет только новые строки
+INCREMENTAL_IMPORT = os.environ.get("GGANALYZE_INCREMENTAL_IMPORT", "1") != "0"
+APPEND_STORE_DIR = os.path.join(UPLOAD_DIR, ".append_store")
+# RFM плательщиков ggTips, дополняемое новыми транзакциями каждого импорта
+PAYER_STATE_DIR = os.path.join(UPLOAD_DIR, ".payer_state")
+
 def save_uploaded_file(uploaded_file):
     file_path = os.path.join(UPLOAD_DIR, uploaded_file.name)
     with open(file_path, "wb") as f:
@@ -18,44 +28,113 @@ def save_uploaded_file(uploaded_file):
 def load_existing_files():
     return [os.path.join(UPLOAD_DIR, file) for file in os.listdir(UPLOAD_DIR) if file.endswith((".xlsx", ".csv"))]
 
+@st.cache_resource
+def get_append_store() -> AppendStore | None:
+    """Общее на процесс хранилище заказов и отмен; None, если инкрементальный импорт выключен."""
+    return AppendStore(APPEND_STORE_DIR) if INCREMENTAL_IMPORT else None
+
+@st.cache_resource
+def get_payer_store() -> PayerStateStore | None:
+    """Общее на процесс состояние плательщиков ggTips; None, если инкрементальный импорт выключен."""
+    return PayerStateStore(PAYER_STATE_DIR) if INCREMENTAL_IMPORT else None
+
+@st.cache_resource
+def get_dataset_registry() -> DatasetRegistry:
+    """Один реестр датасетов на процесс: сессии держат только ссылки на Dataset."""
+    return DatasetRegistry(lambda path: load_data_cached(path, store=get_append_store()))
+
 def delete_file(file_path):
     if os.path.exists(file_path):
         os.remove(file_path)
+        drop_cache(file_path)
+        get_dataset_registry().release(file_path)
+        store = get_append_store()
+        if store is not None:
+            store.forget(file_path)
         st.success(f"File {os.path.basename(file_path)} deleted successfully.")
     else:
         st.warning(f"File {os.path.basename(file_path)} not found.")
 
 def upload_file():
+    registry = get_dataset_registry()
+    registry.prune()
+
     # Если в session_state нет списка загруженных файлов, пытаемся загрузить их из папки
     if "uploaded_files" not in st.session_state:
         st.session_state.uploaded_files = load_existing_files()
-    
+    if "clever_data" not in st.session_state:
+        st.session_state.clever_data = {}
+
+    # Файлы, удалённые в другой сессии, убираем и из этой
+    for file_path in [p for p in st.session_state.uploaded_files if not os.path.exists(p)]:
+        st.session_state.uploaded_files.remove(file_path)
+        st.session_state.clever_data.pop(file_path, None)
+
     # Если файлов нет, сообщаем пользователю, что нужно их импортировать
     if not st.session_state.uploaded_files:
         st.warning("No files found in uploads folder. Please upload a file.")
     else:
-        # Если файлы есть, но данные (clever_data) не загружены или пусты, пробуем загрузить
-        if "clever_data" not in st.session_state:
-            st.session_state.clever_data = {}
-        for file_path in st.session_state.uploaded_files:
-            # Если данных по файлу нет или данные пусты, загружаем заново
-            if file_path not in st.session_state.clever_data:
-                st.session_state.clever_data[file_path] = load_data_from_file(file_path)
-            else:
-                file_data = st.session_state.clever_data[file_path]
-                tips_empty = all(df.empty for df in file_data.get('ggtips', {}).values()) if isinstance(file_data.get('ggtips', {}), dict) else file_data.get('ggtips', pd.DataFrame()).empty
-                # Аналогично можно проверить для других ключей при необходимости
-                if tips_empty:
-                    st.session_state.clever_data[file_path] = load_data_from_file(file_path)
+        # Сессия хранит только ссылку на общий Dataset; реестр сам перечитает
+        # файл, если он изменился на диске. Незагруженные файлы разбираются
+        # параллельно (файлы и листы — в пуле процессов)
+        workers = st.session_state.get("importWorkers", DEFAULT_IMPORT_WORKERS)
+        pending = [p for p in st.session_state.uploaded_files if p not in registry]
+        progress = st.progress(0.0, text="Importing files...") if pending else None
+
+        def on_progress(done, total, label):
+            progress.progress(done / total, text=f"Parsed {label} ({done}/{total})")
+
+        st.session_state.clever_data.update(registry.get_many(
+            st.session_state.uploaded_files,
+            batch_loader=lambda paths: load_many_cached(
+                paths, max_workers=workers, on_progress=on_progress, store=get_append_store()),
+        ))
+        if progress is not None:
+            progress.empty()
     
     # Затем отображаем file uploader для новых файлов
     uploaded_file = st.file_uploader("Upload Excel or CSV file", type=["xlsx", "csv"])
     if uploaded_file:
         file_path = save_uploaded_file(uploaded_file)
-        st.session_state.uploaded_files.append(file_path)
-        st.session_state.clever_data[file_path] = load_data_from_file(file_path)
+        if file_path not in st.session_state.uploaded_files:
+            st.session_state.uploaded_files.append(file_path)
+        st.session_state.clever_data[file_path] = registry.get(file_path)
         st.success(f"File {uploaded_file.name} imported successfully.")
 
+def show_import_settings():
+    with st.expander("Import settings", expanded=False):
+        st.number_input(
+            "Parallel import workers",
+            min_value=1, max_value=max(os.cpu_count() or 1, 1),
+            value=min(DEFAULT_IMPORT_WORKERS, max(os.cpu_count() or 1, 1)),
+            key="importWorkers",
+            help="Processes used to parse files and sheets on first import. 1 = serial.",
+        )
+        store = get_append_store()
+        if store is None:
+            return
+        st.caption("Incremental store: orders and cancellations accumulated from daily exports. "
+                   "Deleting a file removes the rows no other file contains.")
+        st.dataframe(store.summary(), use_container_width=True, hide_index=True)
+        payer_store = get_payer_store()
+        st.caption("Payer state: per-payer RFM totals of ggTips, updated with new tips on each import.")
+        st.dataframe(payer_store.summary(), use_container_width=True, hide_index=True)
+        if st.button("Reset incremental store", key="resetAppendStore"):
+            store.reset()
+            payer_store.reset()
+            get_dataset_registry().clear()
+            st.session_state.clever_data = {}
+            st.rerun()
+
+def show_memory_report():
+    report = get_dataset_registry().memory_report()
+    with st.expander("Loaded datasets (shared by all sessions)", expanded=False):
+        if report.empty:
+            st.info("No datasets loaded.")
+            return
+        st.metric("Total memory, MB", f"{report['memory_mb'].sum():.1f}")
+        st.dataframe(report, use_container_width=True, hide_index=True)
+
 def show_file_navigator():
     if not st.session_state.uploaded_files:
         st.warning("No files uploaded yet.")
@@ -95,6 +174,7 @@ def show_file_navigator():
 def show():
     st.title("📁 Data Import and Viewer")
 
+    show_import_settings()
     upload_file()
 
     if st.session_state.uploaded_files:
@@ -111,6 +191,8 @@ def show():
                 st.session_state.clever_data.pop(file_path, None)
                 st.rerun()
 
+    show_memory_report()
+
     st.divider()
     show_file_navigator()
 
@@ -4,38 +4,43 @@ import altair as alt
 import pandas as pd
 import numpy as np
 
+from modules.ggTipsModule.ggTips_cube import TipsCube, build_cube
+from modules.ggTipsModule.ggTips_pipeline import unify_company_name
+
 
 # ────────────────────────────────────────────────────────────────
 # helpers
 # ────────────────────────────────────────────────────────────────
-def _prep_companies_df(tips: pd.DataFrame) -> pd.DataFrame:
+def _prep_companies_df(tips: pd.DataFrame, cube: TipsCube | None = None) -> pd.DataFrame:
     """
-    • Фильтрует только завершённые транзакции (Status == finished, если колонка есть)
-    • Группирует по Company → Amount (sum) | Count (n)
-    • Вычисляет Scope ≈ ½[(Amount / one_avg_tip) + Count]
-    • Добавляет «Days since last transaction»
+    • Фильтрует только завершённые транзакции (Status == finished, если колонка есть)
+    • Группирует по Company → Amount (sum) | Count (n)
+    • Вычисляет Scope ≈ ½[(Amount / one_avg_tip) + Count]
+    • Добавляет «Days since last transaction»
+    Суммы берутся из куба (ggTips_cube), а не из сырых транзакций.
     """
     if tips.empty or "company" not in tips.columns:
         return pd.DataFrame()
-
-    df = tips.copy()
+    cube = cube if cube is not None else build_cube(tips)
 
     # ── группировка ─────────────────────────────────────────────
+    per_company = cube.rollup(["company"], dropna=False)
+    per_company["Company"] = per_company["company"].map(unify_company_name)
     grouped = (
-        df.groupby("company_unified", dropna=False, observed=True)
-          .agg(Amount=("amount", "sum"),
-               Count=("uuid", "count"))
+        per_company.groupby("Company", dropna=False, observed=True)
+          .agg(Amount=("Amount", "sum"),
+               Count=("Count", "sum"))
           .reset_index()
-          .rename(columns={"company_unified": "Company"})
     )
     # ── Scope ──────────────────────────────────────────────────
-    one_avg_tip = df["amount"].mean() or 1          # защита от нуля
+    totals = cube.totals()
+    one_avg_tip = (totals["Amount"] / totals["AmountCount"] if totals["AmountCount"] else 0) or 1  # защита от нуля
     grouped["Scope"] = ((grouped["Amount"] / one_avg_tip) + grouped["Count"]) / 2
     grouped["Scope"] = grouped["Scope"].round(1)
 
     # ── Days since last transaction ────────────────────────────
-    if "date" in df.columns:
-        last_trx = df.groupby("company")["date"].max().reset_index()
+    if "date" in tips.columns:
+        last_trx = per_company.loc[per_company["company"].notna(), ["company", "LastTx"]]
         last_trx.columns = ["Company", "Last transaction"]
         grouped = grouped.merge(last_trx, on="Company", how="left")
         today = pd.to_datetime("today").normalize()
@@ -104,7 +109,7 @@ def show(data: dict | None = None) -> None:
         st.info("No data for Top Companies yet.")
         return
 
-    companies_df = _prep_companies_df(tips_df)
+    companies_df = _prep_companies_df(tips_df, data.get("ggtipsCube"))
     if companies_df.empty:
         st.info("Nothing to aggregate for companies.")
         return
@@ -4,6 +4,8 @@ import streamlit as st
 import pandas as pd
 import altair as alt
 
+from active_sweep import active_over_time
+
 def show(data: dict | None = None) -> None:
     """
     Вкладка «Company Connections» показывает, как менялось число активных филиалов
@@ -19,9 +21,10 @@ def show(data: dict | None = None) -> None:
         st.info("No company data for connections yet.")
         return
 
-    # 2) Преобразуем колонки start и end в datetime
-    companies['start'] = pd.to_datetime(companies.get('start'), errors='coerce')
-    companies['end']   = pd.to_datetime(companies.get('end'),   errors='coerce')
+    # 2) start и end уже datetime (data_schema); в старых выгрузках их может не быть
+    for col in ('start', 'end'):
+        if col not in companies.columns:
+            companies[col] = pd.NaT
 
     # 3) UI: диапазон дат и уровень агрегации
     with st.expander("Config", expanded=True):
@@ -45,21 +48,11 @@ def show(data: dict | None = None) -> None:
                 key="conn_time_interval"
             )
 
-    # 4) Собираем статистику по каждому дню
-    drange = pd.date_range(start=pd.to_datetime(start_date), end=pd.to_datetime(end_date))
-    stats = []
-    for day in drange:
-        active = companies[
-            (companies['start'].notna()) &
-            ((companies['end'].isna()) | (companies['end'] >= day)) &
-            (companies['start'] <= day)
-        ]
-        stats.append({
-            'Date': day,
-            'Active Branches': active.shape[0],
-            'Active Companies': active['helpercompanyname'].nunique()
-        })
-    df = pd.DataFrame(stats)
+    # 4) Статистика по каждому дню — развёртка событий по интервалам [start, end]
+    df = active_over_time(
+        companies['start'], companies['end'], start_date, end_date,
+        keys=companies['helpercompanyname'],
+    ).rename(columns={'Active': 'Active Branches', 'Distinct': 'Active Companies'})
 
     # 5) Рассчитываем суточные дельты
     df['Branches Change']  = df['Active Branches'].diff().fillna(0)
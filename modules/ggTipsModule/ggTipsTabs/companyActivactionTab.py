@@ -85,9 +85,7 @@ def show(data: dict | None = None) -> None:
         tips_clean = tips_clean[~tips_clean["ggPayer"].isin(teammates["id"])]
     if "status" in tips_clean.columns:
         tips_clean = tips_clean[tips_clean["status"] == "finished"]
-    if "date" in tips_clean.columns:
-        tips_clean["date"] = pd.to_datetime(tips_clean["date"], errors="coerce")
-    else:
+    if "date" not in tips_clean.columns:
         st.warning("Tips data must contain 'date' column.")
         return
 
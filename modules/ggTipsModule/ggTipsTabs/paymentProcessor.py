@@ -4,40 +4,32 @@ import streamlit as st
 import pandas as pd
 import altair as alt
 
+from modules.ggTipsModule.ggTips_cube import cube_for
+
 def show(data: dict | None = None) -> None:
     st.subheader("Payment Methods Over Time")
 
-    tips = data.get("ggtips", pd.DataFrame()).copy()
+    tips = data.get("ggtips", pd.DataFrame())
     if tips.empty or "payment processor" not in tips.columns:
         st.info("No info about payment procoessor.")
         return
 
-    # Приводим дату в datetime
-    tips["date"] = pd.to_datetime(tips["date"], errors="coerce")
-    tips = tips.dropna(subset=["date", "payment processor"])
-
-    # Группируем по неделям и месяцам
-    tips = tips.assign(
-        Week  = lambda df: df["date"].dt.to_period("W").dt.start_time,
-        Month = lambda df: df["date"].dt.to_period("M").dt.start_time
-    )
-
-    # Подсчёт транзакций по способам оплаты
+    # Считаем по кубу (дни × процессор): строки без даты и процессора не попадают
+    cube = cube_for(data)
     weekly = (
-        tips.groupby(["Week", "payment processor"], observed=True)
-            .size()
-            .reset_index(name="Count")
+        cube.rollup(["payment processor"], interval="Week")
+            [["time_group", "payment processor", "Rows"]]
+            .rename(columns={"time_group": "Week", "Rows": "Count"})
     )
     monthly = (
-        tips.groupby(["Month", "payment processor"], observed=True)
-            .size()
-            .reset_index(name="Count")
+        cube.rollup(["payment processor"], interval="Month")
+            [["time_group", "payment processor", "Rows"]]
+            .rename(columns={"time_group": "Month", "Rows": "Count"})
     )
     overall = (
-        tips["payment processor"]
-            .value_counts()
+        weekly.groupby("payment processor", observed=True)["Count"].sum()
+            .sort_values(ascending=False)
             .reset_index()
-            .rename(columns={"index":"payment processor", "payment processor":"Count"})
     )
 
     # Вкладки
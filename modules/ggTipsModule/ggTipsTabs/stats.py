@@ -1,18 +1,23 @@
 import streamlit as st
 
+from modules.ggTipsModule.ggTips_cube import cube_for
+
 def show(data):
 
     ggTipsDataFiltered = data['ggtips']
     ggTipsDataGrouped = data['ggtipsGrouped']
+    # суммы и количества — из куба, по сырым строкам только медиана, интервал и топ-5
+    cube = cube_for(data)
+    totals = cube.totals()
     # ggTipsCompaniesData = data['ggtipsCompanies']
     # ggTipsPartnersData = data['ggtipsPartners']
 
     col1, col2, col3, col4 = st.columns(4)
 
-    avg_amount = ggTipsDataFiltered['amount'].mean()
-    max_amount = ggTipsDataFiltered['amount'].max()
-    total_count = len(ggTipsDataFiltered)
-    total_amount = ggTipsDataFiltered['amount'].sum()
+    avg_amount = totals['Amount'] / totals['AmountCount'] if totals['AmountCount'] else float('nan')
+    max_amount = totals['Max']
+    total_count = int(totals['Rows'])
+    total_amount = totals['Amount']
 
     with col1:
         st.metric("Total Transactions", f"{total_count}")
@@ -25,7 +30,7 @@ def show(data):
             st.metric("Max Tip", f"{int(max_amount)}")
 
     # Дополнительные показатели
-    min_amount = ggTipsDataFiltered['amount'].min()
+    min_amount = totals['Min']
     median_amount = ggTipsDataFiltered['amount'].median()
     col5, col6 = st.columns(2)
     with col5:
@@ -57,11 +62,13 @@ def show(data):
 
     # ---------- DAILY TIPS STATS ----------
     if 'date' in ggTipsDataFiltered.columns:
-        daily = ggTipsDataFiltered.copy()
-        daily['day'] = daily['date'].dt.date
-        daily_stats = daily.groupby('day').agg({'amount': ['sum', 'count']})
-        daily_stats.columns = ['total_amount', 'transaction_count']
-        daily_stats = daily_stats.reset_index()
+        daily_stats = cube.rollup(interval='Day')
+        daily_stats = (
+            daily_stats
+            .assign(day=daily_stats['time_group'].dt.date)
+            .rename(columns={'Amount': 'total_amount', 'AmountCount': 'transaction_count'})
+            [['day', 'total_amount', 'transaction_count']]
+        )
         avg_daily_count = daily_stats['transaction_count'].mean()
         avg_daily_amount = daily_stats['total_amount'].mean()
         col7, col8 = st.columns(2)
@@ -80,23 +87,21 @@ def show(data):
     # ---------- TOP 5 PARTNERS & COMPANIES ----------
     if 'partner' in ggTipsDataFiltered.columns:
         top_partners = (
-            ggTipsDataFiltered
-            .groupby('partner')['amount']
-            .sum()
+            cube.rollup(['partner'])
+            .set_index('partner')['Amount']
             .nlargest(5)
             .reset_index()
-            .rename(columns={'amount':'total_amount'})
+            .rename(columns={'Amount':'total_amount'})
         )
         st.subheader("Top 5 Partners by Total Amount")
         st.table(top_partners)
     if 'company' in ggTipsDataFiltered.columns:
         top_companies = (
-            ggTipsDataFiltered
-            .groupby('company')['amount']
-            .sum()
+            cube.rollup(['company'])
+            .set_index('company')['Amount']
             .nlargest(5)
             .reset_index()
-            .rename(columns={'amount':'total_amount'})
+            .rename(columns={'Amount':'total_amount'})
         )
         st.subheader("Top 5 Companies by Total Amount")
         st.table(top_companies)
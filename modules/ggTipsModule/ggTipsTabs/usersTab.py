@@ -5,6 +5,12 @@ import streamlit as st
 import pandas as pd
 import altair as alt
 
+from modules.ggTipsModule.ggTips_rfm import payer_rfm
+from modules.ggTipsModule.ggTips_users import PayerCompanyMatrix, regularity
+
+# строк данных на лист Excel (1 048 576 минус заголовок)
+EXCEL_MAX_ROWS = 1_048_575
+
 def show(data: dict | None = None) -> None:
     st.subheader("Users Tip Distribution")
 
@@ -13,7 +19,6 @@ def show(data: dict | None = None) -> None:
     if tips.empty:
         st.info("Нет данных по чаевым.")
         return
-    tips["date"] = pd.to_datetime(tips["date"], errors="coerce")
     tips = tips.dropna(subset=["payer", "date", "uuid"])
     today = pd.to_datetime("today").normalize()
 
@@ -30,21 +35,13 @@ def show(data: dict | None = None) -> None:
 
     # ─── 3) Pivot-таблица ───────────────────────────────────────────────────────
     with st.expander("Pivot table", expanded=True):
-        pivot = pd.pivot_table(
+        # разреженная матрица по всем плательщикам, плотная — только top N
+        matrix = PayerCompanyMatrix(
             tips,
-            index="payer",
-            columns="company",
             values="amount",
             aggfunc="count" if agg_type=="Count" else "sum",
-            fill_value=0
-        )
-        pivot["__Total"] = pivot.sum(axis=1)
-        pivot = (
-            pivot[pivot["__Total"] >= thresh]
-                .sort_values("__Total", ascending=False)
-                .head(top_n)
-                .drop(columns="__Total")
         )
+        pivot = matrix.dense(matrix.top(top_n, thresh))
         st.write(f"Top {len(pivot)} users ({agg_type}), ≥{thresh:.0f}")
         st.dataframe(pivot, use_container_width=True)
 
@@ -81,50 +78,20 @@ def show(data: dict | None = None) -> None:
         )
 
     # ─── 5) RFM-подобная таблица ────────────────────────────────────────────────
-    rfm = (
-        tips.groupby("payer")
-            .agg(
-                FirstTip   = ("date","min"),
-                LastTip    = ("date","max"),
-                Count      = ("uuid","count"),
-                Amount     = ("amount","sum"),
-                Companies  = ("company",pd.Series.nunique),
-                ActiveDays = ("date", lambda s: s.dt.date.nunique()),
-            )
-            .reset_index()
-    )
+    # из ggTips_navigation: готовая таблица (сохранённое состояние или выборка)
+    rfm = data.get("ggtipsRfm")
+    if rfm is None:
+        rfm = payer_rfm(tips)
     rfm["Lifespan"] = (rfm["LastTip"] - rfm["FirstTip"]).dt.days
 
-    # ─── 6) Уникальные дни и дата «становления регулярным» ─────────────────────
-    uniq = ( 
-        tips.assign(day=tips["date"].dt.normalize())
-            .drop_duplicates(subset=["payer","day"])
-            .sort_values(["payer","day"])
-            .groupby("payer")["day"]
-            .apply(list)
-            .reset_index(name="days_list")
-    )
-
-    def find_regular_start(days, gap, mind):
-        if len(days) < mind:
-            return pd.NaT
-        for i in range(mind, len(days)+1):
-            seq = days[:i]
-            diffs = [(seq[j] - seq[j-1]).days for j in range(1,len(seq))]
-            if max(diffs) <= gap:
-                return seq[-1]
-        return pd.NaT
-
-    uniq["RegularSince"] = uniq["days_list"].apply(
-        lambda d: find_regular_start(d, period_thresh, min_tips)
-    )
-    qualifiers = uniq.dropna(subset=["RegularSince"]).copy()
-
-    # ─── 7) Флаг «Ongoing» ──────────────────────────────────────────────────────
-    qualifiers = qualifiers.merge(
-        rfm[["payer","LastTip"]], on="payer", how="left"
+    # ─── 6) Дата «становления регулярным», периодичность и 7) флаг «Ongoing» ───
+    # один проход по отсортированным (payer, день), см. ggTips_users.regularity
+    regular = regularity(tips, period_thresh, min_tips, today=today)
+    qualifiers = (
+        regular.dropna(subset=["RegularSince"])
+               [["payer", "RegularSince", "LastTip", "Ongoing"]]
+               .reset_index(drop=True)
     )
-    qualifiers["Ongoing"] = (today - qualifiers["LastTip"]).dt.days <= period_thresh
 
     # ─── 8) KPI ─────────────────────────────────────────────────────────────────
     total_users   = tips["payer"].nunique()
@@ -147,24 +114,8 @@ def show(data: dict | None = None) -> None:
         )
 
         # 2) Добавляем средний период между уникальными днями чаевых
-        gaps_summary = (
-            tips.assign(day=tips["date"].dt.normalize())
-                .drop_duplicates(subset=["payer","day"])
-                .sort_values(["payer","day"])
-                .groupby("payer")["day"]
-                .apply(list)
-                .reset_index(name="days_list")
-        )
-        def avg_gap(days):
-            if len(days) < 2:
-                return None
-            ds = sorted(days)
-            diffs = [(ds[i] - ds[i-1]).days for i in range(1, len(ds))]
-            return sum(diffs) / len(diffs)
-        gaps_summary["Periodicity"] = gaps_summary["days_list"].apply(avg_gap)
-
         df_detail = df_detail.merge(
-            gaps_summary[["payer","Periodicity"]],
+            regular[["payer","Periodicity"]],
             on="payer", how="left"
         )
 
@@ -428,9 +379,19 @@ def show(data: dict | None = None) -> None:
 
     # ─── 14) Download pivot as Excel ───────────────────────────────────────────
     with st.expander("Download pivot as Excel"):
+        full_matrix = st.checkbox(
+            f"Include all payers × companies ({len(matrix):,} non-empty cells)", value=False
+        )
         buf = io.BytesIO()
         with pd.ExcelWriter(buf, engine="xlsxwriter") as wr:
             pivot.to_excel(wr, sheet_name="UsersTips")
+            if full_matrix:
+                # вся матрица — только непустые ячейки, по листам до лимита строк Excel
+                cells = matrix.cells()
+                for part, start in enumerate(range(0, len(cells), EXCEL_MAX_ROWS)):
+                    cells.iloc[start:start + EXCEL_MAX_ROWS].to_excel(
+                        wr, sheet_name=f"AllCells{part + 1 if part else ''}", index=False
+                    )
         st.download_button(
             "Download pivot as Excel",
             data=buf.getvalue(),
@@ -0,0 +1,151 @@
+# modules/ggTipsModule/ggTips_companies.py
+"""
+Измерение компаний для ggTips: CompanyDim — лист компаний с company_id, один
+на версию листа, и JoinedTips — left join транзакций с ним без материализации.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+from pandas.api.extensions import take
+
+from dataset_store import cached_by_version
+
+
+def extract_street_name(full_address: str) -> str:
+    """
+    Удаляет номер дома и дроби из адреса, оставляя только название улицы.
+    Пример: '39/12 Մесրոպ Մաշտոց' -> 'Մесրոպ Մաշտոց'
+    """
+    if not isinstance(full_address, str):
+        return full_address
+    return re.sub(r'^\d+(?:/\d+)?\s*', '', full_address).strip()
+
+def _values(ser: pd.Series):
+    # ndarray для numpy-типов, ExtensionArray для category / nullable / tz
+    return ser.array if isinstance(ser.dtype, pd.api.extensions.ExtensionDtype) else ser.to_numpy()
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Измерение компаний
+# ──────────────────────────────────────────────────────────────────────────────
+class CompanyDim:
+    """
+    Лист компаний с company_id. Филиалы одной компании — несколько строк
+    frame с одним id; NaN в company — тоже ключ (как в DataFrame.join).
+    """
+
+    def __init__(self, companies: pd.DataFrame):
+        companies = companies.assign(
+            company_unified=companies['company'],
+            street_name=companies['adress'].apply(extract_street_name) if 'adress' in companies.columns else None,
+        )
+        codes, names = pd.factorize(companies['company'], use_na_sentinel=False)
+        self.frame = companies
+        self.names = pd.Index(np.asarray(names, dtype=object))
+        self.company_id = codes.astype(np.int32)
+        # строки frame, сгруппированные по id (внутри — в порядке листа)
+        self.counts = np.bincount(codes, minlength=len(self.names))
+        self.starts = np.cumsum(self.counts) - self.counts
+        self.order = np.argsort(codes, kind='stable')
+        self._nan_id = int(self.names.get_indexer([np.nan])[0])
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def ids_for(self, ser: pd.Series) -> np.ndarray:
+        """company_id для каждого значения ser; -1 — компании нет в листе."""
+        if isinstance(ser.dtype, pd.CategoricalDtype):
+            # по категориям, а не по строкам
+            category_ids = self.names.get_indexer(ser.cat.categories)
+            codes = ser.cat.codes.to_numpy()
+            ids = np.where(codes >= 0, category_ids[codes], self._nan_id)
+        else:
+            ids = self.names.get_indexer(ser)
+        return ids.astype(np.int32)
+
+    def expand(self, ids: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Позиции left join: (tip_pos, dim_pos) — строка транзакции и строка
+        frame (-1 — без компании). У компании с k филиалами k строк.
+        """
+        counts = np.where(ids >= 0, self.counts[ids], 0)
+        starts = np.where(ids >= 0, self.starts[ids], 0)
+        if (counts <= 1).all():
+            return np.arange(len(ids)), np.where(counts > 0, self.order[starts], -1)
+        repeats = np.maximum(counts, 1)
+        tip_pos = np.repeat(np.arange(len(ids)), repeats)
+        offset = np.arange(len(tip_pos)) - np.repeat(np.cumsum(repeats) - repeats, repeats)
+        matched = counts[tip_pos] > 0
+        dim_pos = np.full(len(tip_pos), -1)
+        dim_pos[matched] = self.order[starts[tip_pos[matched]] + offset[matched]]
+        return tip_pos, dim_pos
+
+def company_dim(companies: pd.DataFrame) -> CompanyDim | None:
+    """CompanyDim листа компаний, один на версию листа; None без колонки company."""
+    if companies.empty or 'company' not in companies.columns:
+        return None
+    return cached_by_version("ggTips_companies.dim", companies, CompanyDim)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Транзакции + компании
+# ──────────────────────────────────────────────────────────────────────────────
+class JoinedTips:
+    """
+    tips.join(dim.frame.set_index('company'), on='company', how='left',
+    rsuffix='_co') без материализации. Для фильтров ведёт себя как фрейм:
+    len(), .columns и [col] (колонка, собранная take по позициям);
+    frame(mask) собирает обычный DataFrame для выбранных строк.
+    """
+
+    def __init__(self, tips: pd.DataFrame, dim: CompanyDim | None = None, rsuffix: str = '_co'):
+        self.tips = tips
+        self.dim = dim
+        self._dim_columns: dict[str, str] = {}
+        if dim is None or 'company' not in tips.columns:
+            self.dim = None
+            self.company_id = None
+            self.tip_pos = np.arange(len(tips))
+            self.dim_pos = None
+        else:
+            self.company_id = dim.ids_for(tips['company'])
+            self.tip_pos, self.dim_pos = dim.expand(self.company_id)
+            for col in dim.frame.columns:
+                if col != 'company':
+                    self._dim_columns[col + rsuffix if col in tips.columns else col] = col
+        self._identity = len(self.tip_pos) == len(tips)
+        self.index = tips.index if self._identity else tips.index.take(self.tip_pos)
+        self.columns = tips.columns.append(pd.Index(list(self._dim_columns), dtype=object))
+
+    def __len__(self) -> int:
+        return len(self.tip_pos)
+
+    def _take_tips(self, col: str, rows: np.ndarray | None = None) -> pd.Series:
+        ser = self.tips[col]
+        if rows is None and self._identity:
+            return ser
+        pos = self.tip_pos if rows is None else self.tip_pos[rows]
+        return ser.take(pos)
+
+    def _take_dim(self, col: str, rows: np.ndarray | None = None) -> np.ndarray:
+        pos = self.dim_pos if rows is None else self.dim_pos[rows]
+        return take(_values(self.dim.frame[self._dim_columns[col]]), pos, allow_fill=True)
+
+    def __getitem__(self, col: str) -> pd.Series:
+        if col in self._dim_columns:
+            return pd.Series(self._take_dim(col), index=self.index, name=col)
+        ser = self._take_tips(col)
+        return ser if self._identity else ser.set_axis(self.index)
+
+    def frame(self, mask: np.ndarray | None = None, columns: list[str] | None = None) -> pd.DataFrame:
+        """DataFrame выбранных строк (mask) и колонок; индекс — индекс tips."""
+        rows = None if mask is None else np.flatnonzero(mask)
+        columns = list(self.columns) if columns is None else columns
+        tip_cols = [c for c in columns if c not in self._dim_columns]
+        pos = self.tip_pos if rows is None else self.tip_pos[rows]
+        out = self.tips[tip_cols].take(pos)
+        dim_cols = [c for c in columns if c in self._dim_columns]
+        if dim_cols:
+            out = pd.concat([out, pd.DataFrame({c: self._take_dim(c, rows) for c in dim_cols}, index=out.index)], axis=1)
+        return out if list(out.columns) == columns else out[columns]
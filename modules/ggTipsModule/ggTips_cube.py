@@ -0,0 +1,141 @@
+# modules/ggTipsModule/ggTips_cube.py
+"""
+Предагрегированный куб транзакций ggTips.
+
+TipsCube сворачивает транзакции до ячеек день × company × partner ×
+payment processor × status с метриками:
+
+    Amount       сумма amount
+    AmountCount  число непустых amount (для среднего)
+    Count        число транзакций с uuid (как groupby(...)['uuid'].count())
+    Rows         число строк
+    Min / Max    минимум / максимум amount
+    LastTx       последняя дата транзакции
+
+Вкладки (allTipsTab / stats, paymentProcessor, CompaniesTab) отвечают на
+запросы по времени свёрткой куба (rollup). Куб строится стадией
+ggTips_pipeline.cube по итоговым транзакциям сайдбара и кэшируется вместе
+с ними.
+"""
+import numpy as np
+import pandas as pd
+
+from time_buckets import bucket_codes, bucket_sum
+
+CUBE_DIMENSIONS = ['company', 'partner', 'payment processor', 'status']
+
+# интервалы, которые выражаются через дни (остальные зависят от времени суток)
+CUBE_INTERVALS = ('Day', 'Week', 'Month', 'Year', 'Week day', 'Week partial', 'Month partial')
+
+# как сворачивать метрики ячеек
+_ROLLUP = {
+    'Amount': 'sum',
+    'AmountCount': 'sum',
+    'Count': 'sum',
+    'Rows': 'sum',
+    'Min': 'min',
+    'Max': 'max',
+    'LastTx': 'max',
+}
+
+
+class TipsCube:
+    """
+    Ячейки куба (cells: колонка day + измерения + метрики) и самая ранняя
+    дата сырых транзакций (earliest) — от неё считаются partial-интервалы.
+    """
+
+    def __init__(self, cells: pd.DataFrame, earliest: pd.Timestamp | None = None):
+        self.cells = cells
+        self.earliest = earliest
+
+    def __len__(self) -> int:
+        return len(self.cells)
+
+    @property
+    def empty(self) -> bool:
+        return self.cells.empty
+
+    def totals(self) -> pd.Series:
+        """Метрики по всем ячейкам сразу."""
+        return self.cells[list(_ROLLUP)].agg(_ROLLUP)
+
+    def rollup(self, by=(), interval: str | None = None, dropna: bool = True) -> pd.DataFrame:
+        """
+        Метрики, свёрнутые по измерениям by и (если задан interval) по
+        интервалу времени в колонке time_group. Ячейки без даты в
+        интервалы не попадают.
+        """
+        cells, keys = self.cells, list(by)
+        if interval is not None:
+            if interval not in CUBE_INTERVALS:
+                raise ValueError(f"Interval {interval!r} does not roll up from days")
+            codes, labels = bucket_codes(cells['day'], interval, origin=self.earliest)
+            keep = codes >= 0
+            cells = cells[keep].assign(time_group=labels[codes[keep]])
+            keys = ['time_group'] + keys
+        if not keys:
+            return self.totals().to_frame().T
+        return (
+            cells
+            .groupby(keys, observed=True, dropna=dropna)
+            .agg(**{m: (m, how) for m, how in _ROLLUP.items()})
+            .reset_index()
+        )
+
+    def time_series(self, interval: str) -> pd.DataFrame:
+        """[time_group, Amount, Count] — как group_by_time_interval по сырым транзакциям."""
+        if self.empty:
+            return pd.DataFrame()
+        codes, labels = bucket_codes(self.cells['day'], interval, origin=self.earliest)
+        return pd.DataFrame({
+            'time_group': labels,
+            'Amount': bucket_sum(codes, len(labels), self.cells['Amount']),
+            'Count': bucket_sum(codes, len(labels), self.cells['Count']),
+        })
+
+
+def build_cube(tips: pd.DataFrame) -> TipsCube:
+    """Сворачивает транзакции в ячейки день × CUBE_DIMENSIONS."""
+    dims = [c for c in CUBE_DIMENSIONS if c in tips.columns]
+    n = len(tips)
+    dates = tips['date'] if 'date' in tips.columns else pd.Series(pd.NaT, index=tips.index)
+    amount = tips['amount'] if 'amount' in tips.columns else pd.Series(np.nan, index=tips.index)
+    uuid = tips['uuid'] if 'uuid' in tips.columns else pd.Series(np.nan, index=tips.index)
+
+    day_codes, days = bucket_codes(dates, 'Day')
+    frame = pd.DataFrame({
+        'day': day_codes,
+        **{c: tips[c].to_numpy() if not isinstance(tips[c].dtype, pd.CategoricalDtype) else tips[c].array
+           for c in dims},
+        'amount': amount.to_numpy(),
+        'has_uuid': uuid.notna().to_numpy(),
+        'date': dates.to_numpy(),
+    }, index=pd.RangeIndex(n))
+    cells = (
+        frame
+        .groupby(['day', *dims], observed=True, dropna=False, sort=True)
+        .agg(
+            Amount=('amount', 'sum'),
+            AmountCount=('amount', 'count'),
+            Count=('has_uuid', 'sum'),
+            Rows=('amount', 'size'),
+            Min=('amount', 'min'),
+            Max=('amount', 'max'),
+            LastTx=('date', 'max'),
+        )
+        .reset_index()
+    )
+    codes = cells['day'].to_numpy()
+    day_values = np.full(len(cells), np.datetime64('NaT'), dtype='datetime64[ns]')
+    day_values[codes >= 0] = days.to_numpy()[codes[codes >= 0]]
+    cells['day'] = day_values
+    earliest = dates.min() if n else None
+    return TipsCube(cells, None if pd.isna(earliest) else earliest)
+
+def cube_for(data: dict) -> TipsCube:
+    """Куб из данных сайдбара; если его нет (вкладка вызвана отдельно) — строится по ggtips."""
+    cube = data.get('ggtipsCube')
+    if cube is None:
+        cube = build_cube(data.get('ggtips', pd.DataFrame()))
+    return cube
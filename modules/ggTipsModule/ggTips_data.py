@@ -1,5 +1,6 @@
 # C:\Users\user\OneDrive\Desktop\Workspace\ggAnalyze\modules\ggTipsModule\ggTips_data.py
 import pandas as pd
+from categories import concat_frames
 from data_loader import merge_ggtips
 
 def get_combined_tips_data(session_clever_data: dict) -> dict:
@@ -55,7 +56,7 @@ def get_combined_tips_data(session_clever_data: dict) -> dict:
     # собираем финальный результат
     result = {}
     for key, dfs in combined.items():
-        result[key] = pd.concat(dfs, ignore_index=True) if dfs else pd.DataFrame()
+        result[key] = concat_frames(dfs, ignore_index=True) if dfs else pd.DataFrame()
     result['defaultInputs'] = default_inputs
 
     return result
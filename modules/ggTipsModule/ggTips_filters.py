@@ -0,0 +1,97 @@
+# modules/ggTipsModule/ggTips_filters.py
+"""
+FilterSpec — предикаты фильтров сайдбара ggTips (статус, сумма, процессор,
+компания, регион, улица, даты, партнёр, gg teammates). mask() считает их одной
+общей булевой маской, stats — селективность каждого предиката.
+"""
+import numpy as np
+import pandas as pd
+
+STATS_COLUMNS = ["stage", "predicate", "rows", "pass", "selectivity", "kept"]
+
+
+def as_mask(values) -> np.ndarray:
+    """Результат сравнения -> np.bool_; NA считается невыполненным условием."""
+    if isinstance(values, pd.Series):
+        if values.dtype != bool:
+            values = values.fillna(False)
+        return values.to_numpy(dtype=bool)
+    return np.asarray(values, dtype=bool)
+
+def normalized_isin(ser: pd.Series, values) -> np.ndarray:
+    """
+    ser.astype(str).str.lower().str.strip().isin(values) без строк на каждую
+    строку фрейма: у category нормализуются только категории.
+    """
+    values = set(values)
+    if isinstance(ser.dtype, pd.CategoricalDtype):
+        ok = ser.cat.categories.astype(str).str.lower().str.strip().isin(values)
+        codes = ser.cat.codes.to_numpy()
+        return np.where(codes >= 0, np.asarray(ok)[codes], "nan" in values)
+    return ser.astype(str).str.lower().str.strip().isin(values).to_numpy()
+
+def first_per_key(df: pd.DataFrame, mask: np.ndarray, column: str = "uuid") -> np.ndarray:
+    """mask, в котором из строк с одинаковым column оставлена первая (как drop_duplicates)."""
+    if column not in df.columns:
+        return mask
+    rows = np.flatnonzero(mask)
+    repeated = df[column].iloc[rows].duplicated().to_numpy()
+    if repeated.any():
+        mask = mask.copy()
+        mask[rows[repeated]] = False
+    return mask
+
+
+class FilterSpec:
+    """
+    Список именованных предикатов над DataFrame. Предикат — функция
+    df -> булев массив; предикаты по колонкам, которых нет во фрейме,
+    пропускаются.
+    """
+
+    def __init__(self, stage: str = ""):
+        self.stage = stage
+        self._predicates: list[tuple[str, str | None, object]] = []
+        self.stats = pd.DataFrame(columns=STATS_COLUMNS)
+
+    def __len__(self) -> int:
+        return len(self._predicates)
+
+    def add(self, name: str, predicate, column: str | None = None) -> "FilterSpec":
+        self._predicates.append((name, column, predicate))
+        return self
+
+    def isin(self, column: str, values, name: str | None = None) -> "FilterSpec":
+        values = list(values)
+        return self.add(name or column, lambda df: df[column].isin(values), column)
+
+    def between(self, column: str, low, high, name: str | None = None) -> "FilterSpec":
+        return self.add(name or column, lambda df: (df[column] >= low) & (df[column] <= high), column)
+
+    def equals(self, column: str, value, name: str | None = None) -> "FilterSpec":
+        return self.add(name or column, lambda df: df[column] == value, column)
+
+    def mask(self, df: pd.DataFrame, base: np.ndarray | None = None) -> np.ndarray:
+        """Общая маска всех предикатов (И), начиная с base; заполняет self.stats."""
+        mask = np.ones(len(df), dtype=bool) if base is None else base.copy()
+        rows = len(df)
+        stats = []
+        for name, column, predicate in self._predicates:
+            if column is not None and column not in df.columns:
+                continue
+            passed = as_mask(predicate(df))
+            mask &= passed
+            stats.append({
+                "stage": self.stage,
+                "predicate": name,
+                "rows": rows,
+                "pass": int(passed.sum()),
+                "selectivity": float(passed.mean()) if rows else 1.0,
+                "kept": int(mask.sum()),
+            })
+        self.stats = pd.DataFrame(stats, columns=STATS_COLUMNS)
+        return mask
+
+    def apply(self, df: pd.DataFrame) -> pd.DataFrame:
+        """df с одной выборкой по общей маске."""
+        return df[self.mask(df)] if len(self) else df
@@ -0,0 +1,454 @@
+# modules/ggTipsModule/ggTips_pipeline.py
+"""
+Стадии сайдбара ggTips: combine -> enrich -> join -> filter -> group. Каждая
+стадия кэшируется (memo) по ключу входов — отпечатки датасетов плюс значения
+виджетов; результаты общие для сессий и только для чтения.
+"""
+import hashlib
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from data_loader import PARTNER_FLAGS, add_partner_flags
+from dataset_store import cached, clear_cached
+from modules.ggTipsModule import ggTips_data
+from modules.ggTipsModule.ggTips_companies import JoinedTips, company_dim, extract_street_name
+from modules.ggTipsModule.ggTips_cube import CUBE_INTERVALS, TipsCube, build_cube
+from modules.ggTipsModule.ggTips_filters import STATS_COLUMNS, FilterSpec, first_per_key, normalized_isin
+from modules.ggTipsModule.ggTips_rfm import PayerStateStore, clean_tips, payer_rfm
+from modules.ggTipsModule.ggTips_teammates import teammate_index
+from time_buckets import INTERVALS, bucket_codes, bucket_count, bucket_sum
+
+# сколько раз стадия реально считалась (для отладки и бенчмарков)
+stage_runs: Counter = Counter()
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Кэш стадий
+# ──────────────────────────────────────────────────────────────────────────────
+def freeze(value):
+    """Значение виджета -> хэшируемый ключ (списки -> кортежи)."""
+    if isinstance(value, dict):
+        return tuple(sorted((k, freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(freeze(v) for v in value)
+    return value
+
+def data_key(session_clever_data: dict) -> tuple | None:
+    """
+    Ключ набора файлов — пути и отпечатки их Dataset. None, если у данных нет
+    отпечатка (не из DatasetRegistry): тогда стадии не кэшируются.
+    """
+    key = []
+    for path, file_data in session_clever_data.items():
+        fingerprint = getattr(file_data, "fingerprint", None)
+        if fingerprint is None:
+            return None
+        key.append((path, fingerprint))
+    return tuple(key)
+
+def stage_key(upstream: tuple | None, *params) -> tuple | None:
+    return None if upstream is None else (upstream, freeze(params))
+
+def view_id(*specs) -> str:
+    """Отпечаток значений фильтров без набора файлов — имя выборки в PayerStateStore."""
+    return hashlib.sha1(repr(freeze(specs)).encode("utf-8")).hexdigest()[:16]
+
+def memo(stage: str, key: tuple | None, fn, *args):
+    """fn(*args), закэшированный по (stage, key) (dataset_store.cached); key=None — без кэша."""
+    def run(*args):
+        stage_runs[stage] += 1
+        return fn(*args)
+    return cached(f"ggTips_pipeline.{stage}", key, run, *args)
+
+def clear_cache() -> None:
+    clear_cached("ggTips_pipeline.")
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Вспомогательные функции
+# ──────────────────────────────────────────────────────────────────────────────
+def group_by_time_interval(df: pd.DataFrame, interval: str, custom_days: int = 10) -> pd.DataFrame:
+    """
+    Группирует DataFrame df по столбцу 'date' согласно выбранному интервалу.
+    Возвращает DataFrame со столбцами: [time_group, Amount, Count].
+    Для интервалов, где возможно, time_group приводится к datetime.
+    Интервалы считаются time_buckets.bucket_codes без копии и сортировки df.
+    """
+    if 'date' not in df.columns or df.empty or interval not in INTERVALS:
+        return pd.DataFrame()
+    codes, labels = bucket_codes(df['date'], interval, custom_days)
+    return pd.DataFrame({
+        'time_group': labels,
+        'Amount': bucket_sum(codes, len(labels), df['amount']),
+        'Count': bucket_count(codes, len(labels), df['uuid'].notna()),
+    })
+
+def unify_company_name(name: str) -> str:
+    """
+    Приводит названия компаний из транзакций к единому виду.
+    Пример:
+      'Karas Tumanyan', 'Karas Tsaghkadzor', 'Karas mashtoc' -> 'Karas'
+      'Tashir Teryan', 'Tashir Vanadzor' -> 'Tashir Pizza'
+    """
+    if not isinstance(name, str):
+        return name
+    lower = name.lower().strip()
+    if lower.startswith('karas'):
+        return 'Karas'
+    elif lower.startswith('tashir'):
+        return 'Tashir Pizza'
+    return name
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Стадии: combine -> enrich -> join
+# ──────────────────────────────────────────────────────────────────────────────
+def combine(session_clever_data: dict, key: tuple | None) -> dict:
+    """Все файлы сессии -> один набор таблиц (ggTips_data.get_combined_tips_data)."""
+    return memo("combine", key, ggTips_data.get_combined_tips_data, session_clever_data)
+
+def _enrich(combined: dict) -> dict:
+    tips = combined.get('ggtips', pd.DataFrame())
+    companies = combined.get('ggtipsCompanies', pd.DataFrame())
+    partners = combined.get('ggtipsPartners', pd.DataFrame())
+
+    if 'partner' not in partners.columns:
+        if 'name' in partners.columns:
+            partners = partners.rename(columns={'name': 'partner'})
+        else:
+            partners = partners.assign(partner=None)
+
+    # компании: измерение с company_id, company_unified и street_name —
+    # одно на версию листа компаний
+    dim = company_dim(companies)
+    if dim is not None:
+        companies = dim.frame
+    elif not companies.empty:
+        companies = companies.assign(
+            company_unified=None,
+            street_name=companies['adress'].apply(extract_street_name) if 'adress' in companies.columns else None,
+        )
+
+    # gg teammates: is_teammate у транзакций (по payer) и партнёров (по номеру) —
+    # индекс teammates один на версию листа
+    team = teammate_index(combined.get('ggTeammates', pd.DataFrame()))
+    partners = partners.assign(
+        is_teammate=team.has_phone(partners['phonenumber']) if 'phonenumber' in partners.columns else False
+    )
+
+    # транзакции: company_unified (на category apply идёт по категориям, а не по строкам)
+    tips = tips.assign(
+        company_unified=tips['company'].apply(unify_company_name) if 'company' in tips.columns else None,
+        is_teammate=team.has_payer(tips['payer']) if 'payer' in tips.columns else False,
+    )
+    return {'tips': tips, 'companies': companies, 'partners': partners, 'dim': dim}
+
+def enrich(combined: dict, key: tuple | None) -> dict:
+    """Добавляет company_unified / street_name / is_teammate и измерение компаний; входы не меняются."""
+    return memo("enrich", key, _enrich, combined)
+
+INVALID_COMPANY_VALUES = [None, "", "-", "nan", "null", "undefined", "N/A", "none", "not found"]
+
+def _join(enriched: dict) -> dict:
+    tips, companies = enriched['tips'], enriched['companies']
+
+    if 'company_x' in tips.columns and 'company_y' in tips.columns:
+        tips = (
+            tips
+            .assign(
+                company=lambda df: (
+                    df["company_x"].replace(INVALID_COMPANY_VALUES, pd.NA)
+                    .combine_first(df["company_y"].replace(INVALID_COMPANY_VALUES, pd.NA))
+                )
+            )
+            .drop(columns=["company_x", "company_y", "company_unified"], errors="ignore")
+        )
+
+    dim = enriched['dim']
+    if dim is not None and "company" in tips.columns:
+        tips = tips.drop_duplicates(subset="uuid")
+    else:
+        dim = None
+    return dict(enriched, tips=JoinedTips(tips, dim))
+
+def join(enriched: dict, key: tuple | None) -> dict:
+    """Транзакции + компании: left join по company_id без материализации (JoinedTips)."""
+    return memo("join", key, _join, enriched)
+
+def _unique(df: pd.DataFrame, col: str) -> list:
+    return list(df[col].dropna().unique()) if col in df.columns else []
+
+def _filter_options(joined: dict) -> dict:
+    tips = joined['tips']
+    options = {
+        'company': _unique(tips, 'company'),
+        'region': _unique(tips, 'region'),
+        'street_name': _unique(tips, 'street_name'),
+        'status': _unique(tips, 'status'),
+        'payment processor': _unique(tips, 'payment processor'),
+    }
+    for col in ('start', 'end'):
+        if col in tips.columns and pd.api.types.is_datetime64_any_dtype(tips[col]):
+            options[col] = (tips[col].min(), tips[col].max())
+        else:
+            options[col] = (None, None)
+    return options
+
+def filter_options(joined: dict, key: tuple | None) -> dict:
+    """Значения для виджетов фильтров: списки компаний, регионов, улиц, статусов..."""
+    return memo("options", key, _filter_options, joined)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Стадии фильтрации
+# ──────────────────────────────────────────────────────────────────────────────
+# Стадии не копируют транзакции: они сужают общую булеву маску над
+# joined['tips'] (FilterSpec поверх JoinedTips), а фрейм собирается один раз
+# в finalize.
+def _date_bounds(date_range) -> tuple:
+    start, end = date_range
+    return pd.to_datetime(start), pd.to_datetime(end)
+
+def _filter_tips(joined: dict, spec: dict) -> dict:
+    tips, companies = joined['tips'], joined['companies']
+
+    tips_filter = FilterSpec("transactions")
+    if spec['date_range'] and len(spec['date_range']) == 2:
+        tips_filter.between('date', *_date_bounds(spec['date_range']))
+    if spec['companies']:
+        tips_filter.isin('company', spec['companies'])
+
+    companies_filter = FilterSpec("companies")
+    if 'working status' in companies.columns:
+        if spec['company_working'] == 'Yes':
+            companies_filter.equals('working status', 'true')
+        elif spec['company_working'] == 'No':
+            companies_filter.equals('working status', 'false')
+
+    for col, chosen in (('start', spec['start_range']), ('end', spec['end_range'])):
+        if chosen and len(chosen) == 2 and col in tips.columns:
+            tips_filter.between(col, *_date_bounds(chosen))
+            companies_filter.between(col, *_date_bounds(chosen))
+
+    tips_filter.between('amount', spec['amount_min'], spec['amount_max'])
+    if spec['payment_processors']:
+        tips_filter.isin('payment processor', spec['payment_processors'])
+    if spec['statuses']:
+        tips_filter.isin('status', spec['statuses'])
+    if spec['regions']:
+        tips_filter.isin('region', spec['regions'])
+    if spec['streets']:
+        tips_filter.isin('street_name', spec['streets'])
+
+    # после join у филиалов одной компании по строке на uuid — оставляем первую
+    mask = first_per_key(tips, tips_filter.mask(tips))
+    return dict(joined, mask=mask, companies=companies_filter.apply(companies),
+                filters=(tips_filter, companies_filter))
+
+def filter_tips(joined: dict, key: tuple | None, spec: dict) -> dict:
+    """Фильтры транзакций и компаний (даты, суммы, статусы, компании, регионы, улицы)."""
+    return memo("filter", key, _filter_tips, joined, spec)
+
+def _metrics(tips: pd.DataFrame, by: str) -> pd.DataFrame:
+    if by not in tips.columns:
+        return pd.DataFrame(columns=[by, "Amount", "Count", "LastTx"])
+    return (
+        tips
+        .groupby(by, observed=True)
+        .agg(
+            Amount = ("amount", "sum"),
+            Count  = ("uuid",   "count"),
+            LastTx = ("date",   "max"),
+        )
+        .reset_index()
+    )
+
+def _performance(filtered: dict) -> tuple[pd.DataFrame, pd.DataFrame]:
+    tips = filtered['tips']
+    # метрикам нужны только пять колонок — не выбираем весь широкий фрейм
+    cols = [c for c in ("company", "partner", "amount", "uuid", "date") if c in tips.columns]
+    narrow = tips.frame(filtered['mask'], cols)
+    return _metrics(narrow, "company"), _metrics(narrow, "partner")
+
+def performance(filtered: dict, key: tuple | None) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Сумма / количество / последний tip по компаниям и по партнёрам."""
+    return memo("performance", key, _performance, filtered)
+
+def _valid(metrics: pd.DataFrame, col: str, spec: dict) -> list:
+    m = metrics[
+        (metrics.Amount.between(spec['amount_min'], spec['amount_max'])) &
+        (metrics.Count.between(spec['count_min'], spec['count_max']))
+    ]
+    if len(spec['last_tx_range']) == 2:
+        s_d, e_d = spec['last_tx_range']
+        m = m[(m.LastTx.dt.date >= s_d) & (m.LastTx.dt.date <= e_d)]
+    return m[col].tolist()
+
+def _filter_performance(filtered: dict, metrics: pd.DataFrame, metrics_partners: pd.DataFrame,
+                        spec: dict) -> dict:
+    if spec['changed']:
+        valid_companies = _valid(metrics, "company", spec)
+        valid_partners = _valid(metrics_partners, "partner", spec) if not metrics_partners.empty else []
+    else:
+        # оставляем всё без фильтрации
+        valid_companies = metrics["company"].tolist() if "company" in metrics.columns else []
+        valid_partners = metrics_partners["partner"].tolist() if not metrics_partners.empty and "partner" in metrics_partners.columns else []
+
+    valid = FilterSpec("performance").isin('company', valid_companies)
+    partners = filtered['partners']
+    if valid_partners:
+        partners = FilterSpec().isin('partner', valid_partners).apply(partners)
+    return dict(
+        filtered,
+        mask=valid.mask(filtered['tips'], filtered['mask']),
+        companies=FilterSpec().isin('company', valid_companies).apply(filtered['companies']),
+        partners=partners,
+        filters=filtered['filters'] + (valid,),
+    )
+
+def filter_performance(filtered: dict, metrics: tuple[pd.DataFrame, pd.DataFrame],
+                       key: tuple | None, spec: dict) -> dict:
+    """Фильтр компаний и партнёров по их сумме, количеству и дате последнего tip."""
+    return memo("performance_filter", key, _filter_performance, filtered, metrics[0], metrics[1], spec)
+
+def _prepare_partners(filtered: dict, teammates: pd.DataFrame, spec: dict) -> dict:
+    partners = filtered['partners'].copy()
+    payers = FilterSpec("teammates")
+
+    # унифицируем название компании в партнёрах (аналогично транзакциям)
+    if not partners.empty and 'company' in partners.columns:
+        partners['company_unified'] = partners['company'].apply(unify_company_name)
+    else:
+        partners['company_unified'] = None
+
+    if not partners.empty and 'partner' in partners.columns:
+        partner_filter = FilterSpec()
+        if spec['companies']:
+            partner_filter.isin('company', spec['companies'])
+        partner_filter.equals('real?', True)
+        partners = partner_filter.apply(partners)
+
+        # is_teammate посчитан в enrich (TeammateIndex)
+        if spec['payers'] == 'Without gg teammates':
+            partners = partners[~partners['is_teammate']]
+            payers.add('not gg teammate', lambda df: ~df['is_teammate'], 'is_teammate')
+        elif spec['payers'] == 'Only gg teammates':
+            partners = partners[partners['is_teammate']]
+
+    partners = partners.copy()
+    if not partners.empty and 'avatar' in partners.columns:
+        partners['avatar'] = partners['avatar'].astype(str).str.lower().str.strip()
+    if not partners.empty and ('partnermessage' in partners.columns or 'jsonagg' in partners.columns):
+        # has_message / has_idram считаются при импорте (data_loader.add_partner_flags);
+        # здесь — только если их нет (или concat файлов с ними и без них дал object)
+        flags = [flag for col, flag in (('partnermessage', 'has_message'), ('jsonagg', 'has_idram'))
+                 if col in partners.columns]
+        if any(flag not in partners.columns or partners[flag].dtype != bool for flag in flags):
+            partners = add_partner_flags(partners)
+        if 'has_message' in partners.columns:
+            partners['msg_exists'] = np.where(partners['has_message'], "Exists", "Empty")
+        if 'has_idram' in partners.columns:
+            partners['account_status'] = np.where(partners['has_idram'], "Has Idram", "No Idram")
+    return dict(
+        filtered,
+        mask=payers.mask(filtered['tips'], filtered['mask']),
+        partners=partners,
+        teammates=teammates,
+        filters=filtered['filters'] + (payers,),
+    )
+
+def prepare_partners(filtered: dict, teammates: pd.DataFrame, key: tuple | None, spec: dict) -> dict:
+    """Партнёры выбранных компаний: real?, gg teammates, avatar / сообщение / Idram."""
+    return memo("partners", key, _prepare_partners, filtered, teammates, spec)
+
+def _filter_partners(prepared: dict, spec: dict) -> dict:
+    partners = prepared['partners'].copy()
+    partners['partner'] = partners['partner'].astype(str).str.lower().str.strip()
+
+    partner_filter = FilterSpec("partners")
+    if spec['partners']:
+        partner_filter.isin('partner', [p.lower() for p in spec['partners']])
+    if spec['avatar']:
+        partner_filter.isin('avatar', spec['avatar'])
+    if spec['message']:
+        partner_filter.isin('has_message', [m == "Exists" for m in spec['message']], 'msg_exists')
+    if spec['date_range'] and len(spec['date_range']) == 2:
+        partner_filter.between('date', *_date_bounds(spec['date_range']))
+    if spec['account']:
+        partner_filter.isin('has_idram', [a == "Has Idram" for a in spec['account']], 'account_status')
+    # флаги отработали в фильтрах; вкладкам остаются msg_exists / account_status
+    partners = partner_filter.apply(partners).drop(columns=PARTNER_FLAGS + ['is_teammate'], errors='ignore')
+
+    selected = FilterSpec("partner")
+    if spec['partners']:
+        names = set(partners['partner'].str.lower())
+        selected.add('partner', lambda df: normalized_isin(df['partner'], names), 'partner')
+    return dict(
+        prepared,
+        mask=selected.mask(prepared['tips'], prepared['mask']),
+        partners=partners,
+        lower_partner=bool(spec['partners']),
+        filters=prepared['filters'] + (partner_filter, selected),
+    )
+
+def filter_partners(prepared: dict, key: tuple | None, spec: dict) -> dict:
+    """Фильтры партнёров и транзакций выбранных партнёров; флаги партнёров отбрасываются."""
+    return memo("partners_filter", key, _filter_partners, prepared, spec)
+
+def _finalize(result: dict) -> pd.DataFrame:
+    tips = result['tips'].frame(result['mask'])
+    if result.get('lower_partner') and 'partner' in tips.columns:
+        tips = tips.assign(partner=tips['partner'].astype(str).str.lower().str.strip())
+    tips = tips.assign(region=tips['region'].combine_first(tips['region_co']))
+    return tips.drop(columns=['unnamed: 11', 'unnamed: 12', 'helpercompanyname', 'company_unified_co', 'is_teammate'],
+                     errors='ignore')
+
+def finalize(result: dict, key: tuple | None) -> pd.DataFrame:
+    """
+    Единственная выборка транзакций по итоговой маске; регион транзакции
+    с запасным регионом компании, без служебных колонок.
+    """
+    return memo("finalize", key, _finalize, result)
+
+def filter_stats(result: dict) -> pd.DataFrame:
+    """Селективность всех предикатов, применённых к result (FilterSpec.stats)."""
+    return pd.concat([f.stats for f in result.get('filters', ()) if not f.stats.empty] or
+                     [pd.DataFrame(columns=STATS_COLUMNS)], ignore_index=True)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# RFM плательщиков
+# ──────────────────────────────────────────────────────────────────────────────
+def _rfm(tips: pd.DataFrame) -> pd.DataFrame:
+    return payer_rfm(clean_tips(tips))
+
+def rfm(tips: pd.DataFrame, key: tuple | None, view: str, store: PayerStateStore | None = None) -> pd.DataFrame:
+    """
+    RFM плательщиков по итоговым транзакциям. Со store — из сохранённого
+    состояния выборки view, в которое дописываются только новые транзакции.
+    """
+    if store is None:
+        return memo("rfm", key, _rfm, tips)
+    return memo("rfm", stage_key(key, store.id), store.rfm, view, tips)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Группировка
+# ──────────────────────────────────────────────────────────────────────────────
+def cube(tips: pd.DataFrame, key: tuple | None) -> TipsCube:
+    """Куб день × компания × партнёр × процессор × статус по итоговым транзакциям."""
+    return memo("cube", key, build_cube, tips)
+
+def group(tips: pd.DataFrame, key: tuple | None, interval: str, custom_days: int = 10,
+          tips_cube: TipsCube | None = None) -> pd.DataFrame:
+    """
+    Сумма и количество tips по интервалу времени (group_by_time_interval).
+    Интервалы, кратные дню, сворачиваются из tips_cube без прохода по строкам.
+    """
+    if interval == 'All':
+        return pd.DataFrame()
+    if tips_cube is not None and interval in CUBE_INTERVALS:
+        return memo("group", key, tips_cube.time_series, interval)
+    return memo("group", key, group_by_time_interval, tips, interval, custom_days)
@@ -0,0 +1,397 @@
+# modules/ggTipsModule/ggTips_rfm.py
+"""
+RFM-таблица плательщиков для usersTab: FirstTip, LastTip, Count, Amount,
+Companies, ActiveDays.
+
+  payer_rfm(tips)  — та же таблица по произвольной выборке за один проход
+                     без Python-вызовов на группу;
+  PayerState       — сохранённое состояние RFM одной выборки, в которое
+                     дописываются только новые транзакции;
+  PayerStateStore  — состояния по выборкам сайдбара (view — отпечаток
+                     фильтров без набора файлов), рядом с загрузками:
+
+    uploaded_files/.payer_state/manifest.json
+    uploaded_files/.payer_state/view-3f2a.../gen-00007/payers.parquet ...
+
+Состояние сливаемое: кроме итогов по плательщику в нём лежат множества, по
+которым новая партия прибавляется к итогам без пересчёта истории:
+  day_pairs      — пары (payer, день) — ActiveDays растёт на число новых пар
+  company_pairs  — пары (payer, company) — Companies так же
+FirstTip / LastTip сливаются как min / max, Count и Amount — суммой.
+
+Новые транзакции — позже водяного знака выборки (последней учтённой даты).
+Часть выборки не позже водяного знака должна совпасть с учтённой по числу
+строк, сумме дат и сумме amount; если нет (выборка потеряла транзакции —
+фильтры по итогам компаний и партнёров не монотонны, файл удалён — или
+получила задним числом), состояние выборки строится заново.
+"""
+import json
+import logging
+import math
+import os
+import shutil
+import threading
+import uuid
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from data_cache import read_frame, write_frame
+
+logger = logging.getLogger(__name__)
+
+STATE_VERSION = 1
+MANIFEST = "manifest.json"
+# сколько выборок хранить (давно не открывавшиеся удаляются)
+MAX_VIEWS = 8
+
+DAY_NS = 24 * 3600 * 10**9
+# ключ пары: код payer в старших 32 битах, день / код компании — в младших
+_PAIR_SHIFT = 32
+_DAY_OFFSET = 1 << 31
+_NAT = np.iinfo(np.int64).min
+_NEVER = np.iinfo(np.int64).max
+
+
+def clean_tips(tips: pd.DataFrame) -> pd.DataFrame:
+    """Транзакции, которые учитывает usersTab: с payer, датой и uuid."""
+    return tips.dropna(subset=["payer", "date", "uuid"])
+
+def payer_rfm(tips: pd.DataFrame) -> pd.DataFrame:
+    """RFM по tips (после clean_tips), одна строка на payer в порядке сортировки."""
+    rfm = (
+        tips.groupby("payer")
+            .agg(
+                FirstTip  = ("date", "min"),
+                LastTip   = ("date", "max"),
+                Count     = ("uuid", "count"),
+                Amount    = ("amount", "sum"),
+                Companies = ("company", "nunique"),
+            )
+    )
+    # различные дни — через уникальные пары (payer, день), без lambda на группу
+    rfm["ActiveDays"] = (
+        tips.assign(day=tips["date"].dt.normalize())
+            .drop_duplicates(subset=["payer", "day"])
+            .groupby("payer")
+            .size()
+    )
+    return rfm.reset_index()
+
+def _in_sorted(values: np.ndarray, sorted_values: np.ndarray) -> np.ndarray:
+    """Булев массив: values[i] есть в отсортированном sorted_values."""
+    if not len(sorted_values):
+        return np.zeros(len(values), dtype=bool)
+    pos = np.searchsorted(sorted_values, values).clip(max=len(sorted_values) - 1)
+    return sorted_values[pos] == values
+
+def _insert_sorted(sorted_values: np.ndarray, fresh: np.ndarray) -> np.ndarray:
+    """Отсортированное объединение; fresh — отсортированные значения, которых ещё нет."""
+    return np.insert(sorted_values, np.searchsorted(sorted_values, fresh), fresh)
+
+def _codes(index: pd.Index, values) -> tuple[np.ndarray, pd.Index]:
+    """Коды values в index; новые значения дописываются в конец index."""
+    codes = index.get_indexer(values)
+    if (codes < 0).any():
+        index = index.append(pd.Index(pd.unique(np.asarray(values, dtype=object)[codes < 0]), dtype=object))
+        codes = index.get_indexer(values)
+    return codes.astype(np.int64), index
+
+def _payer_order(payers: pd.Index) -> np.ndarray:
+    try:
+        return payers.argsort()
+    except TypeError:
+        # смесь чисел и строк — порядок по строковому виду
+        return payers.astype(str).argsort()
+
+def _checksums(ns: np.ndarray, amount: np.ndarray | None) -> dict:
+    """Число строк, сумма дат (по модулю 2**64) и сумма amount части выборки."""
+    return {
+        "tips": len(ns),
+        "date_sum": int(ns.sum(dtype=np.int64).view(np.uint64)) if len(ns) else 0,
+        "amount_sum": float(np.nansum(amount)) if amount is not None else 0.0,
+    }
+
+def _empty_state() -> dict:
+    return {
+        "payers": pd.Index([], dtype=object),
+        "first": np.empty(0, np.int64),
+        "last": np.empty(0, np.int64),
+        "count": np.empty(0, np.int64),
+        "amount": np.empty(0, np.float64),
+        "companies": np.empty(0, np.int64),
+        "active_days": np.empty(0, np.int64),
+        "company_names": pd.Index([], dtype=object),
+        "day_pairs": np.empty(0, np.int64),
+        "company_pairs": np.empty(0, np.int64),
+    }
+
+def _new_manifest() -> dict:
+    return {"version": STATE_VERSION, "seq": 0, "payers": 0, "watermark": None,
+            **_checksums(np.empty(0, np.int64), None),
+            "generation": None, "files": {}, "updated_at": None}
+
+def _read_manifest(root: str, new) -> dict:
+    try:
+        with open(os.path.join(root, MANIFEST), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return new()
+    if manifest.get("version") != STATE_VERSION:
+        logger.warning("Payer state %s has version %s; starting a new one", root, manifest.get("version"))
+        return new()
+    return manifest
+
+def _write_manifest(root: str, manifest: dict) -> None:
+    os.makedirs(root, exist_ok=True)
+    tmp = os.path.join(root, MANIFEST + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, os.path.join(root, MANIFEST))
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Состояние одной выборки
+# ──────────────────────────────────────────────────────────────────────────────
+class PayerState:
+    """
+    Сохранённое сливаемое состояние RFM одной выборки. Каждое обновление
+    пишет новое поколение файлов и только потом манифест, так что оборванная
+    запись оставляет предыдущее состояние. Блокировки — у PayerStateStore.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._state: dict | None = None
+        self._table: pd.DataFrame | None = None
+        self._manifest = _read_manifest(root, _new_manifest)
+
+    @property
+    def tips(self) -> int:
+        """Сколько транзакций учтено."""
+        return self._manifest["tips"]
+
+    # ── чтение ─────────────────────────────────────────────────────────────
+    def _read(self, name: str) -> pd.DataFrame:
+        generation, files = self._manifest["generation"], self._manifest["files"]
+        return read_frame(os.path.join(self.root, generation, name), files[name])
+
+    def table(self) -> pd.DataFrame:
+        """RFM по всем учтённым транзакциям (как payer_rfm). Только для чтения."""
+        if self._table is None:
+            if self._manifest["generation"] is None:
+                self._table = self._frame(_empty_state()).drop(columns="code")
+            else:
+                # на диске таблица уже отсортирована по payer
+                self._table = self._read("payers").drop(columns="code")
+        return self._table
+
+    def _load(self) -> dict:
+        """Массивы состояния по кодам payer (нужны только для обновления)."""
+        if self._state is not None:
+            return self._state
+        state = _empty_state()
+        if self._manifest["generation"] is not None:
+            payers = self._read("payers")
+            payers = payers.take(np.argsort(payers["code"].to_numpy()))
+            state.update({
+                "payers": pd.Index(payers["payer"].to_numpy(dtype=object), dtype=object),
+                "first": payers["FirstTip"].to_numpy("datetime64[ns]").view(np.int64),
+                "last": payers["LastTip"].to_numpy("datetime64[ns]").view(np.int64),
+                "count": payers["Count"].to_numpy(np.int64),
+                "amount": payers["Amount"].to_numpy(np.float64),
+                "companies": payers["Companies"].to_numpy(np.int64),
+                "active_days": payers["ActiveDays"].to_numpy(np.int64),
+                "company_names": pd.Index(self._read("company_names")["company"].to_numpy(dtype=object), dtype=object),
+                "day_pairs": self._read("day_pairs")["key"].to_numpy(np.int64),
+                "company_pairs": self._read("company_pairs")["key"].to_numpy(np.int64),
+            })
+        self._state = state
+        return state
+
+    @staticmethod
+    def _frame(state: dict) -> pd.DataFrame:
+        """Итоги по payer в порядке сортировки payer; code — код в массивах состояния."""
+        order = _payer_order(state["payers"])
+        return pd.DataFrame({
+            "code": order,
+            "payer": state["payers"].to_numpy()[order],
+            "FirstTip": state["first"][order].view("datetime64[ns]"),
+            "LastTip": state["last"][order].view("datetime64[ns]"),
+            "Count": state["count"][order],
+            "Amount": state["amount"][order],
+            "Companies": state["companies"][order],
+            "ActiveDays": state["active_days"][order],
+        })
+
+    # ── обновление ─────────────────────────────────────────────────────────
+    def update(self, tips: pd.DataFrame) -> dict:
+        """
+        Приводит состояние к выборке tips (после clean_tips): дописывает
+        транзакции позже водяного знака или, если учтённая часть не совпала,
+        строит состояние заново. Сводка: строк, новых, rebuilt.
+        """
+        ns = tips["date"].to_numpy("datetime64[ns]").view(np.int64)
+        amount = tips["amount"].to_numpy(dtype=np.float64, na_value=np.nan) if "amount" in tips.columns else None
+
+        watermark = self._manifest["watermark"]
+        old = ns <= watermark if watermark is not None else np.zeros(len(ns), dtype=bool)
+        rebuilt = not self._matches(_checksums(ns[old], None if amount is None else amount[old]))
+        if rebuilt:
+            logger.info("Payer state %s no longer matches its selection; rebuilding", os.path.basename(self.root))
+            self.reset()
+            old = np.zeros(len(ns), dtype=bool)
+
+        new = int(len(ns) - old.sum())
+        if new:
+            fresh = ~old
+            state = self._load()
+            self._fold(state, tips[fresh], ns[fresh])
+            self._save(state, {**_checksums(ns, amount), "watermark": int(ns.max())})
+            logger.info("Payer state %s: %d tips, %d new", os.path.basename(self.root), len(ns), new)
+        return {"rows": len(ns), "new": new, "rebuilt": rebuilt}
+
+    def _matches(self, checks: dict) -> bool:
+        return (checks["tips"] == self._manifest["tips"]
+                and checks["date_sum"] == self._manifest["date_sum"]
+                and math.isclose(checks["amount_sum"], self._manifest["amount_sum"], rel_tol=1e-9, abs_tol=1e-6))
+
+    def _fold(self, state: dict, new: pd.DataFrame, ns: np.ndarray) -> None:
+        codes, payers = _codes(state["payers"], new["payer"])
+        n, grown = len(payers), len(payers) - len(state["payers"])
+        for name, fill in (("first", _NEVER), ("last", _NAT), ("count", 0),
+                           ("amount", 0.0), ("companies", 0), ("active_days", 0)):
+            state[name] = np.concatenate([state[name], np.full(grown, fill, dtype=state[name].dtype)])
+        state["payers"] = payers
+
+        batch = pd.DataFrame({"code": codes, "ns": ns}).groupby("code")["ns"].agg(["min", "max"])
+        at = batch.index.to_numpy()
+        state["first"][at] = np.minimum(state["first"][at], batch["min"].to_numpy())
+        state["last"][at] = np.maximum(state["last"][at], batch["max"].to_numpy())
+        state["count"] += np.bincount(codes, minlength=n)
+        if "amount" in new.columns:
+            amount = new["amount"].to_numpy(dtype=np.float64, na_value=np.nan)
+            known = ~np.isnan(amount)
+            state["amount"] += np.bincount(codes[known], weights=amount[known], minlength=n)
+
+        # различные дни: новые пары (payer, день)
+        day_keys = np.unique((codes << _PAIR_SHIFT) | (ns // DAY_NS + _DAY_OFFSET))
+        day_keys = day_keys[~_in_sorted(day_keys, state["day_pairs"])]
+        state["active_days"] += np.bincount(day_keys >> _PAIR_SHIFT, minlength=n)
+        state["day_pairs"] = _insert_sorted(state["day_pairs"], day_keys)
+
+        # различные компании: новые пары (payer, company)
+        if "company" in new.columns:
+            has_company = new["company"].notna().to_numpy()
+            company_codes, state["company_names"] = _codes(state["company_names"], new["company"][has_company])
+            company_keys = np.unique((codes[has_company] << _PAIR_SHIFT) | company_codes)
+            company_keys = company_keys[~_in_sorted(company_keys, state["company_pairs"])]
+            state["companies"] += np.bincount(company_keys >> _PAIR_SHIFT, minlength=n)
+            state["company_pairs"] = _insert_sorted(state["company_pairs"], company_keys)
+
+    def _save(self, state: dict, totals: dict) -> None:
+        self._manifest["seq"] += 1
+        generation = f"gen-{self._manifest['seq']:05d}"
+        folder = os.path.join(self.root, generation)
+        os.makedirs(folder, exist_ok=True)
+        payers = self._frame(state)
+        frames = {
+            "payers": payers,
+            "company_names": pd.DataFrame({"company": state["company_names"].to_numpy()}),
+            "day_pairs": pd.DataFrame({"key": state["day_pairs"]}),
+            "company_pairs": pd.DataFrame({"key": state["company_pairs"]}),
+        }
+        files = {name: write_frame(df, os.path.join(folder, name)) for name, df in frames.items()}
+
+        previous = self._manifest["generation"]
+        self._manifest.update({
+            **totals,
+            "generation": generation,
+            "files": files,
+            "payers": len(payers),
+            "updated_at": datetime.now().isoformat(timespec="seconds"),
+        })
+        _write_manifest(self.root, self._manifest)
+        self._table = payers.drop(columns="code")
+        if previous and previous != generation:
+            shutil.rmtree(os.path.join(self.root, previous), ignore_errors=True)
+
+    def reset(self) -> None:
+        """Удаляет состояние выборки."""
+        shutil.rmtree(self.root, ignore_errors=True)
+        self._manifest = _new_manifest()
+        self._state = None
+        self._table = None
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Состояния по выборкам
+# ──────────────────────────────────────────────────────────────────────────────
+class PayerStateStore:
+    """
+    Состояния PayerState по выборкам, не больше max_views (давно не
+    открывавшиеся удаляются). Потокобезопасно; id меняется при reset(),
+    чтобы закэшированные стадии перестали ссылаться на старые состояния.
+    """
+
+    def __init__(self, root: str, max_views: int = MAX_VIEWS):
+        self.root = root
+        self.max_views = max_views
+        self._lock = threading.RLock()
+        self._views: dict[str, PayerState] = {}
+        self._manifest = _read_manifest(root, self._new_manifest)
+
+    @staticmethod
+    def _new_manifest() -> dict:
+        return {"version": STATE_VERSION, "id": uuid.uuid4().hex, "views": {}}
+
+    @property
+    def id(self) -> str:
+        return self._manifest["id"]
+
+    def _view(self, view: str) -> PayerState:
+        views = self._manifest["views"]
+        views[view] = {"dir": f"view-{view}", "used_at": datetime.now().isoformat(timespec="seconds")}
+        for stale in sorted(views, key=lambda v: views[v]["used_at"])[:max(len(views) - self.max_views, 0)]:
+            if stale != view:
+                shutil.rmtree(os.path.join(self.root, views.pop(stale)["dir"]), ignore_errors=True)
+                self._views.pop(stale, None)
+        _write_manifest(self.root, self._manifest)
+        if view not in self._views:
+            self._views[view] = PayerState(os.path.join(self.root, views[view]["dir"]))
+        return self._views[view]
+
+    def rfm(self, view: str, tips: pd.DataFrame) -> pd.DataFrame:
+        """
+        RFM выборки view по её транзакциям tips — как payer_rfm(clean_tips(tips)),
+        но по сохранённому состоянию, в которое дописываются только новые.
+        """
+        if not {"uuid", "payer", "date"} <= set(tips.columns):
+            return payer_rfm(clean_tips(tips))
+        tips = tips[[c for c in ("uuid", "payer", "date", "amount", "company") if c in tips.columns]]
+        valid = tips[["uuid", "payer", "date"]].notna().all(axis=1).to_numpy()
+        if not valid.all():
+            tips = tips[valid]
+        with self._lock:
+            state = self._view(view)
+            state.update(tips)
+            return state.table()
+
+    def reset(self) -> None:
+        """Удаляет все состояния; новый id сбрасывает закэшированные стадии."""
+        with self._lock:
+            for info in self._manifest["views"].values():
+                shutil.rmtree(os.path.join(self.root, info["dir"]), ignore_errors=True)
+            self._manifest = self._new_manifest()
+            self._views.clear()
+            _write_manifest(self.root, self._manifest)
+
+    def summary(self) -> pd.DataFrame:
+        with self._lock:
+            rows = []
+            for view, info in self._manifest["views"].items():
+                manifest = _read_manifest(os.path.join(self.root, info["dir"]), _new_manifest)
+                rows.append({"view": view, "tips": manifest["tips"], "payers": manifest["payers"],
+                             "updated_at": manifest["updated_at"], "used_at": info["used_at"]})
+        return pd.DataFrame(rows, columns=["view", "tips", "payers", "updated_at", "used_at"])
@@ -0,0 +1,43 @@
+# modules/ggTipsModule/ggTips_teammates.py
+"""
+Индекс gg teammates (номера и id плательщиков), один на версию листа, для
+колонки is_teammate и режимов 'Without gg teammates' / 'Only gg teammates'.
+"""
+import numpy as np
+import pandas as pd
+
+from dataset_store import cached_by_version
+
+
+def canonical_phones(ser: pd.Series) -> np.ndarray:
+    """Номера -> int64 (37491123456); пустые и нечисловые -> -1."""
+    num = pd.to_numeric(pd.Series(ser, copy=False), errors='coerce')
+    return num.fillna(-1).to_numpy(dtype=np.int64)
+
+
+class TeammateIndex:
+    """Номера телефонов (phones) и id плательщиков (payer_ids) gg teammates."""
+
+    def __init__(self, teammates: pd.DataFrame):
+        phones = canonical_phones(teammates['number']) if 'number' in teammates.columns else np.empty(0, np.int64)
+        self.phones = np.unique(phones[phones >= 0])
+        self.payer_ids = pd.unique(teammates['id']) if 'id' in teammates.columns else np.empty(0, object)
+
+    def __len__(self) -> int:
+        return len(self.phones)
+
+    def has_phone(self, ser: pd.Series) -> np.ndarray:
+        """Булев массив: номер из ser — номер teammate."""
+        if not len(self.phones):
+            return np.zeros(len(ser), dtype=bool)
+        return np.isin(canonical_phones(ser), self.phones, assume_unique=False)
+
+    def has_payer(self, ser: pd.Series) -> np.ndarray:
+        """Булев массив: плательщик из ser — teammate."""
+        if not len(self.payer_ids):
+            return np.zeros(len(ser), dtype=bool)
+        return ser.isin(self.payer_ids).to_numpy(dtype=bool)
+
+def teammate_index(teammates: pd.DataFrame) -> TeammateIndex:
+    """TeammateIndex листа teammates, один на версию листа."""
+    return cached_by_version("ggTips_teammates.index", teammates, TeammateIndex)
@@ -0,0 +1,137 @@
+# modules/ggTipsModule/ggTips_users.py
+"""
+Метрики плательщиков для usersTab.
+
+regularity() считает RegularSince / Periodicity / Ongoing одним проходом по
+отсортированным парам (payer, дата) на NumPy.
+
+Определения те же, что были во вкладке:
+  RegularSince — день, на котором у плательщика набралось min_days уникальных
+                 дней с чаевыми и все промежутки между ними не больше gap;
+                 если в первых min_days днях был разрыв больше gap, NaT
+                 (более длинный префикс содержит тот же разрыв)
+  Periodicity  — средний промежуток между уникальными днями:
+                 (последний день - первый) / (дней - 1)
+  Ongoing      — с последнего tip прошло не больше gap дней
+
+PayerCompanyMatrix — pivot payer × company для тепловой карты и выгрузки в
+Excel. Вместо плотного pd.pivot_table по всем плательщикам (100k × 1k
+компаний — гигабайты) хранятся только непустые ячейки (COO: строка, колонка,
+значение); плотной собирается лишь выбранная верхушка плательщиков.
+"""
+import numpy as np
+import pandas as pd
+
+DAY_NS = 24 * 3600 * 10**9
+
+
+def regularity(tips: pd.DataFrame, gap: int, min_days: int, today: pd.Timestamp | None = None) -> pd.DataFrame:
+    """
+    По одной строке на payer (в порядке сортировки payer):
+    payer | ActiveDays | RegularSince | Periodicity | LastTip | Ongoing.
+    Строки без payer или даты не учитываются.
+    """
+    today = pd.Timestamp("today").normalize() if today is None else pd.Timestamp(today)
+    ns = tips["date"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+    valid = tips["payer"].notna().to_numpy() & (ns != np.iinfo(np.int64).min)
+    # без sort=True: сортируются только уникальные payer, а не все строки
+    codes, payers = pd.factorize(tips["payer"][valid])
+    ns = ns[valid]
+
+    # одна сортировка по ключу (payer, день)
+    days = ns // DAY_NS
+    first_day = days.min() if len(days) else 0
+    span = (days.max() - first_day + 1) if len(days) else 1
+    order = np.argsort(codes * span + (days - first_day))
+    codes, days, ns = codes[order], days[order], ns[order]
+
+    first_row = np.r_[True, codes[1:] != codes[:-1]] if len(codes) else np.zeros(0, bool)
+    last_tip = np.maximum.reduceat(ns, np.flatnonzero(first_row)) if len(ns) else ns
+
+    # уникальные дни каждого payer
+    unique_day = first_row | np.r_[True, days[1:] != days[:-1]] if len(days) else first_row
+    days, starts_mask = days[unique_day], first_row[unique_day]
+    starts = np.flatnonzero(starts_mask)
+    counts = np.diff(np.r_[starts, len(days)])
+    ends = starts + counts - 1
+
+    # разрывы > gap; у первого дня payer разрыва нет
+    breaks = np.r_[False, np.diff(days) > gap] & ~starts_mask if len(days) else starts_mask
+    breaks_before = np.cumsum(breaks)
+
+    qualifies = counts >= min_days
+    reached = np.where(qualifies, starts + max(min_days, 1) - 1, starts)
+    regular = qualifies & (breaks_before[reached] - breaks_before[starts] == 0)
+    regular_since = np.where(regular, days[reached] * DAY_NS, np.iinfo(np.int64).min)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        periodicity = np.where(counts > 1, (days[ends] - days[starts]) / (counts - 1), np.nan)
+    ongoing = (today.value - last_tip) // DAY_NS <= gap
+
+    # группы идут в порядке кодов factorize -> порядок сортировки payer
+    by_payer = pd.Index(payers).argsort()
+    payers = np.asarray(payers, dtype=object)
+    return pd.DataFrame({
+        "payer": payers[by_payer],
+        "ActiveDays": counts[by_payer],
+        "RegularSince": regular_since[by_payer].view("datetime64[ns]"),
+        "Periodicity": periodicity[by_payer],
+        "LastTip": last_tip[by_payer].view("datetime64[ns]"),
+        "Ongoing": ongoing[by_payer],
+    })
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Pivot payer × company
+# ──────────────────────────────────────────────────────────────────────────────
+class PayerCompanyMatrix:
+    """
+    Разреженная матрица payer × company: агрегат values (aggfunc 'count'
+    или 'sum') по непустым парам. rows / cols — позиции в payers /
+    companies (отсортированы, как в pivot_table), data — значения ячеек.
+    """
+
+    def __init__(self, tips: pd.DataFrame, values: str = "amount", aggfunc: str = "count"):
+        cells = tips.groupby(["payer", "company"], observed=True)[values].agg(aggfunc)
+        self.rows, self.cols = (np.asarray(c, dtype=np.int64) for c in cells.index.codes)
+        self.payers = pd.Index(np.asarray(cells.index.levels[0], dtype=object), name="payer")
+        self.companies = pd.Index(np.asarray(cells.index.levels[1], dtype=object), name="company")
+        self.data = cells.to_numpy()
+        # итог по плательщику (в порядке строк, как pivot.sum(axis=1))
+        self.totals = cells.groupby(level=0, observed=True).sum()
+        # колонки, в которых есть хоть одна ячейка
+        self._used_cols = np.flatnonzero(np.bincount(self.cols, minlength=len(self.companies)))
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def top(self, n: int, min_total: float = 0) -> pd.Index:
+        """Плательщики с итогом ≥ min_total, n наибольших по итогу."""
+        totals = self.totals[self.totals >= min_total]
+        return totals.sort_values(ascending=False).head(n).index
+
+    def dense(self, payers) -> pd.DataFrame:
+        """Плотный pivot (fill 0) только для payers, в их порядке."""
+        payers = pd.Index(payers)
+        row_of = self.payers.get_indexer(payers)
+        position = np.full(len(self.payers), -1)
+        position[row_of[row_of >= 0]] = np.flatnonzero(row_of >= 0)
+        col_of = np.full(len(self.companies), -1)
+        col_of[self._used_cols] = np.arange(len(self._used_cols))
+
+        keep = position[self.rows] >= 0
+        out = np.zeros((len(payers), len(self._used_cols)), dtype=self.data.dtype)
+        out[position[self.rows[keep]], col_of[self.cols[keep]]] = self.data[keep]
+        return pd.DataFrame(
+            out,
+            index=pd.Index(np.asarray(payers, dtype=object), name="payer"),
+            columns=self.companies[self._used_cols],
+        )
+
+    def cells(self) -> pd.DataFrame:
+        """Все непустые ячейки в длинном формате: payer | company | value."""
+        return pd.DataFrame({
+            "payer": self.payers.to_numpy()[self.rows],
+            "company": self.companies.to_numpy()[self.cols],
+            "value": self.data,
+        })
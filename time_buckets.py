@@ -0,0 +1,140 @@
+# time_buckets.py
+"""
+Разбиение дат на интервалы времени (Hour, Day, Week, Month, Year, Week day,
+Week partial, Month partial, Day partial, Custom day) арифметикой над
+datetime64 без Python-вызовов на строку.
+
+bucket_codes() возвращает код интервала для каждой строки (-1 для NaT) и
+метки интервалов в порядке groupby. Коды можно переиспользовать для
+нескольких агрегаций подряд (bucket_sum, bucket_count), не пересчитывая
+разбиение и не сортируя фрейм.
+"""
+import numpy as np
+import pandas as pd
+
+INTERVALS = (
+    'Hour', 'Day', 'Week', 'Month', 'Year', 'Week day',
+    'Week partial', 'Month partial', 'Day partial', 'Custom day',
+)
+
+HOUR_NS = 3600 * 10**9
+DAY_NS = 24 * HOUR_NS
+# 1970-01-01 — четверг: (дни от эпохи + 3) % 7 == dayofweek (понедельник = 0)
+_EPOCH_DAYOFWEEK = 3
+_DAY_NAMES = np.array(['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'], dtype=object)
+
+
+def _naive_ns(dates: pd.Series) -> np.ndarray:
+    """Даты -> datetime64[ns]; с часовым поясом — по местному времени (tz_localize(None))."""
+    dates = pd.Series(dates)
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates, errors='coerce')
+    if isinstance(dates.dtype, pd.DatetimeTZDtype):
+        dates = dates.dt.tz_localize(None)
+    return dates.to_numpy(dtype='datetime64[ns]')
+
+def _dense(keys: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Целые ключи -> (плотные коды 0..k-1, отсортированные уникальные ключи)."""
+    if keys.size == 0:
+        return keys.astype(np.int64), keys
+    low = keys.min()
+    span = int(keys.max() - low) + 1
+    if span > max(4 * keys.size, 1 << 16):
+        uniques, codes = np.unique(keys, return_inverse=True)
+        return codes.astype(np.int64), uniques
+    present = np.zeros(span, dtype=bool)
+    present[keys - low] = True
+    remap = np.cumsum(present) - 1
+    return remap[keys - low], np.flatnonzero(present) + low
+
+def _keys(ns: np.ndarray, values: np.ndarray, interval: str, earliest: int, custom_days: int) -> np.ndarray:
+    if interval == 'Hour':
+        return ns // HOUR_NS
+    if interval == 'Day':
+        return ns // DAY_NS
+    if interval == 'Week':
+        days = ns // DAY_NS
+        return days - (days + _EPOCH_DAYOFWEEK) % 7
+    if interval in ('Month', 'Month partial'):
+        return values.astype('datetime64[M]').view(np.int64)
+    if interval == 'Year':
+        return values.astype('datetime64[Y]').view(np.int64)
+    if interval == 'Week day':
+        return (ns // DAY_NS + _EPOCH_DAYOFWEEK) % 7
+    if interval == 'Week partial':
+        day = (values.astype('datetime64[D]') - values.astype('datetime64[M]').astype('datetime64[D]')).view(np.int64)
+        return day // 7
+    if interval == 'Day partial':
+        return (ns - earliest) // DAY_NS
+    if interval == 'Custom day':
+        return (ns - earliest) // DAY_NS // max(int(custom_days), 1)
+    raise ValueError(f"Unknown interval: {interval!r}")
+
+def _labels(keys: np.ndarray, interval: str, earliest: int, custom_days: int) -> pd.Index:
+    if interval == 'Hour':
+        return pd.DatetimeIndex((keys * HOUR_NS).view('datetime64[ns]'))
+    if interval in ('Day', 'Week'):
+        return pd.DatetimeIndex((keys * DAY_NS).view('datetime64[ns]'))
+    if interval == 'Month':
+        return pd.DatetimeIndex(keys.view('datetime64[M]').astype('datetime64[ns]'))
+    if interval == 'Month partial':
+        # первое число месяца со временем суток самой ранней даты
+        time_of_day = earliest % DAY_NS
+        return pd.DatetimeIndex((keys.view('datetime64[M]').astype('datetime64[ns]').view(np.int64) + time_of_day).view('datetime64[ns]'))
+    if interval == 'Year':
+        return pd.DatetimeIndex(keys.view('datetime64[Y]').astype('datetime64[ns]'))
+    if interval == 'Week day':
+        return pd.Index(_DAY_NAMES[keys])
+    if interval == 'Week partial':
+        return pd.Index(np.array([f"Week {k + 1}" for k in keys], dtype=object))
+    if interval == 'Day partial':
+        return pd.DatetimeIndex((earliest + keys * DAY_NS).view('datetime64[ns]'))
+    return pd.DatetimeIndex((earliest + keys * max(int(custom_days), 1) * DAY_NS).view('datetime64[ns]'))
+
+def bucket_codes(dates, interval: str, custom_days: int = 10,
+                 origin: pd.Timestamp | None = None) -> tuple[np.ndarray, pd.Index]:
+    """
+    Коды интервалов для dates и их метки.
+
+    codes[i] — номер интервала строки i в labels (-1 для NaT); labels
+    отсортированы, как ключи groupby: даты по времени, названия дней недели
+    и "Week N" — по алфавиту. Partial-интервалы и Custom day отсчитываются
+    от origin (по умолчанию — самая ранняя дата в dates).
+    """
+    values = _naive_ns(dates)
+    valid = ~np.isnat(values)
+    codes = np.full(len(values), -1, dtype=np.int64)
+    if not valid.any():
+        if interval not in INTERVALS:
+            raise ValueError(f"Unknown interval: {interval!r}")
+        return codes, _labels(np.empty(0, dtype=np.int64), interval, 0, custom_days)
+
+    values = values[valid]
+    ns = values.view(np.int64)
+    earliest = int(ns.min()) if origin is None else pd.Timestamp(origin).tz_localize(None).value
+    dense, keys = _dense(_keys(ns, values, interval, earliest, custom_days))
+    labels = _labels(keys, interval, earliest, custom_days)
+    if not isinstance(labels, pd.DatetimeIndex):
+        # строковые метки — в порядке сортировки groupby
+        order = np.argsort(labels.to_numpy(), kind='stable')
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        labels, dense = labels[order], rank[dense]
+    codes[valid] = dense
+    return codes, labels
+
+def bucket_sum(codes: np.ndarray, size: int, values) -> np.ndarray:
+    """Сумма values по интервалам (NaN пропускаются, как в groupby.sum)."""
+    values = pd.Series(values)
+    integer = pd.api.types.is_integer_dtype(values.dtype)
+    weights = values.to_numpy(dtype='float64', na_value=np.nan)
+    keep = (codes >= 0) & ~np.isnan(weights)
+    sums = np.bincount(codes[keep], weights=weights[keep], minlength=size)
+    return sums.astype(np.int64) if integer else sums
+
+def bucket_count(codes: np.ndarray, size: int, valid=None) -> np.ndarray:
+    """Число строк в каждом интервале; valid — маска учитываемых строк (notna)."""
+    keep = codes >= 0
+    if valid is not None:
+        keep &= np.asarray(valid, dtype=bool)
+    return np.bincount(codes[keep], minlength=size)